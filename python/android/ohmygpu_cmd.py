@@ -1,70 +1,97 @@
+import argparse
+import os
 import subprocess
-import re
+import sys
+import time
 
+# The Android backend lives with the others in ../windows; this front end
+# only formats what it reads. A copy of this script, e.g. on the device,
+# needs the shared modules next to it.
+SHARED_MODULES = ('ohmygpu_android.py', 'ohmygpu_sysfs.py', 'ohmygpu_sample.py')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'windows'))
+
+try:
+    from ohmygpu_android import AndroidNodes, gpu_model, processor_name
+    from ohmygpu_sample import positive_float
+except ImportError as e:
+    sys.exit(f"[ERROR] {e}: copy {', '.join(SHARED_MODULES)} from python/windows next to this script")
 
-def get_processor_name():
-    for prop in ('ro.chipname', 'ro.hardware'):
-        try:
-            result = subprocess.run(
-                ['getprop', prop],
-                capture_output=True,
-                text=True,
-                timeout=5,
-                check=False
-            )
-            if result.returncode == 0 and (processor := result.stdout.strip()):
-                return processor
-        except (FileNotFoundError, subprocess.TimeoutExpired, OSError):
-            continue
-    
-    try:
-        with open('/proc/cpuinfo', 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                if 'Hardware' in line or 'Processor' in line:
-                    if ':' in line:
-                        return line.split(':', 1)[1].strip()
-    except (FileNotFoundError, OSError, IOError):
-        pass
-    
-    return "Unknown Processor"
 
+def run(args):
+    return subprocess.run(args, capture_output=True, text=True, timeout=5, check=False)
 
-def get_memory_info():
-    mem_data = {}
-    
+def format_mb(value):
+    return f"{value // (1024 * 1024)} MB" if value is not None else 'N/A'
+
+def format_gpu_info(processor, model, nodes):
+    values = nodes.read()
+    load = values.get('utilization')
+    clock = values.get('clock_graphics')
+    lines = [f"Processor:      {processor}"]
+    if model:
+        lines.append(f"GPU model:      {model}")
+    lines.append(f"Total memory:   {format_mb(values.get('memory_total'))}")
+    lines.append(f"Used memory:    {format_mb(values.get('memory_used'))}")
+    lines.append(f"Utilization:    {f'{load:.0f} %' if load is not None else 'N/A'}")
+    if clock is not None:
+        lines.append(f"GPU clock:      {clock:.0f} MHz")
+    return lines
+
+def get_processor_name():
     try:
-        with open('/proc/meminfo', 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                key, _, value = line.partition(':')
-                if key in ('MemTotal', 'MemAvailable'):
-                    # Извлечь числовое значение и преобразовать в МБ
-                    match = re.search(r'(\d+)', value)
-                    if match:
-                        mem_data[key] = int(match.group(1)) // 1024
-    except (FileNotFoundError, OSError, IOError):
-        return {'total': 'N/A', 'used': 'N/A'}
-    
-    if 'MemTotal' in mem_data and 'MemAvailable' in mem_data:
-        mem_used = mem_data['MemTotal'] - mem_data['MemAvailable']
-        return {
-            'total': f"{mem_data['MemTotal']} MB",
-            'used': f"{mem_used} MB"
-        }
-    
-    return {'total': 'N/A', 'used': 'N/A'}
+        return processor_name(run) or "Unknown Processor"
+    except subprocess.TimeoutExpired:
+        return "Unknown Processor"
 
 
 def print_gpu_info():
-    processor = get_processor_name()
-    memory = get_memory_info()
-    
+    nodes = AndroidNodes()
+    try:
+        lines = format_gpu_info(get_processor_name(), gpu_model(), nodes)
+    finally:
+        nodes.close()
+
     print("\nOH MY GPU:\n")
-    print(f"Processor:      {processor}")
-    print(f"Total memory:   {memory['total']}")
-    print(f"Used memory:    {memory['used']}")
-    print(f"Utilization:    N/A")
+    print("\n".join(lines))
     print("\nGPU is fine.")
 
+def watch_gpu_info(interval):
+    """Refresh every interval seconds until interrupted. The properties and
+    GPU model are read once; each tick only re-reads the open nodes."""
+    processor, model = get_processor_name(), gpu_model()
+    nodes = AndroidNodes()
+    previous_lines = 0
+    try:
+        while True:
+            started = time.monotonic()
+            lines = [f"OH MY GPU  {time.strftime('%H:%M:%S')}", ""] + format_gpu_info(processor, model, nodes)
+            if sys.stdout.isatty() and previous_lines:
+                sys.stdout.write(f"\x1b[{previous_lines}F\x1b[J")
+            elif previous_lines:
+                sys.stdout.write("\n")
+            sys.stdout.write("\n".join(lines) + "\n")
+            sys.stdout.flush()
+            previous_lines = len(lines)
+            time.sleep(max(interval - (time.monotonic() - started), 0))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        nodes.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Show the GPU, memory and utilization of an Android device.',
+        epilog=f"Reads the device through the shared backend in ../windows; to run a copy of this script "
+               f"elsewhere, put {', '.join(SHARED_MODULES)} next to it.")
+    parser.add_argument('--watch', type=positive_float, metavar='INTERVAL',
+                        help='keep refreshing every INTERVAL seconds until interrupted')
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    print_gpu_info()
\ No newline at end of file
+    args = parse_args()
+    if args.watch:
+        watch_gpu_info(args.watch)
+    else:
+        print_gpu_info()
@@ -0,0 +1,870 @@
+"""Benchmark and regression harness for the Python front ends.
+
+Every scenario runs the real CLI in a fresh interpreter with PATH pointing
+only at generated stub tools (nvidia-smi, rocm-smi, amd-smi, lspci,
+system_profiler, wmic, getprop). The stubs replay the recordings in fixtures/, optionally
+after a delay, with a failing exit code or hanging until the probe times
+out, and log every spawn. Results are appended to results.jsonl and
+compared with the previous run so regressions show up between versions.
+
+    python bench.py                      # all scenarios, 10 runs each
+    python bench.py -s nvidia-8gpu -n 50 # one scenario
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PYTHON_DIR = os.path.dirname(BENCH_DIR)
+WINDOWS_DIR = os.path.join(PYTHON_DIR, 'windows')
+ANDROID_DIR = os.path.join(PYTHON_DIR, 'android')
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+RESULTS_PATH = os.path.join(BENCH_DIR, 'results.jsonl')
+
+CLI = os.path.join(WINDOWS_DIR, 'ohmygpu_cmd.py')
+sys.path.insert(0, WINDOWS_DIR)
+ANDROID_CLI = os.path.join(ANDROID_DIR, 'ohmygpu_cmd.py')
+
+LSPCI_HUGE = 'lspci_huge.txt'
+LSPCI_HUGE_DEVICES = 8000
+FAKE_PROCESSES = 4000
+FAKE_DRM_CLIENTS = 8
+RECORDING_SECONDS = 24 * 60 * 60
+FLEET_AGENTS = 200
+
+REGRESSION_THRESHOLD = 20.0
+REGRESSION_MIN_MS = 2.0
+# Interpreter time 'import ohmygpu_cmd' may add on top of bare Python.
+STARTUP_BUDGET_MS = 30.0
+
+
+def tool(fixture=None, delay=0, exit_code=0, hang=False, cases=None):
+    """Behaviour of one stub executable. cases maps a shell glob on the
+    argument string to a fixture used instead of the default one."""
+    return {'fixture': fixture, 'delay': delay, 'exit_code': exit_code, 'hang': hang, 'cases': cases or {}}
+
+MIB = 1024 * 1024
+
+ROCM = tool('rocm-smi_json.txt')
+AMD_SMI = tool(cases={'static*': 'amd-smi_static.json', 'metric*': 'amd-smi_metric.json'})
+
+# What the fixtures hold, as ohmygpu_output record fields.
+RTX_4090 = {'name': 'NVIDIA GeForce RTX 4090', 'bus_id': '0000:01:00.0', 'memory_total_bytes': 24564 * MIB,
+            'memory_used_bytes': 1234 * MIB, 'utilization_percent': 7.0, 'temperature_celsius': 43.0}
+H100 = [
+    {'name': 'NVIDIA H100 80GB HBM3', 'memory_total_bytes': 81559 * MIB, 'memory_used_bytes': (512 + 1000 * i) * MIB,
+     'utilization_percent': 12.0 * i, 'temperature_celsius': 30.0 + i}
+    for i in range(8)
+]
+NAVI_21 = 'Navi 21 [Radeon RX 6800/6800 XT / 6900 XT]'
+ROCM_GPUS = [
+    {'name': NAVI_21, 'bus_id': '0000:03:00.0', 'memory_total_bytes': 17163091968, 'memory_used_bytes': 1325400064,
+     'utilization_percent': 37.0, 'temperature_celsius': 45.0, 'power_watts': 41.0},
+    {'name': NAVI_21, 'bus_id': '0000:0a:00.0', 'memory_used_bytes': 22290432, 'utilization_percent': 0.0,
+     'temperature_celsius': 38.0, 'power_watts': None},
+]
+UHD_630 = {'name': 'Intel Corporation UHD Graphics 630 (Desktop) (prog-if 00 [VGA controller])',
+           'bus_id': '0000:00:02.0', 'memory_total_bytes': 16 * MIB}
+
+# command: 'cli' runs ohmygpu_cmd.py, 'android' runs android/ohmygpu_cmd.py,
+# anything else names a probe in ohmygpu_core to run on its own (used for
+# backends of other platforms). expect lists the fields every run must
+# report per GPU; any difference fails the bench.
+SCENARIOS = {
+    'nvidia-1gpu': {'tools': {'nvidia-smi': tool('nvidia-smi_1gpu.csv'), 'lspci': tool('lspci_v.txt')},
+                    'expect': [RTX_4090]},
+    'nvidia-8gpu': {'tools': {'nvidia-smi': tool('nvidia-smi_8gpu.csv'), 'lspci': tool('lspci_v.txt')},
+                    'expect': H100},
+    'rocm-2gpu': {'tools': {'rocm-smi': ROCM, 'lspci': tool('lspci_v.txt')}, 'expect': ROCM_GPUS},
+    'amd-smi-1gpu': {
+        'tools': {'amd-smi': AMD_SMI, 'lspci': tool('lspci_v.txt')},
+        'expect': [{'name': 'AMD Radeon RX 7900 XTX', 'memory_total_bytes': 24560 * MIB,
+                    'memory_used_bytes': 1489 * MIB, 'utilization_percent': 23.0, 'temperature_celsius': 41.0,
+                    'power_watts': 58.0}],
+    },
+    'lspci-huge': {'tools': {'lspci': tool(LSPCI_HUGE)}, 'expect': [{**UHD_630, 'bus_id': '0000:ff:00.0'}]},
+    'sysfs-amd': {
+        'tools': {'lspci': tool('lspci_v.txt', delay=0.2)}, 'sysfs': True,
+        'expect': [{'name': f'Advanced Micro Devices, Inc. [AMD/ATI] {NAVI_21}', 'bus_id': '0000:03:00.0',
+                    'memory_total_bytes': 17163091968, 'memory_used_bytes': 1325400064,
+                    'utilization_percent': 37.0, 'temperature_celsius': 45.0}],
+    },
+    'nvidia-slow': {'tools': {'nvidia-smi': tool('nvidia-smi_1gpu.csv', delay=0.5), 'lspci': tool('lspci_v.txt')},
+                    'expect': [RTX_4090]},
+    'nvidia-broken': {'tools': {'nvidia-smi': tool(exit_code=9), 'rocm-smi': ROCM, 'lspci': tool('lspci_v.txt')},
+                      'expect': ROCM_GPUS},
+    'nvidia-hung': {'tools': {'nvidia-smi': tool(hang=True), 'lspci': tool('lspci_v.txt')}, 'runs': 1,
+                    'expect': [UHD_630]},
+    'no-gpu': {'tools': {}, 'expect': []},
+    'macos-system-profiler': {
+        'tools': {'system_profiler': tool('system_profiler_SPDisplaysDataType.json'),
+                  'ioreg': tool('ioreg_IOAccelerator.plist')},
+        'command': 'ohmygpu_macos:probe_system_profiler',
+        'expect': [
+            {'name': 'Intel UHD Graphics 630', 'memory_total_bytes': 1536 * MIB, 'memory_used_bytes': 201326592,
+             'utilization_percent': 3.0, 'temperature_celsius': None},
+            {'name': 'AMD Radeon Pro 5500M', 'memory_total_bytes': 8192 * MIB, 'memory_used_bytes': 1473249280,
+             'utilization_percent': 27.0, 'temperature_celsius': 52.0, 'power_watts': 18.0,
+             'clock_graphics_mhz': 1300.0, 'clock_memory_mhz': 1500.0},
+        ],
+    },
+    'macos-apple-silicon': {
+        'tools': {'system_profiler': tool('system_profiler_SPDisplaysDataType_apple.json'),
+                  'ioreg': tool('ioreg_IOAccelerator_apple.plist')},
+        'command': 'ohmygpu_macos:probe_system_profiler',
+        'expect': [{'name': 'Apple M2 Pro', 'memory_total_bytes': None, 'memory_used_bytes': 1838776320,
+                    'utilization_percent': 18.0}],
+    },
+    'windows-wmic': {
+        'tools': {'wmic': tool('wmic_videocontroller.txt')},
+        'command': 'ohmygpu_wmi:probe_wmic',
+        'expect': [{'name': 'NVIDIA GeForce RTX 3060', 'memory_total_bytes': 4293918720},
+                   {'name': 'Intel(R) UHD Graphics 770', 'memory_total_bytes': 1024 * MIB}],
+    },
+    'android': {
+        'tools': {'getprop': tool('getprop.txt')}, 'command': 'android', 'android': True,
+        'expect': [{'Processor': 'kalama', 'GPU model': 'Adreno740v2', 'Total memory': '11251 MB',
+                    'Used memory': '6552 MB', 'Utilization': '41 %', 'GPU clock': '680 MHz'}],
+    },
+}
+
+# Value checks that failed, as 'where: what' lines. Any of them fails the run.
+MISMATCHES = []
+
+# (backend, fixture) pairs for the in-process parser throughput benchmark. A
+# backend running several tools takes a {tool: fixture} dict instead.
+PARSERS = [
+    ('ohmygpu_nvidia:probe_nvidia_smi', 'nvidia-smi_8gpu.csv'),
+    ('ohmygpu_rocm:probe_rocm_smi', 'rocm-smi_json.txt'),
+    ('ohmygpu_pci:probe_lspci', 'lspci_v.txt'),
+    ('ohmygpu_pci:probe_lspci', LSPCI_HUGE),
+    ('ohmygpu_macos:probe_system_profiler', {'system_profiler': 'system_profiler_SPDisplaysDataType.json',
+                                             'ioreg': 'ioreg_IOAccelerator.plist'}),
+    ('ohmygpu_macos:probe_system_profiler', {'system_profiler': 'system_profiler_SPDisplaysDataType_apple.json',
+                                             'ioreg': 'ioreg_IOAccelerator_apple.plist'}),
+    ('ohmygpu_wmi:probe_wmic', 'wmic_videocontroller.txt'),
+]
+
+
+def generate_lspci_huge(path, devices=LSPCI_HUGE_DEVICES):
+    """A multi-megabyte lspci -v dump with the GPU as the very last device."""
+    with open(os.path.join(FIXTURES_DIR, 'lspci_v.txt'), 'r') as f:
+        blocks = f.read().strip().split('\n\n')
+    filler = [block for block in blocks if 'VGA' not in block]
+    gpu = next(block for block in blocks if 'VGA' in block)
+    with open(path, 'w') as f:
+        for i in range(devices):
+            block = filler[i % len(filler)]
+            f.write(f"{i // 32 + 0x10:02x}:{i % 32:02x}.0{block[7:]}\n\n")
+        f.write(gpu.replace('00:02.0', 'ff:00.0', 1) + '\n\n')
+
+def expect(where, got, want):
+    if got != want:
+        MISMATCHES.append(f"{where}: {got!r}, expected {want!r}")
+
+def expect_samples(where, got, want):
+    """expect() for long lists of samples: reports the count or the first
+    sample that differs."""
+    if len(got) != len(want):
+        MISMATCHES.append(f"{where}: {len(got)} samples, expected {len(want)}")
+    else:
+        for i, (got_sample, want_sample) in enumerate(zip(got, want)):
+            if got_sample != want_sample:
+                MISMATCHES.append(f"{where}: sample {i} is {got_sample!r}, expected {want_sample!r}")
+                break
+
+def rate(fn, seconds):
+    """Calls per second of fn() over about seconds of wall time."""
+    calls = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        fn()
+        calls += 1
+    return calls / (time.perf_counter() - started)
+
+def fixture_path(work_dir, name):
+    if name == LSPCI_HUGE:
+        return os.path.join(work_dir, name)
+    return os.path.join(FIXTURES_DIR, name)
+
+def write_stubs(bin_dir, work_dir, tools, spawn_log):
+    sh, cat, sleep = shutil.which('sh'), shutil.which('cat'), shutil.which('sleep')
+    for name, spec in tools.items():
+        lines = [f'#!{sh}', f'echo "{name} $*" >> "{spawn_log}"']
+        if spec['delay']:
+            lines.append(f'{sleep} {spec["delay"]}')
+        if spec['hang']:
+            lines.append(f'exec {sleep} 3600')
+        lines.append('case "$*" in')
+        for pattern, fixture in spec['cases'].items():
+            lines.append(f'  {pattern}) {cat} "{fixture_path(work_dir, fixture)}" ;;')
+        if spec['fixture']:
+            lines.append(f'  *) {cat} "{fixture_path(work_dir, spec["fixture"])}" ;;')
+        lines.append('esac')
+        lines.append(f'exit {spec["exit_code"]}')
+        path = os.path.join(bin_dir, name)
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.chmod(path, 0o755)
+
+def write_fake_sysfs(root):
+    """One AMD card with VRAM, busy percent and a hwmon sensor."""
+    device = os.path.join(root, 'devices', 'pci0000:00', '0000:03:00.0')
+    os.makedirs(os.path.join(device, 'hwmon', 'hwmon0'))
+    values = {
+        'vendor': '0x1002', 'device': '0x73bf', 'class': '0x030000',
+        'mem_info_vram_total': '17163091968', 'mem_info_vram_used': '1325400064',
+        'gpu_busy_percent': '37', os.path.join('hwmon', 'hwmon0', 'temp1_input'): '45000',
+    }
+    for name, value in values.items():
+        with open(os.path.join(device, name), 'w') as f:
+            f.write(value + '\n')
+    os.makedirs(os.path.join(root, 'class', 'drm', 'card0'))
+    os.symlink(device, os.path.join(root, 'class', 'drm', 'card0', 'device'))
+    os.makedirs(os.path.join(root, 'bus', 'pci', 'devices'))
+    os.symlink(device, os.path.join(root, 'bus', 'pci', 'devices', '0000:03:00.0'))
+
+def write_fake_android(sysfs_root, proc_root):
+    """An Adreno GPU's kgsl nodes and a phone's /proc/meminfo."""
+    kgsl = os.path.join(sysfs_root, 'class', 'kgsl', 'kgsl-3d0')
+    os.makedirs(kgsl)
+    values = {'gpu_model': 'Adreno740v2', 'gpubusy': '  412345  1000000', 'gpuclk': '680000000'}
+    for name, value in values.items():
+        with open(os.path.join(kgsl, name), 'w') as f:
+            f.write(value + '\n')
+    os.makedirs(proc_root)
+    with open(os.path.join(proc_root, 'meminfo'), 'w') as f:
+        f.write('MemTotal:       11521500 kB\nMemFree:          512000 kB\nMemAvailable:    4812000 kB\n'
+                'Buffers:            2048 kB\nCached:          3500000 kB\n')
+
+def measure_android(work_dir, seconds=0.5):
+    """Samples per second of the Android backend's sampler against the
+    fake kgsl tree."""
+    import ohmygpu_android
+
+    sysfs_root, proc_root = os.path.join(work_dir, 'android-sys'), os.path.join(work_dir, 'android-proc')
+    write_fake_android(sysfs_root, proc_root)
+    nodes = ohmygpu_android.AndroidNodes(sysfs_root, proc_root)
+    expect('android nodes', nodes.read(), {
+        'memory_total': 11521500 * 1024, 'memory_used': (11521500 - 4812000) * 1024,
+        'utilization': 412345 / 1000000 * 100, 'clock_graphics': 680.0,
+    })
+    per_s = rate(nodes.read, seconds)
+    nodes.close()
+    return {'android[kgsl]_per_s': per_s}
+
+def scenario_command(command, no_cache):
+    if command == 'cli':
+        args = [sys.executable, CLI, '--format', 'ndjson']
+        return args + ['--no-cache'] if no_cache else args
+    if command == 'android':
+        return [sys.executable, ANDROID_CLI]
+    snippet = (
+        f"import sys, json; sys.path.insert(0, {WINDOWS_DIR!r}); import ohmygpu_core as c, ohmygpu_output as o; "
+        f"gpus = c.run_probes([c.load_probe({command!r})])[1] or []; "
+        f"print(''.join(json.dumps(o.sample_record(g)) + '\\n' for g in gpus), end='')"
+    )
+    return [sys.executable, '-c', snippet]
+
+def parse_output(command, stdout):
+    """GPU records from one run: NDJSON from the CLI and the probe snippets,
+    and the Android CLI's 'Label:   value' lines as a single record."""
+    if command == 'android':
+        record = {}
+        for line in stdout.splitlines():
+            label, sep, value = line.partition(':')
+            if sep and value.strip():
+                record[label.strip()] = value.strip()
+        return [record] if record else []
+    return [json.loads(line) for line in stdout.splitlines() if line.startswith('{')]
+
+def check_expected(expected, records):
+    """How records differ from a scenario's expected GPUs, each a dict of
+    the fields that matter. Empty when they match."""
+    if len(records) != len(expected):
+        return [f"{len(records)} GPUs, expected {len(expected)}"]
+    problems = []
+    for i, (want, got) in enumerate(zip(expected, records)):
+        for field, value in want.items():
+            if got.get(field) != value:
+                problems.append(f"GPU {i} {field}: {got.get(field)!r}, expected {value!r}")
+    return problems
+
+def count_spawns(spawn_log):
+    try:
+        with open(spawn_log, 'r') as f:
+            return sum(1 for _ in f)
+    except OSError:
+        return 0
+
+def run_scenario(name, scenario, runs, work_dir):
+    scenario_dir = tempfile.mkdtemp(prefix=f'{name}-', dir=work_dir)
+    bin_dir = os.path.join(scenario_dir, 'bin')
+    sysfs_dir = os.path.join(scenario_dir, 'sys')
+    cache_dir = os.path.join(scenario_dir, 'cache')
+    spawn_log = os.path.join(scenario_dir, 'spawns.log')
+    os.makedirs(bin_dir)
+    os.makedirs(sysfs_dir)
+    write_stubs(bin_dir, work_dir, scenario['tools'], spawn_log)
+    if scenario.get('sysfs'):
+        write_fake_sysfs(sysfs_dir)
+    proc_dir = os.path.join(scenario_dir, 'proc')
+    if scenario.get('android'):
+        write_fake_android(sysfs_dir, proc_dir)
+
+    env = dict(os.environ)
+    env.update({
+        'PATH': bin_dir,
+        'XDG_CACHE_HOME': cache_dir,
+        'OHMYGPU_SYSFS_ROOT': sysfs_dir,
+        'OHMYGPU_NVML_LIBRARY': os.path.join(scenario_dir, 'libnvidia-ml.so.1'),
+        'OHMYGPU_PCI_IDS': os.path.join(FIXTURES_DIR, 'pci.ids'),
+    })
+    if scenario.get('android'):
+        env['OHMYGPU_PROC_ROOT'] = proc_dir
+    command = scenario.get('command', 'cli')
+    runs = min(runs, scenario.get('runs', runs))
+    result = {}
+
+    # Cold runs bypass the detection cache; warm runs (CLI only) reuse it.
+    modes = [('cold', True)] + ([('warm', False)] if command == 'cli' else [])
+    for mode, no_cache in modes:
+        args = scenario_command(command, no_cache)
+        if not no_cache:
+            subprocess.run(args, env=env, capture_output=True)
+        timings, spawns, problems = [], [], None
+        for _ in range(runs):
+            before = count_spawns(spawn_log)
+            started = time.perf_counter()
+            proc = subprocess.run(args, env=env, capture_output=True, text=True)
+            timings.append((time.perf_counter() - started) * 1000)
+            spawns.append(count_spawns(spawn_log) - before)
+            records = parse_output(command, proc.stdout)
+            if problems is None:
+                problems = check_expected(scenario['expect'], records)
+                MISMATCHES.extend(f"{name} ({mode}): {problem}" for problem in problems)
+        result[f'{mode}_ms'] = statistics.median(timings)
+        result[f'{mode}_p90_ms'] = sorted(timings)[int(0.9 * (len(timings) - 1))]
+        result[f'{mode}_spawns'] = statistics.mean(spawns)
+        result['gpus'] = len(records)
+    return result
+
+def measure_startup(runs):
+    """Interpreter start-up: bare Python versus importing each front end."""
+    commands = {
+        'python': [sys.executable, '-c', 'pass'],
+        'import_cmd': [sys.executable, '-c', f'import sys; sys.path.insert(0, {WINDOWS_DIR!r}); import ohmygpu_cmd'],
+        'import_android': [sys.executable, '-c', f'import sys; sys.path.insert(0, {ANDROID_DIR!r}); import ohmygpu_cmd'],
+    }
+    result = {}
+    for name, args in commands.items():
+        timings = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run(args, capture_output=True)
+            timings.append((time.perf_counter() - started) * 1000)
+        result[f'{name}_ms'] = statistics.median(timings)
+    result['import_cmd_overhead_ms'] = result['import_cmd_ms'] - result['python_ms']
+    result['import_android_overhead_ms'] = result['import_android_ms'] - result['python_ms']
+    return result
+
+def measure_parsers(work_dir, seconds=0.5):
+    import ohmygpu_core
+
+    result = {}
+    for backend, fixtures in PARSERS:
+        if isinstance(fixtures, str):
+            fixtures = {None: fixtures}
+        outputs = {}
+        for tool_name, fixture in fixtures.items():
+            with open(fixture_path(work_dir, fixture), 'r') as f:
+                outputs[tool_name] = subprocess.CompletedProcess([], 0, f.read(), '')
+
+        def run(args, timeout=None):
+            return outputs.get(args[0]) or outputs[None]
+
+        probe = ohmygpu_core.load_probe(backend)
+        key = f"{ohmygpu_core.probe_name(probe)}[{list(fixtures.values())[0]}]"
+        expect(f'parser {key}', len(probe(run) or []) > 0, True)
+        per_s = rate(lambda: probe(run), seconds)
+        size = sum(len(completed.stdout) for completed in outputs.values())
+        result[f'{key}_per_s'] = per_s
+        result[f'{key}_mb_per_s'] = per_s * size / 1e6
+    return result
+
+
+class FakeNvml:
+    """NVML symbol table in Python: every GPU reports the same values."""
+
+    def __init__(self, gpus):
+        self.gpus = gpus
+
+    def nvmlInit_v2(self):
+        return 0
+
+    def nvmlShutdown(self):
+        return 0
+
+    def nvmlDeviceGetCount_v2(self, count):
+        count._obj.value = self.gpus
+        return 0
+
+    def nvmlDeviceGetHandleByIndex_v2(self, index, handle):
+        handle._obj.value = index.value + 1
+        return 0
+
+    def nvmlDeviceGetName(self, handle, name, length):
+        name.value = b'NVIDIA GeForce RTX 4090'
+        return 0
+
+    def nvmlDeviceGetPciInfo_v3(self, handle, pci):
+        # The last GPU is function 1 of a multi-function device.
+        function = 1 if handle.value == self.gpus else 0
+        pci._obj.bus = handle.value
+        pci._obj.busId = f'00000000:{handle.value:02X}:00.{function}'.encode('ascii')
+        return 0
+
+    def nvmlDeviceGetMemoryInfo(self, handle, memory):
+        memory._obj.total = 24 * 1024**3
+        memory._obj.used = 1024**3
+        return 0
+
+    def nvmlDeviceGetUtilizationRates(self, handle, utilization):
+        utilization._obj.gpu = 42
+        return 0
+
+    def nvmlDeviceGetTemperature(self, handle, sensor, value):
+        value._obj.value = 55
+        return 0
+
+    def nvmlDeviceGetPowerUsage(self, handle, value):
+        value._obj.value = 310500
+        return 0
+
+    def nvmlDeviceGetClockInfo(self, handle, clock, value):
+        value._obj.value = 2520 if clock == 0 else 10501
+        return 0
+
+def measure_nvml(gpus=8, seconds=0.5):
+    """In-process NVML sampling rate against FakeNvml. This is an upper
+    bound on the backend's own overhead: a real driver call adds its own
+    cost on top."""
+    import ohmygpu_nvml
+
+    session = ohmygpu_nvml.Nvml(FakeNvml(gpus))
+    session.discover()
+    sample = session.sample()
+    gpu = sample[0]
+    expect('nvml', (gpu.name, gpu.memory_total, gpu.memory_used, gpu.utilization, gpu.temperature, gpu.power),
+           ('NVIDIA GeForce RTX 4090', 24 * 1024 * MIB, 1024 * MIB, 42.0, 55.0, 310.5))
+    expect('nvml bus ids', [gpu.bus_id for gpu in sample],
+           [f'0000:{i:02x}:00.0' for i in range(1, gpus)] + [f'0000:{gpus:02x}:00.1'])
+    per_s = rate(session.sample, seconds)
+    session.close()
+    return {f'nvml[fake-{gpus}gpu]_per_s': per_s}
+
+def write_fake_procfs(root, processes=FAKE_PROCESSES, clients=FAKE_DRM_CLIENTS):
+    """A process table where only the first few pids hold a DRM fd."""
+    for pid in range(1, processes + 1):
+        fd_dir = os.path.join(root, str(pid), 'fd')
+        fdinfo_dir = os.path.join(root, str(pid), 'fdinfo')
+        os.makedirs(fd_dir)
+        os.makedirs(fdinfo_dir)
+        with open(os.path.join(root, str(pid), 'comm'), 'w') as f:
+            f.write(f'proc{pid}\n')
+        for fd, target in enumerate(('/dev/null', '/dev/pts/0', '/dev/pts/0', 'socket:[1]')):
+            os.symlink(target, os.path.join(fd_dir, str(fd)))
+        if pid <= clients:
+            os.symlink('/dev/dri/renderD128', os.path.join(fd_dir, '4'))
+            with open(os.path.join(fdinfo_dir, '4'), 'w') as f:
+                f.write(
+                    f"drm-driver:\tamdgpu\ndrm-pdev:\t0000:03:00.0\ndrm-client-id:\t{pid}\n"
+                    f"drm-engine-gfx:\t{pid * 1000} ns\ndrm-memory-vram:\t1024 KiB\n"
+                )
+
+def measure_fdinfo(work_dir, seconds=0.5):
+    """Per-process samples per second over a large fake process table,
+    incrementally and with a full rescan on every sample."""
+    import ohmygpu_fdinfo
+
+    root = os.path.join(work_dir, 'proc')
+    write_fake_procfs(root)
+    result = {}
+    for mode, rescan_every in (('incremental', ohmygpu_fdinfo.RESCAN_EVERY), ('full', 1)):
+        scanner = ohmygpu_fdinfo.FdinfoScanner(root, rescan_every)
+        expect(f'fdinfo {mode}', [(p.pid, p.name, p.bus_id, p.memory_used) for p in scanner.sample()],
+               [(pid, f'proc{pid}', '0000:03:00.0', MIB) for pid in range(1, FAKE_DRM_CLIENTS + 1)])
+        result[f'fdinfo_{mode}[{FAKE_PROCESSES}procs]_per_s'] = rate(scanner.sample, seconds)
+    return result
+
+def measure_recording(work_dir, seconds=RECORDING_SECONDS):
+    """Appending a day of 1 s samples to a recording, then opening it and
+    replaying the last ten minutes through the index. Every sample carries
+    its own values, and what comes back from the replays is checked
+    against them."""
+    import ohmygpu_record
+    from ohmygpu_sample import GpuSample
+
+    path = os.path.join(work_dir, 'day.omg')
+    gpu = GpuSample(0, 'Bench GPU', '0000:01:00.0', 8 << 30, memory_used=1 << 30, utilization=50.0,
+                    temperature=60.0, power=120.5, clock_graphics=1800, clock_memory=7000)
+    first = time.time_ns() - seconds * ohmygpu_record.NS
+
+    def written_at(i):
+        return (first + i * ohmygpu_record.NS, i * 4096, float(i % 101))
+
+    started = time.perf_counter()
+    with ohmygpu_record.RecordWriter(path) as writer:
+        for i in range(seconds):
+            gpu.timestamp, gpu.memory_used, gpu.utilization = written_at(i)
+            writer.write([gpu])
+    written = time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ohmygpu_record.Recording(path) as recording:
+        last_10m = list(recording.samples(-600 * ohmygpu_record.NS))
+    seek_ms = (time.perf_counter() - started) * 1000
+
+    def replayed(samples):
+        return [(g.timestamp, g.memory_used, g.utilization) for gpus in samples for g in gpus]
+
+    expect_samples('recording --since=-10m', replayed(last_10m), [written_at(i) for i in range(seconds - 601, seconds)])
+    # A window straddling the first chunk boundary, through replay() as --replay runs it.
+    low, high = ohmygpu_record.CHUNK_FRAMES - 100, ohmygpu_record.CHUNK_FRAMES + 100
+    window = list(ohmygpu_record.replay(path, written_at(low)[0], written_at(high)[0], speed=0))
+    expect_samples('recording --since/--until', replayed(window), [written_at(i) for i in range(low, high + 1)])
+    everything = list(ohmygpu_record.replay(path, speed=0))
+    expect('recording --replay GPUs', {(g.index, g.name, g.bus_id, g.memory_total) for gpus in everything for g in gpus},
+           {(0, 'Bench GPU', '0000:01:00.0', 8 << 30)})
+    expect_samples('recording --replay', replayed(everything), [written_at(i) for i in range(seconds)])
+    return {
+        'record_write_per_s': seconds / written,
+        'replay_last_10m_ms': seek_ms,
+    }
+
+def check_history():
+    """MetricsStore rollups over a known series, with NumPy when it is
+    installed and with the array fallback. Utilization is i percent at
+    second i for 100 s; the 1 s ring only holds 10 buckets, so older
+    seconds survive only in the 5 s rollups."""
+    import ohmygpu_history
+    from ohmygpu_sample import GpuSample
+
+    start = 1_700_000_000 * ohmygpu_history.NS
+    backends = [('array', None)] + ([('numpy', ohmygpu_history.np)] if ohmygpu_history.np is not None else [])
+    numpy = ohmygpu_history.np
+    try:
+        for backend, module in backends:
+            ohmygpu_history.np = module
+            store = ohmygpu_history.MetricsStore(levels=((1, 10), (5, 100)))
+            for i in range(100):
+                store.add([GpuSample(0, 'Bench GPU', '0000:01:00.0', 100, memory_used=None, utilization=float(i),
+                                     timestamp=start + i * ohmygpu_history.NS)])
+
+            def stats(seconds, metric='utilization'):
+                result = store.stats('0000:01:00.0', metric, seconds)
+                return result and {name: round(value, 6) for name, value in result.items()}
+
+            # Seconds 94-98 from the ring plus 99, still open.
+            expect(f'history[{backend}] last 5 s', stats(5),
+                   {'count': 6, 'min': 94.0, 'max': 99.0, 'mean': 96.5, 'p95': 98.75, 'p99': 98.95})
+            # Evicted from the 1 s ring: only seconds 89-99 are left there.
+            window = store.series['0000:01:00.0']['utilization'].window(start, level=0)
+            expect(f'history[{backend}] 1 s ring', [float(value) for value in window['mean']],
+                   [float(i) for i in range(89, 100)])
+            # 30 s come from the 5 s level: buckets 70-94 plus 95-98, still open.
+            expect(f'history[{backend}] last 30 s', stats(30),
+                   {'count': 6, 'min': 70.0, 'max': 98.0, 'mean': 84.416667, 'p95': 95.375, 'p99': 96.275})
+            expect(f'history[{backend}] no readings', stats(30, 'memory_used'), None)
+    finally:
+        ohmygpu_history.np = numpy
+
+def check_adaptive_interval():
+    """AdaptiveInterval with a seeded RNG: the base interval backs off by
+    BACKOFF while readings hold still, snaps to the minimum on a fast
+    change, and every delay stays within the jitter around the base, also
+    when the range is a single interval."""
+    import random
+
+    import ohmygpu_watch
+    from ohmygpu_sample import GpuSample
+
+    def reading(utilization):
+        return [GpuSample(0, 'Bench GPU', '0000:01:00.0', 100, memory_used=10, utilization=utilization)]
+
+    state = random.getstate()
+    random.seed(19)
+    try:
+        pacing = ohmygpu_watch.AdaptiveInterval(1.0, 8.0, jitter=0.1)
+        bases, outside = [], []
+        for utilization in [50.0] * 8 + [53.0, 90.0]:
+            delay = pacing.next(reading(utilization))
+            bases.append(pacing.base)
+            if not pacing.base * 0.9 <= delay <= pacing.base * 1.1:
+                outside.append(delay)
+        # Steady up to the 8 s cap, a 3 point move tightens, a 37 point jump snaps back.
+        expect('adaptive interval bases', bases,
+               [1.0, 1.5, 2.25, 3.375, 5.0625, 7.59375, 8.0, 8.0, 8.0 / 1.5, 1.0])
+        expect('adaptive interval delays outside the jitter', outside, [])
+
+        fixed = ohmygpu_watch.AdaptiveInterval(2.0, 2.0, jitter=0.1)
+        delays = [fixed.next(reading(50.0)) for _ in range(50)]
+        expect('fixed interval jitter', (all(1.8 <= delay <= 2.2 for delay in delays), len(set(delays)) > 1),
+               (True, True))
+    finally:
+        random.setstate(state)
+
+def check_cadences(ticks=120, interval=1.0):
+    """schedule() against a sampler that logs the fields asked for on
+    every tick, on a fake clock. Fields without a cadence are read every
+    tick, each cadenced field about every cadence seconds and never
+    sooner than half a tick early, fields the sampler does not offer are
+    never asked for, and samples keep the last value read in between."""
+    import random
+    from types import SimpleNamespace
+
+    import ohmygpu_watch
+    from ohmygpu_sample import GpuSample
+
+    clock = SimpleNamespace(now=1000.0)
+
+    def sleep(seconds):
+        clock.now += seconds
+
+    class CountingSampler:
+        fields = ('memory_used', 'utilization', 'temperature', 'power')
+
+        def __init__(self):
+            self.reads = []
+
+        def read(self, fields):
+            self.reads.append((clock.now, tuple(fields)))
+            return {0: {field: float(len(self.reads)) for field in fields}}
+
+        def close(self):
+            pass
+
+    fake_time = SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep, thread_time=time.thread_time,
+                                perf_counter=time.perf_counter, time_ns=time.time_ns)
+    cadences = {'power': 3}
+    sampler = CountingSampler()
+    gpus = [GpuSample(0, 'Bench GPU', '0000:01:00.0', 100)]
+    state = random.getstate()
+    random.seed(18)
+    ohmygpu_watch.time = fake_time
+    try:
+        samples = ohmygpu_watch.schedule(sampler, gpus, interval, cadences)
+        yielded = [next(samples)[0] for _ in range(ticks)]
+        samples.close()
+    finally:
+        ohmygpu_watch.time = time
+        random.setstate(state)
+
+    asked = [field for _, fields in sampler.reads for field in fields]
+    expect('cadence fields asked for', sorted(set(asked)), sorted(sampler.fields))
+    for field in ('memory_used', 'utilization'):
+        expect(f'cadence {field} reads', asked.count(field), ticks)
+    for field, cadence in {**ohmygpu_watch.DEFAULT_CADENCES, **cadences}.items():
+        if field not in sampler.fields:
+            continue
+        times = [at for at, fields in sampler.reads if field in fields]
+        gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+        # Jitter moves each tick by up to DEFAULT_JITTER of the interval.
+        slack = interval * (0.5 + ohmygpu_watch.DEFAULT_JITTER)
+        expect(f'cadence {field} gaps outside {cadence} s',
+               [gap for gap in gaps if not cadence - slack <= gap <= cadence + interval + slack], [])
+        last_read = [max(i + 1 for i, (_, fields) in enumerate(sampler.reads[:tick + 1]) if field in fields)
+                     for tick in range(ticks)]
+        expect(f'cadence {field} values between reads', [getattr(gpu, field) for gpu in yielded],
+               [float(read) for read in last_read])
+
+def measure_fleet(agents=FLEET_AGENTS, gpus=8):
+    """One --collect round over agents serving a fixed sample on loopback,
+    first over new connections, then over the kept-alive ones."""
+    import asyncio
+    import threading
+    from http.server import ThreadingHTTPServer
+    from types import SimpleNamespace
+
+    import ohmygpu_fleet
+    import ohmygpu_metrics
+    from ohmygpu_sample import GpuSample
+
+    sample = ohmygpu_metrics.render_samples([
+        GpuSample(i, 'Bench GPU', f'0000:{i + 1:02x}:00.0', 8 << 30, memory_used=1 << 30, utilization=50.0)
+        for i in range(gpus)
+    ])
+    servers = []
+    for _ in range(agents):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), ohmygpu_metrics.MetricsHandler)
+        server.daemon_threads = True
+        server.sampler = SimpleNamespace(exposition=b'', samples=sample)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+    addresses = [f'127.0.0.1:{server.server_address[1]}' for server in servers]
+
+    async def rounds():
+        collector = ohmygpu_fleet.Collector(addresses)
+        timings = []
+        try:
+            for _ in range(2):
+                started = time.perf_counter()
+                records = 0
+                async for address, result, error, seconds in collector.poll():
+                    if error is not None:
+                        raise RuntimeError(f"{address}: {error}")
+                    records += len(result)
+                assert records == agents * gpus
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            collector.close()
+        return timings
+
+    try:
+        cold_ms, warm_ms = asyncio.run(rounds())
+    finally:
+        # shutdown() waits out a poll interval, so stop them all at once.
+        stopping = [threading.Thread(target=server.shutdown) for server in servers]
+        for thread in stopping:
+            thread.start()
+        for thread in stopping:
+            thread.join()
+        for server in servers:
+            server.server_close()
+    return {
+        f'fleet[{agents}]_cold_ms': cold_ms,
+        f'fleet[{agents}]_warm_ms': warm_ms,
+    }
+
+def git_version():
+    try:
+        result = subprocess.run(
+            ['git', 'describe', '--always', '--dirty'],
+            cwd=BENCH_DIR, capture_output=True, text=True, timeout=5
+        )
+        return result.stdout.strip() or 'unknown'
+    except (OSError, subprocess.TimeoutExpired):
+        return 'unknown'
+
+def load_previous(path):
+    try:
+        with open(path, 'r') as f:
+            lines = [line for line in f if line.strip()]
+        return json.loads(lines[-1]) if lines else None
+    except (OSError, ValueError):
+        return None
+
+def _sections(results):
+    """(name, metrics) per section, with every scenario as its own section."""
+    for section, metrics in results.items():
+        if section == 'scenarios':
+            for name, scenario in metrics.items():
+                yield f"{section}.{name}", scenario
+        else:
+            yield section, metrics
+
+def compare(previous, current, threshold):
+    """Return regression descriptions: latencies up (or throughput down) by
+    more than threshold percent, more spawns or a different GPU count."""
+    regressions = []
+    old_sections = dict(_sections(previous['results']))
+    for section, metrics in _sections(current['results']):
+        old_metrics = old_sections.get(section, {})
+        for key, value in metrics.items():
+            old = old_metrics.get(key)
+            if key == 'gpus' and old is not None and value != old:
+                regressions.append(f"{section}.{key}: {old} -> {value} GPUs")
+            if not isinstance(old, (int, float)) or not old:
+                continue
+            change = (value - old) / old * 100
+            if key.endswith('_ms') and change > threshold and value - old > REGRESSION_MIN_MS:
+                regressions.append(f"{section}.{key}: {old:.1f} -> {value:.1f} ms (+{change:.0f}%)")
+            elif key.endswith('_per_s') and -change > threshold:
+                regressions.append(f"{section}.{key}: {old:.0f} -> {value:.0f} ({change:.0f}%)")
+            elif key.endswith('_spawns') and value > old:
+                regressions.append(f"{section}.{key}: {old:g} -> {value:g} spawns")
+    return regressions
+
+def print_results(results):
+    print(f"{'SCENARIO':<24}{'COLD ms':>10}{'P90':>9}{'SPAWNS':>8}{'WARM ms':>10}{'SPAWNS':>8}{'GPUS':>6}")
+    for name, result in results['scenarios'].items():
+        warm = f"{result['warm_ms']:>10.1f}{result['warm_spawns']:>8.1f}" if 'warm_ms' in result else f"{'-':>10}{'-':>8}"
+        print(
+            f"{name:<24}{result['cold_ms']:>10.1f}{result['cold_p90_ms']:>9.1f}{result['cold_spawns']:>8.1f}"
+            f"{warm}{result.get('gpus', '-'):>6}"
+        )
+    print()
+    for key, value in results['startup'].items():
+        print(f"startup {key:<32}{value:>8.1f}")
+    print()
+    for key, value in results['parsers'].items():
+        print(f"parse {key:<64}{value:>12.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark oh-my-gpu against stub backend tools.')
+    parser.add_argument('-s', '--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run (repeatable, default: all)')
+    parser.add_argument('-n', '--runs', type=int, default=10, help='runs per scenario')
+    parser.add_argument('--results', default=RESULTS_PATH, help='results history (JSON lines)')
+    parser.add_argument('--no-save', action='store_true', help='do not append to the results history')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='percent change reported as a regression')
+    args = parser.parse_args()
+
+    names = args.scenario or list(SCENARIOS)
+    work_dir = tempfile.mkdtemp(prefix='ohmygpu-bench-')
+    try:
+        generate_lspci_huge(os.path.join(work_dir, LSPCI_HUGE))
+        results = {
+            'scenarios': {name: run_scenario(name, SCENARIOS[name], args.runs, work_dir) for name in names},
+            'startup': measure_startup(args.runs),
+            'parsers': {**measure_parsers(work_dir), **measure_nvml(), **measure_fdinfo(work_dir),
+                        **measure_recording(work_dir), **measure_android(work_dir), **measure_fleet()},
+        }
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    check_history()
+    check_adaptive_interval()
+    check_cadences()
+
+    record = {
+        'version': git_version(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    print_results(results)
+
+    overhead = results['startup']['import_cmd_overhead_ms']
+    within_budget = overhead <= STARTUP_BUDGET_MS
+    print(f"\nStart-up budget: {overhead:.1f} ms of {STARTUP_BUDGET_MS:.0f} ms "
+          f"({'ok' if within_budget else 'OVER BUDGET'})")
+
+    previous = load_previous(args.results)
+    if previous:
+        regressions = compare(previous, record, args.threshold)
+        print(f"\nCompared with {previous['version']} ({previous['time']}):")
+        for line in regressions or ['no regressions']:
+            print(f"  {line}")
+
+    if MISMATCHES:
+        print("\nWrong values:")
+        for line in MISMATCHES:
+            print(f"  {line}")
+
+    if not args.no_save:
+        with open(args.results, 'a') as f:
+            f.write(json.dumps(record) + '\n')
+    return 0 if within_budget and not MISMATCHES else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
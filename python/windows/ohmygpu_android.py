@@ -0,0 +1,193 @@
+import glob
+import os
+
+import ohmygpu_sysfs
+from ohmygpu_sample import GpuSample
+
+
+PROCESSOR_PROPERTIES = ('ro.chipname', 'ro.hardware')
+MODEL_NODES = ('class/kgsl/kgsl-3d0/gpu_model', 'class/misc/mali0/device/gpuinfo')
+# Adreno (kgsl) first, then Mali. 'busy_total' nodes hold busy and total
+# time of the driver's last window rather than a percentage.
+UTILIZATION_NODES = (
+    ('class/kgsl/kgsl-3d0/gpu_busy_percentage', 'percent'),
+    ('class/kgsl/kgsl-3d0/gpubusy', 'busy_total'),
+    ('class/misc/mali0/device/utilization', 'percent'),
+    ('kernel/gpu/gpu_busy', 'percent'),
+)
+# (node, units per MHz)
+CLOCK_NODES = (
+    ('class/kgsl/kgsl-3d0/gpuclk', 1_000_000),
+    ('class/misc/mali0/device/devfreq/*/cur_freq', 1_000_000),
+    ('kernel/gpu/gpu_clock', 1),
+)
+MEMINFO_KEYS = (b'MemTotal', b'MemAvailable')
+
+_properties = None
+
+
+def parse_getprop(text):
+    """Parse getprop's '[name]: [value]' dump."""
+    properties = {}
+    for line in text.splitlines():
+        if line.startswith('[') and line.endswith(']'):
+            key, sep, value = line[1:-1].partition(']: [')
+            if sep:
+                properties[key] = value
+    return properties
+
+def get_properties(run):
+    """Every system property, from a single getprop run per process."""
+    global _properties
+    if _properties is None:
+        try:
+            result = run(['getprop'])
+        except OSError:
+            return {}
+        _properties = parse_getprop(result.stdout) if result.returncode == 0 else {}
+    return _properties
+
+def processor_name(run):
+    properties = get_properties(run)
+    for prop in PROCESSOR_PROPERTIES:
+        if processor := properties.get(prop, '').strip():
+            return processor
+
+    try:
+        with open(os.path.join(ohmygpu_sysfs.PROC_ROOT, 'cpuinfo'), 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                if ('Hardware' in line or 'Processor' in line) and ':' in line:
+                    return line.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return None
+
+def gpu_model(root=None):
+    for node in MODEL_NODES:
+        try:
+            with open(os.path.join(root or ohmygpu_sysfs.SYSFS_ROOT, node), 'r', encoding='utf-8', errors='ignore') as f:
+                # Mali's gpuinfo reads like 'Mali-G78 20 cores r1p1 0x9091'.
+                fields = f.read().split()
+        except OSError:
+            continue
+        if fields:
+            return fields[0]
+    return None
+
+
+def _open(path):
+    try:
+        return os.open(path, os.O_RDONLY)
+    except OSError:
+        return None
+
+def _pread(fd, size=64):
+    try:
+        return os.pread(fd, size, 0)
+    except OSError:
+        return None
+
+def parse_meminfo(data):
+    """(total, used) in bytes from /proc/meminfo. The GPU shares system
+    memory on Android."""
+    values = {}
+    for line in data.split(b'\n'):
+        key, _, value = line.partition(b':')
+        if key in MEMINFO_KEYS:
+            fields = value.split()
+            if fields and fields[0].isdigit():
+                values[key] = int(fields[0]) * 1024
+            if len(values) == len(MEMINFO_KEYS):
+                break
+    total = values.get(b'MemTotal')
+    if total is None or b'MemAvailable' not in values:
+        return total, None
+    return total, total - values[b'MemAvailable']
+
+def parse_utilization(data, kind):
+    fields = data.split()
+    try:
+        if kind == 'busy_total':
+            busy, total = int(fields[0]), int(fields[1])
+            return busy / total * 100 if total > 0 else 0.0
+        return float(fields[0].rstrip(b'%'))
+    except (IndexError, ValueError):
+        return None
+
+
+class AndroidNodes:
+    """/proc/meminfo and the GPU's load and clock nodes, opened once and
+    re-read with pread(), so a sample costs three syscalls and never forks.
+    Nodes the device lacks, or that SELinux hides, read as None."""
+
+    def __init__(self, sysfs_root=None, proc_root=None):
+        sysfs_root = sysfs_root or ohmygpu_sysfs.SYSFS_ROOT
+        self.meminfo = _open(os.path.join(proc_root or ohmygpu_sysfs.PROC_ROOT, 'meminfo'))
+        self.utilization = self.utilization_kind = None
+        for node, kind in UTILIZATION_NODES:
+            fd = _open(os.path.join(sysfs_root, node))
+            if fd is not None:
+                self.utilization, self.utilization_kind = fd, kind
+                break
+        self.clock = self.clock_scale = None
+        for node, scale in CLOCK_NODES:
+            for path in sorted(glob.glob(os.path.join(sysfs_root, node))):
+                fd = _open(path)
+                if fd is not None:
+                    self.clock, self.clock_scale = fd, scale
+                    break
+            if self.clock is not None:
+                break
+
+    def read(self, fields=('memory_total', 'memory_used', 'utilization', 'clock_graphics')):
+        values = {}
+        if ('memory_total' in fields or 'memory_used' in fields) and self.meminfo is not None:
+            data = _pread(self.meminfo, 4096)
+            values['memory_total'], values['memory_used'] = parse_meminfo(data) if data else (None, None)
+        if 'utilization' in fields and self.utilization is not None:
+            data = _pread(self.utilization)
+            values['utilization'] = parse_utilization(data, self.utilization_kind) if data else None
+        if 'clock_graphics' in fields and self.clock is not None:
+            data = _pread(self.clock)
+            try:
+                values['clock_graphics'] = int(data.split()[0]) / self.clock_scale
+            except (AttributeError, IndexError, ValueError):
+                values['clock_graphics'] = None
+        return values
+
+    def close(self):
+        for fd in (self.meminfo, self.utilization, self.clock):
+            if fd is not None:
+                os.close(fd)
+        self.meminfo = self.utilization = self.clock = None
+
+
+def probe_android(run):
+    processor = processor_name(run)
+    if processor is None:
+        return None
+    nodes = AndroidNodes()
+    try:
+        values = nodes.read()
+    finally:
+        nodes.close()
+    return [GpuSample(0, gpu_model() or processor, **values)]
+
+
+class AndroidSampler:
+    """Shared memory use plus the Adreno or Mali load and clock."""
+
+    fields = ('memory_used', 'utilization', 'clock_graphics')
+
+    def __init__(self, gpus, interval):
+        self.nodes = AndroidNodes()
+
+    def read(self, fields):
+        values = self.nodes.read(fields)
+        values.pop('memory_total', None)
+        return {0: values}
+
+    def close(self):
+        self.nodes.close()
+
+SAMPLERS = {'probe_android': AndroidSampler}
@@ -0,0 +1,137 @@
+import json
+import os
+import sys
+import time
+
+import ohmygpu_sysfs
+
+CACHE_VERSION = 4
+CACHE_TTL = 24 * 60 * 60
+# For keys without a device list (macOS, or Windows when enumeration
+# fails), nothing notices a GPU coming or going, so entries expire sooner.
+UNTRACKED_TTL = 5 * 60
+# EnumDisplayDevicesW flag for mirror drivers such as remote desktop's.
+DISPLAY_DEVICE_MIRRORING_DRIVER = 0x8
+
+BOOT_ID_PATH = '/proc/sys/kernel/random/boot_id'
+
+
+def cache_dir():
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'oh-my-gpu')
+
+def cache_path():
+    return os.path.join(cache_dir(), 'backend.json')
+
+def read_boot_id(path=BOOT_ID_PATH):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+def list_display_devices(root=ohmygpu_sysfs.PCI_DEVICES_PATH):
+    """Describe every PCI display controller as 'address vendor:device driver',
+    so a new card or a driver swap changes the key."""
+    return [
+        f"{dev['bus_id']} {dev['vendor_id']:04x}:{dev['device_id']:04x} {dev['driver'] or '-'}"
+        for dev in ohmygpu_sysfs.scan_display_devices(root)
+    ]
+
+def list_windows_adapters():
+    """Describe every display adapter Windows has attached as 'PNP id
+    name', from EnumDisplayDevicesW, which needs no process spawn."""
+    import ctypes
+    from ctypes import wintypes
+
+    class DisplayDevice(ctypes.Structure):
+        _fields_ = [
+            ('cb', wintypes.DWORD),
+            ('DeviceName', wintypes.WCHAR * 32),
+            ('DeviceString', wintypes.WCHAR * 128),
+            ('StateFlags', wintypes.DWORD),
+            ('DeviceID', wintypes.WCHAR * 128),
+            ('DeviceKey', wintypes.WCHAR * 128),
+        ]
+
+    device = DisplayDevice()
+    device.cb = ctypes.sizeof(device)
+    adapters = set()
+    try:
+        enum_display_devices = ctypes.windll.user32.EnumDisplayDevicesW
+    except (AttributeError, OSError):
+        return []
+    # One entry per output; outputs of the same adapter share its id.
+    i = 0
+    while enum_display_devices(None, i, ctypes.byref(device), 0):
+        if not device.StateFlags & DISPLAY_DEVICE_MIRRORING_DRIVER:
+            adapters.add(f"{device.DeviceID} {device.DeviceString}")
+        i += 1
+    return sorted(adapters)
+
+def system_name():
+    """platform.system() without importing platform, which costs more than
+    the rest of a cached start-up."""
+    if sys.platform == 'win32':
+        return 'Windows'
+    return os.uname().sysname
+
+def node_name():
+    if sys.platform == 'win32':
+        return os.environ.get('COMPUTERNAME', '')
+    return os.uname().nodename
+
+def topology_key():
+    return {
+        'system': system_name(),
+        'node': node_name(),
+        'boot_id': read_boot_id(),
+        'devices': list_windows_adapters() if sys.platform == 'win32' else list_display_devices()
+    }
+
+def load(key, ttl=CACHE_TTL, path=None):
+    """Return the cached entry for key, or None if it is missing, stale or
+    was recorded for another boot or PCI topology. A key without devices
+    goes stale after UNTRACKED_TTL at most."""
+    try:
+        with open(path or cache_path(), 'r', encoding='utf-8') as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if not isinstance(entry, dict) or entry.get('version') != CACHE_VERSION:
+        return None
+    if entry.get('key') != key:
+        return None
+    if not key.get('devices'):
+        ttl = min(ttl, UNTRACKED_TTL)
+    if not 0 <= time.time() - entry.get('created', 0) < ttl:
+        return None
+    return entry
+
+def store(key, backend, static, path=None):
+    path = path or cache_path()
+    entry = {
+        'version': CACHE_VERSION,
+        'created': time.time(),
+        'key': key,
+        'backend': backend,
+        'static': static
+    }
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+def invalidate(path=None):
+    try:
+        os.unlink(path or cache_path())
+    except OSError:
+        pass
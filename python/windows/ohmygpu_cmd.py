@@ -1,198 +1,427 @@
-import subprocess
-import platform
-import re
+import argparse
+import signal
+import sys
+import time
 
-def get_gpu_info():
-    system = platform.system()
+from ohmygpu_core import get_gpu_info, get_process_info
+from ohmygpu_record import RecordingError, RecordWriter, parse_time, replay
+from ohmygpu_sample import format_memory, format_percent, format_temperature, non_negative_float, positive_float
+
+# The watch, output and metrics modules are imported by the modes that use
+# them, so a plain run pays only for the backend it ends up probing.
+FORMATS = ('json', 'ndjson', 'csv')
+
+def print_gpu_info(use_cache=True, use_daemon=True):
+    print("\nOH MY GPU:\n")
     
-    if system == "Windows":
-        return get_gpu_info_windows()
-    elif system == "Linux":
-        return get_gpu_info_linux()
-    elif system == "Darwin":
-        return get_gpu_info_macos()
+    gpus = get_gpu_info(use_cache, use_daemon)
     
-    return None
+    if gpus:
+        for gpu in gpus:
+            if len(gpus) > 1:
+                print(f"[GPU {gpu.index}] {gpu.bus_id or ''}".rstrip())
+            print(f"GPU model:      {gpu.name}")
+            print(f"Total memory:   {format_memory(gpu.memory_total)}")
+            print(f"Used memory:    {format_memory(gpu.memory_used)}")
+            print(f"Utilization:    {format_percent(gpu.utilization)}")
+            print(f"Temperature:    {format_temperature(gpu.temperature)}")
+            if len(gpus) > 1:
+                print()
+        print("\nGPU is fine." if len(gpus) == 1 else "GPUs are fine.")
+    else:
+        print("[ERROR] GPU not found!")
+        print("[ERROR] Make sure GPU drivers are installed.")
 
-def get_gpu_info_windows():
-    try:
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=name,memory.total,memory.used,utilization.gpu', '--format=csv,noheader'],
-            capture_output=True,
-            text=True,
-            timeout=5
+
+def format_gpu_table(gpus, store=None):
+    sampled = time.localtime(gpus[0].timestamp / 1e9) if gpus else None
+    lines = [
+        f"OH MY GPU  {time.strftime('%H:%M:%S', sampled)}",
+        "",
+        f"{'GPU':<5}{'MODEL':<34}{'USED':>10}{'TOTAL':>10}{'UTIL':>7}{'TEMP':>7}"
+        + (f"{'AVG 1m':>8}{'P95 1m':>8}" if store else "")
+    ]
+    for gpu in gpus:
+        line = (
+            f"{gpu.index:<5}{gpu.name[:32]:<34}"
+            f"{format_memory(gpu.memory_used):>10}{format_memory(gpu.memory_total):>10}"
+            f"{format_percent(gpu.utilization):>7}{format_temperature(gpu.temperature):>7}"
         )
-        if result.returncode == 0:
-            info = result.stdout.strip().split(',')
-            return {
-                'name': info[0].strip(),
-                'total_memory': info[1].strip(),
-                'used_memory': info[2].strip(),
-                'utilization': info[3].strip()
-            }
-    except:
-        pass
-    
-    try:
-        result = subprocess.run(
-            ['rocm-smi', '--showid', '--showtemp'],
-            capture_output=True,
-            text=True,
-            timeout=5
+        if store:
+            stats = store.stats(gpu, 'utilization', 60)
+            line += (
+                f"{format_percent(stats and stats['mean']):>8}"
+                f"{format_percent(stats and stats['p95']):>8}"
+            )
+        lines.append(line)
+    return lines
+
+def format_process_table(processes):
+    lines = [
+        f"OH MY GPU PROCESSES  {time.strftime('%H:%M:%S')}",
+        "",
+        f"{'PID':>8}  {'NAME':<20}{'GPU':<14}{'MEMORY':>10}  ENGINES"
+    ]
+    for process in processes:
+        engines = ' '.join(
+            f"{engine} {format_percent(busy)}" for engine, busy in sorted(process.engines.items())
+        ) if process.engines is not None else 'N/A'
+        lines.append(
+            f"{process.pid:>8}  {process.name[:19]:<20}{process.bus_id or '-':<14}"
+            f"{format_memory(process.memory_used):>10}  {engines}"
         )
-        if result.returncode == 0 and 'GPU' in result.stdout:
-            return {
-                'name': 'AMD Radeon GPU',
-                'total_memory': 'N/A',
-                'used_memory': 'N/A',
-                'utilization': 'N/A'
-            }
-    except:
-        pass
-    
+    if not processes:
+        lines.append("No process is using the GPU.")
+    return lines
+
+def redraw(lines, previous_lines):
+    """Print a table over the previous one on a terminal, or after it
+    otherwise. Returns the line count to pass next time."""
+    if sys.stdout.isatty() and previous_lines:
+        # Jump back to the previous table and clear it.
+        sys.stdout.write(f"\x1b[{previous_lines}F\x1b[J")
+    elif previous_lines:
+        sys.stdout.write("\n")
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+    return len(lines)
+
+def print_process_info():
+    processes = get_process_info() or []
+    print("\n".join(format_process_table(processes)))
+
+def watch_process_info(interval):
+    from ohmygpu_watch import watch_processes
+
+    previous_lines = 0
     try:
-        result = subprocess.run(
-            ['wmic', 'path', 'win32_videocontroller', 'get', 'name,adapterram'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            for i in range(1, len(lines)):
-                if lines[i].strip():
-                    parts = lines[i].strip().rsplit(None, 1)
-                    if len(parts) == 2:
-                        name, mem = parts
-                        return {
-                            'name': name.strip(),
-                            'total_memory': format_memory(int(mem)) if mem.isdigit() else 'N/A',
-                            'used_memory': 'N/A',
-                            'utilization': 'N/A'
-                        }
-    except:
+        for processes in watch_processes(interval):
+            previous_lines = redraw(format_process_table(processes), previous_lines)
+    except KeyboardInterrupt:
         pass
-    
-    return None
 
-def get_gpu_info_linux():
+def watch_gpu_info(interval, use_cache=True, use_daemon=True, cadences=None, max_interval=None,
+                   samples=None):
+    """Redraw the table for every sample, taken every interval seconds or
+    read from samples, e.g. a replayed recording."""
+    from ohmygpu_history import MetricsStore
+    from ohmygpu_watch import OVERHEAD_BUDGET, get_sampling_stats, watch
+
+    if samples is None:
+        samples = watch(interval, use_cache, use_daemon, cadences, max_interval)
+    previous_lines = 0
+    store = MetricsStore()
     try:
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=name,memory.total,memory.used,utilization.gpu', '--format=csv,noheader'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            info = result.stdout.strip().split(',')
-            return {
-                'name': info[0].strip(),
-                'total_memory': info[1].strip(),
-                'used_memory': info[2].strip(),
-                'utilization': info[3].strip()
-            }
-    except:
+        for gpus in samples:
+            store.add(gpus)
+            lines = format_gpu_table(gpus, store)
+            stats = get_sampling_stats()
+            if stats['samples']:
+                lines.append("")
+                lines.append(
+                    f"next sample in {stats['last_interval']:.1f} s, "
+                    f"{stats['last_cpu_seconds'] * 1000:.2f} ms CPU per sample, "
+                    f"{stats['core_fraction']:.2%} of a core"
+                    + (" (over budget)" if stats['core_fraction'] > OVERHEAD_BUDGET else "")
+                )
+            previous_lines = redraw(lines, previous_lines)
+    except KeyboardInterrupt:
         pass
-    
+
+    if not previous_lines:
+        print("[ERROR] GPU not found!")
+        print("[ERROR] Make sure GPU drivers are installed.")
+
+
+def write_gpu_records(fmt, interval=None, use_cache=True, use_daemon=True, cadences=None,
+                      max_interval=None, samples=None):
+    """Machine-readable output: one record per GPU per sample, once, every
+    interval seconds or for each of samples. Returns False if no GPU was
+    found."""
+    from ohmygpu_output import open_writer
+    from ohmygpu_watch import watch
+
+    if samples is None and interval:
+        samples = watch(interval, use_cache, use_daemon, cadences, max_interval)
+    writer = open_writer(fmt)
+    found = False
     try:
-        result = subprocess.run(
-            ['rocm-smi', '--showid'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0 and 'GPU' in result.stdout:
-            return {
-                'name': 'AMD Radeon GPU',
-                'total_memory': 'N/A',
-                'used_memory': 'N/A',
-                'utilization': 'N/A'
-            }
-    except:
+        if samples is not None:
+            for gpus in samples:
+                found = True
+                writer.write(gpus)
+        else:
+            gpus = get_gpu_info(use_cache, use_daemon)
+            if gpus:
+                found = True
+                writer.write(gpus)
+    except KeyboardInterrupt:
         pass
-    
+    finally:
+        writer.close()
+
+    if not found:
+        print("[ERROR] GPU not found!", file=sys.stderr)
+    return found
+
+
+def record_gpu_info(path, interval, use_cache=True, use_daemon=True, cadences=None, max_interval=None):
+    """Append a sample to the recording at path every interval seconds
+    until interrupted. Returns False if it could not be written."""
+    from ohmygpu_watch import watch
+
     try:
-        result = subprocess.run(
-            ['lspci', '-v'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            for i, line in enumerate(lines):
-                if 'VGA compatible controller' in line or 'Display controller' in line or '3D controller' in line:
-                    if any(x in line for x in ['Intel', 'AMD', 'NVIDIA', 'Radeon', 'RTX', 'GTX', 'Arc']):
-                        gpu_name = line.split(': ', 1)[-1] if ': ' in line else line
-                        return {
-                            'name': gpu_name.strip(),
-                            'total_memory': 'N/A',
-                            'used_memory': 'N/A',
-                            'utilization': 'N/A'
-                        }
-    except:
+        writer = RecordWriter(path)
+    except (OSError, RecordingError) as e:
+        print(f"[ERROR] Cannot record to {path}: {e}", file=sys.stderr)
+        return False
+    found = False
+    try:
+        for gpus in watch(interval, use_cache, use_daemon, cadences, max_interval):
+            found = True
+            writer.write(gpus)
+    except KeyboardInterrupt:
         pass
-    
-    return None
+    finally:
+        writer.close()
 
-def get_gpu_info_macos():
+    if not found:
+        print("[ERROR] GPU not found!", file=sys.stderr)
+    return found
+
+def replay_gpu_info(path, fmt='text', since=None, until=None, speed=1.0):
+    """Show a recording as --watch would have, or write its samples in
+    fmt. Returns False if it could not be read."""
+    samples = replay(path, since, until, speed if fmt == 'text' else 0)
     try:
-        result = subprocess.run(
-            ['system_profiler', 'SPDisplaysDataType'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            gpu_info = {}
-            
-            for line in lines:
-                if 'Chipset Model' in line:
-                    gpu_info['name'] = line.split(': ', 1)[-1].strip()
-                if 'VRAM' in line:
-                    vram_str = line.split(': ', 1)[-1].strip()
-                    match = re.search(r'(\d+)\s*([MG])', vram_str)
-                    if match:
-                        size = int(match.group(1))
-                        unit = match.group(2)
-                        bytes_val = size * ({'M': 1024**2, 'G': 1024**3}.get(unit, 1))
-                        gpu_info['total_memory'] = format_memory(bytes_val)
-            
-            if gpu_info:
-                if 'total_memory' not in gpu_info:
-                    gpu_info['total_memory'] = 'N/A'
-                gpu_info['used_memory'] = 'N/A'
-                gpu_info['utilization'] = 'N/A'
-                return gpu_info
-    except:
-        pass
-    
-    return None
+        if fmt == 'text':
+            watch_gpu_info(None, samples=samples)
+            return True
+        return write_gpu_records(fmt, samples=samples)
+    except (OSError, RecordingError) as e:
+        print(f"[ERROR] Cannot replay {path}: {e}", file=sys.stderr)
+        return False
 
-def format_memory(bytes_value):
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes_value < 1024:
-            return f"{bytes_value:.1f} {unit}"
-        bytes_value /= 1024
-    return f"{bytes_value:.1f} TB"
+def format_fleet_rows(address, records, host_width):
+    if not records:
+        return [f"{address:<{host_width}}{'-':<5}no GPU"]
+    return [
+        f"{address:<{host_width}}{record['index']:<5}{(record.get('name') or '')[:32]:<34}"
+        f"{format_memory(record.get('memory_used_bytes')):>10}{format_memory(record.get('memory_total_bytes')):>10}"
+        f"{format_percent(record.get('utilization_percent')):>7}"
+        f"{format_temperature(record.get('temperature_celsius')):>7}"
+        for record in records
+    ]
 
-def print_gpu_info():
-    print("\nOH MY GPU:\n")
-    
-    gpu_info = get_gpu_info()
-    
-    if gpu_info:
-        print(f"GPU model:      {gpu_info['name']}")
-        print(f"Total memory:   {gpu_info['total_memory']}")
-        print(f"Used memory:    {gpu_info['used_memory']}")
-        print(f"Utilization:    {gpu_info['utilization']}")
-        print("\nGPU is fine.")
+def collect_gpu_info(addresses, fmt='text', interval=None, concurrency=None, timeout=None):
+    """Poll agents started with --serve-metrics and print every GPU in the
+    fleet as each host answers, as a table or NDJSON. With interval, keep
+    polling over the same connections until interrupted. Returns False if
+    no agent answered."""
+    import asyncio
+    import json
+    from ohmygpu_fleet import DEFAULT_CONCURRENCY, DEFAULT_TIMEOUT, Collector
+
+    host_width = max(len(address) for address in addresses) + 2
+
+    async def run():
+        collector = Collector(addresses, concurrency or DEFAULT_CONCURRENCY, timeout or DEFAULT_TIMEOUT)
+        answered = False
+        try:
+            while True:
+                started = time.perf_counter()
+                hosts = gpus = 0
+                if fmt == 'text':
+                    print(f"OH MY GPU FLEET  {time.strftime('%H:%M:%S')}\n")
+                    print(f"{'HOST':<{host_width}}{'GPU':<5}{'MODEL':<34}{'USED':>10}{'TOTAL':>10}{'UTIL':>7}{'TEMP':>7}")
+                async for address, records, error, seconds in collector.poll():
+                    if error is not None:
+                        print(f"[ERROR] {address}: {error}", file=sys.stderr)
+                        continue
+                    hosts += 1
+                    gpus += len(records)
+                    if fmt == 'text':
+                        lines = format_fleet_rows(address, records, host_width)
+                    else:
+                        lines = [json.dumps(record, separators=(',', ':')) for record in records]
+                    if lines:
+                        sys.stdout.write('\n'.join(lines) + '\n')
+                        sys.stdout.flush()
+                elapsed = time.perf_counter() - started
+                print(f"{gpus} GPUs on {hosts} of {len(addresses)} hosts in {elapsed:.2f} s", file=sys.stderr)
+                answered = answered or hosts > 0
+                if interval is None:
+                    return answered
+                if fmt == 'text':
+                    print()
+                await asyncio.sleep(max(interval - elapsed, 0))
+        finally:
+            collector.close()
+
+    try:
+        return asyncio.run(run())
+    except KeyboardInterrupt:
+        return True
+
+def parse_cadence(text):
+    from ohmygpu_watch import DYNAMIC_FIELDS
+    field, _, seconds = text.partition('=')
+    field = field.strip()
+    try:
+        seconds = float(seconds)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected FIELD=SECONDS, got '{text}'")
+    if field not in DYNAMIC_FIELDS:
+        raise argparse.ArgumentTypeError(f"unknown field '{field}', expected one of {', '.join(DYNAMIC_FIELDS)}")
+    return field, seconds
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Show GPU model, memory and utilization.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignore the backend detection cache and probe every backend')
+    parser.add_argument('--watch', type=positive_float, metavar='INTERVAL',
+                        help='keep refreshing every INTERVAL seconds until interrupted')
+    parser.add_argument('--format', choices=('text',) + FORMATS, default='text',
+                        help='output format; json, ndjson and csv write one numeric record per GPU per sample')
+    parser.add_argument('--serve-metrics', metavar='HOST:PORT',
+                        help='serve Prometheus metrics on HOST:PORT until interrupted, and the latest '
+                             'sample as NDJSON on /samples for --collect')
+    parser.add_argument('--collect', action='append', default=[], metavar='AGENTS',
+                        help='poll --serve-metrics agents instead of the local GPUs and show every GPU '
+                             'as a table or --format ndjson; AGENTS is a comma-separated HOST:PORT list '
+                             'or @FILE with one per line, and may be repeated')
+    parser.add_argument('--concurrency', type=int, metavar='N',
+                        help='agents --collect polls at once (default: 64)')
+    parser.add_argument('--agent-timeout', type=positive_float, metavar='SECONDS',
+                        help='give up on an agent after SECONDS per poll (default: 5)')
+    parser.add_argument('--interval', type=positive_float, metavar='SECONDS',
+                        help='sampling interval for --serve-metrics (default: 5), --daemon or --record (default: 1)')
+    parser.add_argument('--daemon', action='store_true',
+                        help='sample once for every viewer on this host and serve the latest snapshot '
+                             'on a Unix socket ($OHMYGPU_SOCKET, default /tmp/oh-my-gpu.sock)')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='probe the GPUs directly even if a daemon is running')
+    parser.add_argument('--cadence', type=parse_cadence, action='append', default=[], metavar='FIELD=SECONDS',
+                        help='refresh one dynamic field (memory_used, utilization, temperature, power, '
+                             'clock_graphics, clock_memory) every SECONDS while sampling repeatedly; '
+                             'temperature and clocks default to 5, the rest to every sample')
+    parser.add_argument('--max-interval', type=positive_float, metavar='SECONDS',
+                        help='adapt the sampling interval between --watch/--interval and SECONDS: back off '
+                             'while the GPUs are idle, tighten when utilization or memory moves')
+    parser.add_argument('--record', metavar='FILE',
+                        help='append a compact binary sample to FILE every --interval seconds until interrupted')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='play back a recording instead of probing, as a table or in --format')
+    parser.add_argument('--since', type=parse_time, metavar='TIME',
+                        help='replay from TIME: epoch seconds, an ISO 8601 time or an offset from the end '
+                             'of the recording such as --since=-10m')
+    parser.add_argument('--until', type=parse_time, metavar='TIME',
+                        help='replay up to TIME, in the same forms as --since')
+    parser.add_argument('--speed', type=non_negative_float, default=1.0, metavar='FACTOR',
+                        help='replay FACTOR times faster than recorded, 0 for no pauses (default: 1)')
+    parser.add_argument('--processes', action='store_true',
+                        help='show which processes use the GPU, their memory and engine busy time')
+    parser.add_argument('--profile', action='store_true',
+                        help='time every probe, command it spawns and sample, and print a summary to stderr on exit')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write the --profile timeline to FILE as Chrome trace_event JSON '
+                             '(chrome://tracing, Perfetto); implies --profile')
+    args = parser.parse_args()
+    if args.processes and (args.format != 'text' or args.serve_metrics):
+        parser.error('--processes only supports text output')
+    if (args.since is not None or args.until is not None) and not args.replay:
+        parser.error('--since and --until need --replay')
+    if args.serve_metrics:
+        from ohmygpu_metrics import parse_address
+
+        try:
+            parse_address(args.serve_metrics)
+        except ValueError as e:
+            parser.error(f"--serve-metrics: {e}")
+    if args.collect:
+        from ohmygpu_fleet import parse_agents
+
+        if args.format not in ('text', 'ndjson'):
+            parser.error('--collect supports text and ndjson output')
+        try:
+            args.collect = parse_agents(args.collect)
+        except (OSError, ValueError) as e:
+            parser.error(f"--collect: {e}")
+        if not args.collect:
+            parser.error('--collect: no agents given')
+    elif args.concurrency is not None or args.agent_timeout is not None:
+        parser.error('--concurrency and --agent-timeout need --collect')
+    return args
+
+def report_profile(profiler, trace_path=None):
+    print(file=sys.stderr)
+    for line in profiler.summary():
+        print(line, file=sys.stderr)
+    if trace_path:
+        try:
+            profiler.write_trace(trace_path)
+        except OSError as e:
+            print(f"[ERROR] Cannot write {trace_path}: {e}", file=sys.stderr)
+        else:
+            print(f"Trace written to {trace_path}", file=sys.stderr)
+
+
+def exit_on_sigterm(signum, frame):
+    # systemd and docker stop with SIGTERM; exiting through SystemExit runs
+    # the finally blocks that flush buffered records and close recordings.
+    sys.exit(128 + signum)
+
+
+def main(args):
+    use_daemon = not args.no_daemon
+    cadences = dict(args.cadence)
+    if args.daemon:
+        from ohmygpu_daemon import DEFAULT_INTERVAL, serve_daemon
+        if not serve_daemon(interval=args.interval or DEFAULT_INTERVAL, use_cache=not args.no_cache,
+                            cadences=cadences, max_interval=args.max_interval):
+            sys.exit(1)
+    elif args.serve_metrics:
+        from ohmygpu_metrics import DEFAULT_INTERVAL, serve_metrics
+        serve_metrics(args.serve_metrics, args.interval or DEFAULT_INTERVAL,
+                      use_cache=not args.no_cache, use_daemon=use_daemon, cadences=cadences,
+                      max_interval=args.max_interval)
+    elif args.record:
+        from ohmygpu_daemon import DEFAULT_INTERVAL
+        if not record_gpu_info(args.record, args.interval or DEFAULT_INTERVAL, use_cache=not args.no_cache,
+                               use_daemon=use_daemon, cadences=cadences, max_interval=args.max_interval):
+            sys.exit(1)
+    elif args.collect:
+        if not collect_gpu_info(args.collect, args.format, args.watch, args.concurrency, args.agent_timeout):
+            sys.exit(1)
+    elif args.replay:
+        if not replay_gpu_info(args.replay, args.format, args.since, args.until, args.speed):
+            sys.exit(1)
+    elif args.processes:
+        if args.watch:
+            watch_process_info(args.watch)
+        else:
+            print_process_info()
+    elif args.format != 'text':
+        if not write_gpu_records(args.format, args.watch, use_cache=not args.no_cache,
+                                 use_daemon=use_daemon, cadences=cadences, max_interval=args.max_interval):
+            sys.exit(1)
+    elif args.watch:
+        watch_gpu_info(args.watch, use_cache=not args.no_cache, use_daemon=use_daemon, cadences=cadences,
+                       max_interval=args.max_interval)
     else:
-        print("[ERROR] GPU not found!")
-        print("[ERROR] Make sure GPU drivers are installed.")
+        print_gpu_info(use_cache=not args.no_cache, use_daemon=use_daemon)
 
 
 if __name__ == "__main__":
-    print_gpu_info()
\ No newline at end of file
+    args = parse_args()
+    signal.signal(signal.SIGTERM, exit_on_sigterm)
+    if args.profile or args.trace:
+        import ohmygpu_profile
+
+        profiler = ohmygpu_profile.enable()
+        try:
+            main(args)
+        finally:
+            report_profile(profiler, args.trace)
+    else:
+        main(args)
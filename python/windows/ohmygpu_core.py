@@ -0,0 +1,359 @@
+import importlib
+import subprocess
+import threading
+import signal
+import os
+import sys
+import time
+
+import ohmygpu_cache
+import ohmygpu_profile
+from ohmygpu_sample import GpuSample
+
+PROBE_TIMEOUT = 5
+
+# Probes per platform in priority order, as 'module:function'. A backend
+# module is only imported once its platform selects it, and on a cache hit
+# only the backend that won last time is imported at all.
+BACKENDS = {
+    'Windows': (
+        'ohmygpu_nvml:probe_nvml',
+        'ohmygpu_nvidia:probe_nvidia_smi',
+        'ohmygpu_rocm:probe_rocm_smi',
+        'ohmygpu_wmi:probe_wmic',
+    ),
+    'Linux': (
+        'ohmygpu_nvml:probe_nvml',
+        'ohmygpu_nvidia:probe_nvidia_smi',
+        'ohmygpu_rocm:probe_rocm_smi',
+        'ohmygpu_rocm:probe_amd_smi',
+        'ohmygpu_pci:probe_sysfs',
+        'ohmygpu_pci:probe_pci',
+        'ohmygpu_pci:probe_lspci',
+    ),
+    'Darwin': (
+        'ohmygpu_macos:probe_system_profiler',
+    ),
+    'Android': (
+        'ohmygpu_android:probe_android',
+    ),
+}
+
+# Per-process GPU use, same layout as BACKENDS. Every backend is polled and
+# their answers merged, see run_process_probes().
+PROCESS_BACKENDS = {
+    'Windows': (
+        'ohmygpu_nvidia:probe_nvidia_smi_processes',
+    ),
+    'Linux': (
+        'ohmygpu_fdinfo:probe_fdinfo',
+        'ohmygpu_nvidia:probe_nvidia_smi_processes',
+    ),
+}
+
+_PENDING = object()
+
+
+class ProbeCancelled(Exception):
+    pass
+
+
+class ProbeSession:
+    """Tracks the child processes started by one round of probes so the
+    losers can be killed as soon as a higher-priority probe has answered."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._procs = set()
+        self.cancelled = False
+
+    def run(self, args, timeout=PROBE_TIMEOUT):
+        started = time.perf_counter()
+        with self._lock:
+            if self.cancelled:
+                raise ProbeCancelled()
+            try:
+                proc = subprocess.Popen(
+                    args,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.DEVNULL,
+                    text=True,
+                    start_new_session=(os.name == 'posix')
+                )
+            except OSError as e:
+                _record_command(args, started, None, None, False, e)
+                raise
+            self._procs.add(proc)
+        spawned = time.perf_counter()
+        timed_out = False
+        try:
+            stdout, _ = proc.communicate(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            kill_process(proc)
+            proc.communicate()
+            raise
+        finally:
+            with self._lock:
+                self._procs.discard(proc)
+            _record_command(args, started, spawned, proc.returncode, timed_out)
+        if self.cancelled:
+            raise ProbeCancelled()
+        return subprocess.CompletedProcess(args, proc.returncode, stdout, '')
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            procs = list(self._procs)
+        for proc in procs:
+            kill_process(proc)
+
+
+def kill_process(proc):
+    # Vendor tools are often shell wrappers, so take down the whole group or
+    # the grandchild keeps the stdout pipe open.
+    try:
+        if os.name == 'posix':
+            os.killpg(proc.pid, signal.SIGKILL)
+        else:
+            proc.kill()
+    except OSError:
+        pass
+
+
+_stats_lock = threading.Lock()
+_probe_stats = {}
+# The probe running on this thread and the commands it has spawned so far.
+_probe_context = threading.local()
+
+def probe_name(probe):
+    return probe.__name__.removeprefix('probe_')
+
+def get_probe_stats():
+    """Per-probe counters since start-up: runs, errors (the probe raised,
+    e.g. missing tool or timeout), cancelled (stopped because a
+    higher-priority probe answered), seconds_total and last_seconds, plus the
+    commands it spawned (spawns, timeouts, command_seconds_total) and the
+    rest of its time, spent parsing or in library calls
+    (parse_seconds_total)."""
+    with _stats_lock:
+        return {name: dict(stats) for name, stats in _probe_stats.items()}
+
+def _record_command(args, started, spawned, exit_code, timed_out, error=None):
+    ended = time.perf_counter()
+    commands = getattr(_probe_context, 'commands', None)
+    if commands is not None:
+        commands.append((ended - started, timed_out))
+    profiler = ohmygpu_profile.active
+    if profiler is not None:
+        profiler.add(' '.join(args), 'command', started, ended,
+                     spawn_seconds=(spawned or ended) - started, exit_code=exit_code, timed_out=timed_out,
+                     probe=getattr(_probe_context, 'probe', None),
+                     error=(error.strerror or str(error)) if error else None)
+
+def _record_probe(probe, started, error, commands, gpus, cancelled=False):
+    ended = time.perf_counter()
+    seconds = ended - started
+    command_seconds = sum(command[0] for command in commands)
+    parse_seconds = max(seconds - command_seconds, 0.0)
+    with _stats_lock:
+        stats = _probe_stats.get(probe_name(probe))
+        if stats is None:
+            stats = _probe_stats[probe_name(probe)] = {
+                'runs': 0, 'errors': 0, 'cancelled': 0, 'seconds_total': 0.0, 'last_seconds': 0.0,
+                'spawns': 0, 'timeouts': 0, 'command_seconds_total': 0.0, 'parse_seconds_total': 0.0
+            }
+        stats['runs'] += 1
+        stats['errors'] += error is not None
+        stats['cancelled'] += cancelled
+        stats['seconds_total'] += seconds
+        stats['last_seconds'] = seconds
+        stats['spawns'] += len(commands)
+        stats['timeouts'] += sum(1 for command in commands if command[1])
+        stats['command_seconds_total'] += command_seconds
+        stats['parse_seconds_total'] += parse_seconds
+    profiler = ohmygpu_profile.active
+    if profiler is not None:
+        profiler.add(backend_name(probe), 'probe', started, ended, error=error, cancelled=cancelled,
+                     gpus=len(gpus) if gpus else 0, parse_seconds=parse_seconds)
+
+def _call_probe(probe, session):
+    _probe_context.commands = commands = []
+    _probe_context.probe = backend_name(probe)
+    started = time.perf_counter()
+    try:
+        result = probe(session.run)
+    except ProbeCancelled:
+        _record_probe(probe, started, None, commands, None, cancelled=True)
+        return None
+    except Exception as e:
+        _record_probe(probe, started, f"{type(e).__name__}: {e}", commands, None)
+        return None
+    finally:
+        _probe_context.commands = _probe_context.probe = None
+    _record_probe(probe, started, None, commands, result)
+    return result
+
+
+def _run_probe(probe):
+    session = ProbeSession()
+    try:
+        result = _call_probe(probe, session)
+    finally:
+        session.cancel()
+    return (probe, result) if result is not None else (None, None)
+
+def run_probes(probes):
+    """Start every probe at once and return (probe, gpus) for the first one
+    in priority order that succeeded, without waiting for lower-priority
+    probes. Returns (None, None) if every probe failed."""
+    if not probes:
+        return None, None
+    if len(probes) == 1:
+        return _run_probe(probes[0])
+
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    session = ProbeSession()
+    results = [_PENDING] * len(probes)
+    with ThreadPoolExecutor(max_workers=len(probes)) as pool:
+        futures = {
+            pool.submit(_call_probe, probe, session): i
+            for i, probe in enumerate(probes)
+        }
+        try:
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+                for probe, result in zip(probes, results):
+                    if result is _PENDING:
+                        break
+                    if result is not None:
+                        return probe, result
+        finally:
+            session.cancel()
+
+    return None, None
+
+
+def sampler_factory(probe):
+    """The sampler class a backend module registered in its SAMPLERS table
+    to refresh the probe's dynamic fields, or None for a backend that only
+    reports static ones."""
+    return getattr(sys.modules[probe.__module__], 'SAMPLERS', {}).get(probe.__name__)
+
+def load_probe(backend):
+    """Import the backend module named by a 'module:function' entry of
+    BACKENDS and return its probe."""
+    module, _, name = backend.partition(':')
+    return getattr(importlib.import_module(module), name)
+
+def backend_name(probe):
+    return f"{probe.__module__}:{probe.__name__}"
+
+def detect(backends, use_cache=True):
+    """Run the probe chain for backends ('module:function' entries), going
+    straight to the backend that won last time on this boot and PCI
+    topology when the detection cache allows it. Returns (probe, gpus) like
+    run_probes()."""
+    if not use_cache or not backends:
+        return run_probes([load_probe(backend) for backend in backends])
+
+    started = time.perf_counter()
+    key = ohmygpu_cache.topology_key()
+    entry = ohmygpu_cache.load(key)
+    profiler = ohmygpu_profile.active
+    if profiler is not None:
+        profiler.add('detection cache', 'cache', started, time.perf_counter(),
+                     backend=entry['backend'] if entry else None)
+    if entry and entry['backend'] in backends:
+        probe = load_probe(entry['backend'])
+        sampler = sampler_factory(probe)
+        if sampler is None and entry['static']:
+            # Nothing this backend reports can have changed since it was
+            # cached, so skip lspci and the like.
+            return probe, [GpuSample(**gpu) for gpu in entry['static']]
+        if getattr(sampler, 'cached_static', False) and entry['static']:
+            # A slow inventory (system_profiler) is reused and only the
+            # live fields are read, through the backend's sampler.
+            gpus = [GpuSample(**gpu) for gpu in entry['static']]
+            live = sampler(gpus, 0)
+            try:
+                readings = live.read(live.fields)
+            finally:
+                live.close()
+            if readings is not None:
+                for gpu in gpus:
+                    for field, value in readings.get(gpu.index, {}).items():
+                        setattr(gpu, field, value)
+                return probe, gpus
+        result = run_probes([probe])[1]
+        if result is not None:
+            return probe, result
+
+    probe, result = run_probes([load_probe(backend) for backend in backends])
+    if probe is None:
+        ohmygpu_cache.invalidate()
+    else:
+        ohmygpu_cache.store(key, backend_name(probe), [{
+            'index': gpu.index,
+            'bus_id': gpu.bus_id,
+            'name': gpu.name,
+            'memory_total': gpu.memory_total
+        } for gpu in result])
+    return probe, result
+
+
+def platform_name():
+    # Android reports itself as Linux before Python 3.13.
+    if sys.platform == 'android' or 'ANDROID_ROOT' in os.environ:
+        return 'Android'
+    return ohmygpu_cache.system_name()
+
+def platform_backends():
+    return BACKENDS.get(platform_name(), ())
+
+def get_gpu_info(use_cache=True, use_daemon=True):
+    if use_daemon:
+        import ohmygpu_daemon
+
+        gpus = ohmygpu_daemon.read_snapshot()
+        if gpus is not None:
+            return gpus or None
+    return detect(platform_backends(), use_cache)[1]
+
+def process_probes():
+    return [load_probe(backend) for backend in PROCESS_BACKENDS.get(platform_name(), ())]
+
+def run_process_probes(probes):
+    """Run every process probe at once and merge their answers. A backend
+    later in priority order only adds processes on GPUs (bus ids) the
+    earlier ones did not report, e.g. nvidia-smi's compute processes on the
+    NVIDIA card next to fdinfo's DRM clients of the display GPU. Returns
+    None if no backend answered."""
+    if len(probes) < 2:
+        return run_probes(probes)[1]
+
+    from concurrent.futures import ThreadPoolExecutor
+
+    session = ProbeSession()
+    with ThreadPoolExecutor(max_workers=len(probes)) as pool:
+        results = list(pool.map(lambda probe: _call_probe(probe, session), probes))
+    merged, covered = None, set()
+    for processes in results:
+        if processes is None:
+            continue
+        merged = (merged or []) + [process for process in processes if process.bus_id not in covered]
+        covered.update(process.bus_id for process in processes)
+    return merged
+
+def get_process_info():
+    return run_process_probes(process_probes())
+
+def normalize_bus_id(bus_id):
+    """Bring nvidia-smi ('00000000:01:00.0') and lspci ('01:00.0') style bus
+    ids to the sysfs form ('0000:01:00.0')."""
+    if not bus_id:
+        return None
+    parts = bus_id.strip().lower().split(':')
+    domain = parts[0] if len(parts) > 2 else '0'
+    return f"{int(domain, 16):04x}:{parts[-2]}:{parts[-1]}"
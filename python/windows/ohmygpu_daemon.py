@@ -0,0 +1,158 @@
+import json
+import os
+import stat
+import sys
+import time
+
+from ohmygpu_sample import GpuSample
+
+# OHMYGPU_SOCKET moves the daemon's socket, e.g. under /run for a system
+# service. A socket named explicitly is trusted whoever owns it.
+SOCKET_PATH = os.environ.get('OHMYGPU_SOCKET')
+DEFAULT_SOCKET_PATH = '/tmp/oh-my-gpu.sock'
+DEFAULT_INTERVAL = 1
+CLIENT_TIMEOUT = 0.5
+# A snapshot older than this many daemon intervals means the daemon is stuck.
+STALE_INTERVALS = 3
+MIN_STALE_SECONDS = 5
+
+
+def socket_path():
+    return SOCKET_PATH or DEFAULT_SOCKET_PATH
+
+def _trusted(st):
+    # Anyone can create a socket in /tmp, so only believe numbers served by
+    # root or ourselves unless the socket was named explicitly.
+    return SOCKET_PATH is not None or st.st_uid in (0, os.getuid())
+
+def available(path=None):
+    """Cheap check for a daemon socket, without importing socket."""
+    if not hasattr(os, 'getuid'):
+        return False
+    try:
+        st = os.stat(path or socket_path())
+    except OSError:
+        return False
+    return stat.S_ISSOCK(st.st_mode) and _trusted(st)
+
+def encode_snapshot(gpus, interval):
+    return json.dumps({
+        'time': time.time(),
+        'interval': interval,
+        'gpus': [gpu.as_dict() for gpu in gpus] if gpus is not None else None,
+    }, separators=(',', ':')).encode('utf-8')
+
+def _connect(path):
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.settimeout(CLIENT_TIMEOUT)
+        sock.connect(path)
+    except OSError:
+        sock.close()
+        raise
+    return sock
+
+def read_snapshot(path=None):
+    """Return the daemon's latest list of GpuSample, or None if there is
+    no daemon, it has nothing yet or its snapshot is stale, in which case
+    the caller probes directly."""
+    path = path or socket_path()
+    if not available(path):
+        return None
+
+    chunks = []
+    try:
+        with _connect(path) as sock:
+            while chunk := sock.recv(65536):
+                chunks.append(chunk)
+        snapshot = json.loads(b''.join(chunks))
+    except (OSError, ValueError):
+        return None
+
+    # Fields a newer daemon added are dropped; anything else unexpected,
+    # e.g. from an older daemon, counts as no daemon.
+    try:
+        gpus = snapshot.get('gpus')
+        max_age = max(snapshot.get('interval', 0) * STALE_INTERVALS, MIN_STALE_SECONDS)
+        if gpus is None or not 0 <= time.time() - snapshot.get('time', 0) < max_age:
+            return None
+        return [GpuSample(**{field: gpu[field] for field in GpuSample.__slots__ if field in gpu}) for gpu in gpus]
+    except (AttributeError, KeyError, TypeError):
+        return None
+
+def poll_daemon(interval, path=None):
+    """Yield the daemon's snapshot every interval seconds until it goes
+    away."""
+    while True:
+        started = time.monotonic()
+        gpus = read_snapshot(path)
+        if gpus is None:
+            return
+        yield gpus
+        time.sleep(max(interval - (time.monotonic() - started), 0))
+
+
+def serve_daemon(path=None, interval=DEFAULT_INTERVAL, use_cache=True, cadences=None, max_interval=None):
+    """Sample the GPUs once for every viewer on the host and hand each
+    client connecting to path the latest snapshot."""
+    import socketserver
+    from ohmygpu_watch import BackgroundSampler
+
+    if not hasattr(socketserver, 'ThreadingUnixStreamServer'):
+        print("[ERROR] The daemon needs Unix domain sockets.", file=sys.stderr)
+        return False
+
+    # Clients judge staleness by the longest the daemon may go quiet.
+    period = max(interval, max_interval or 0)
+
+    class SnapshotSampler(BackgroundSampler):
+        def __init__(self):
+            super().__init__(interval, use_cache, False, cadences, max_interval)
+            self.snapshot = encode_snapshot(None, period)
+
+        def _publish(self, gpus):
+            self.snapshot = encode_snapshot(gpus, period)
+
+    class SnapshotHandler(socketserver.BaseRequestHandler):
+        def handle(self):
+            self.request.sendall(self.server.sampler.snapshot)
+
+    path = path or socket_path()
+    try:
+        _connect(path).close()
+    except OSError:
+        pass
+    else:
+        print(f"[ERROR] A daemon is already serving {path}", file=sys.stderr)
+        return False
+    try:
+        if stat.S_ISSOCK(os.lstat(path).st_mode):
+            os.unlink(path)
+    except OSError:
+        pass
+
+    try:
+        server = socketserver.ThreadingUnixStreamServer(path, SnapshotHandler)
+    except OSError as e:
+        print(f"[ERROR] Cannot serve on {path}: {e.strerror or e}", file=sys.stderr)
+        return False
+    sampler = SnapshotSampler()
+    server.daemon_threads = True
+    server.sampler = sampler
+    # Viewers run as other users too; the snapshot holds nothing private.
+    os.chmod(path, 0o666)
+    sampler.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sampler.stop()
+        server.server_close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+    return True
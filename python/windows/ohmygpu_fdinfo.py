@@ -0,0 +1,184 @@
+import os
+import threading
+import time
+
+import ohmygpu_sysfs
+from ohmygpu_sample import ProcessSample
+
+DRM_DEVICE_PREFIX = '/dev/dri/'
+# Every this many samples, pids already known not to use the GPU are looked
+# at again, in case they opened a DRM device since.
+RESCAN_EVERY = 30
+# The first sample has nothing to diff engine time against, so it waits
+# this long and samples again.
+FIRST_WINDOW = 0.1
+
+_UNITS = {'': 1, 'KiB': 1024, 'MiB': 1024 ** 2, 'GiB': 1024 ** 3}
+
+
+def parse_fdinfo(text):
+    """Return (pdev, client_id, engines, capacities, memory) from one DRM
+    fdinfo file, or None if the fd is not a DRM client.
+
+    engines holds busy nanoseconds per engine and memory bytes per region,
+    preferring drm-resident-* over drm-total-* and the older drm-memory-*."""
+    pdev = client_id = None
+    engines, capacities = {}, {}
+    memory = {'resident': {}, 'total': {}, 'memory': {}}
+    for line in text.split('\n'):
+        key, _, value = line.partition(':')
+        if not key.startswith('drm-'):
+            continue
+        value = value.split()
+        if not value:
+            continue
+        if key == 'drm-client-id':
+            client_id = value[0]
+        elif key == 'drm-pdev':
+            pdev = value[0]
+        elif key.startswith('drm-engine-capacity-'):
+            capacities[key[len('drm-engine-capacity-'):]] = int(value[0])
+        elif key.startswith('drm-engine-'):
+            engines[key[len('drm-engine-'):]] = int(value[0])
+        else:
+            kind, _, region = key[len('drm-'):].partition('-')
+            if kind in memory and region:
+                memory[kind][region] = int(value[0]) * _UNITS.get(value[1] if len(value) > 1 else '', 1)
+
+    if client_id is None:
+        return None
+    regions = memory['resident'] or memory['total'] or memory['memory']
+    return pdev, client_id, engines, capacities, sum(regions.values()) if regions else None
+
+
+class FdinfoScanner:
+    """Per-process GPU use from /proc/<pid>/fdinfo.
+
+    Scanning every fd of every process is what makes this expensive on a
+    busy host, so the scanner remembers which fds of which pids are DRM
+    clients. A sample reads only those fdinfo files plus the fd tables of
+    pids it has not seen before; the rest of the process table is only
+    walked again every rescan_every samples."""
+
+    def __init__(self, root=ohmygpu_sysfs.PROC_ROOT, rescan_every=RESCAN_EVERY):
+        self.root = root
+        self.rescan_every = rescan_every
+        self.clients = {}
+        self.names = {}
+        self.seen = set()
+        self.samples = 0
+        self._previous = {}
+
+    def _pids(self):
+        try:
+            return {int(entry) for entry in os.listdir(self.root) if entry.isdigit()}
+        except OSError:
+            return set()
+
+    def _drm_fds(self, pid):
+        fd_dir = os.path.join(self.root, str(pid), 'fd')
+        fds = []
+        try:
+            entries = os.listdir(fd_dir)
+        except OSError:
+            return fds
+        for fd in entries:
+            try:
+                target = os.readlink(os.path.join(fd_dir, fd))
+            except OSError:
+                continue
+            if target.startswith(DRM_DEVICE_PREFIX):
+                fds.append(fd)
+        return fds
+
+    def _read(self, pid, name):
+        with open(os.path.join(self.root, str(pid), name), 'r', encoding='utf-8', errors='replace') as f:
+            return f.read()
+
+    def _scan(self):
+        pids = self._pids()
+        if self.samples % self.rescan_every == 0:
+            self.seen = set()
+        for pid in pids - self.seen:
+            fds = self._drm_fds(pid)
+            if not fds:
+                self.clients.pop(pid, None)
+                self.names.pop(pid, None)
+                continue
+            self.clients[pid] = fds
+            if pid not in self.names:
+                try:
+                    self.names[pid] = self._read(pid, 'comm').strip()
+                except OSError:
+                    self.names[pid] = str(pid)
+        self.seen = pids
+        for pid in list(self.clients):
+            if pid not in pids:
+                del self.clients[pid]
+                self.names.pop(pid, None)
+
+    def sample(self):
+        """Return one ProcessSample per process and GPU. Engine percentages
+        cover the time since the previous sample and are None on the first."""
+        self._scan()
+        self.samples += 1
+        now = time.monotonic_ns()
+        timestamp = time.time_ns()
+        current = {}
+        usage = {}
+        for pid, fds in list(self.clients.items()):
+            for fd in fds:
+                try:
+                    parsed = parse_fdinfo(self._read(pid, os.path.join('fdinfo', fd)))
+                except OSError:
+                    parsed = None
+                if parsed is None:
+                    # The fd was closed or reused; look at the whole table
+                    # again next time.
+                    self.seen.discard(pid)
+                    continue
+                pdev, client_id, engines, capacities, memory = parsed
+                # Several fds (dup, fork) can share one client; count it once.
+                client = (pdev, client_id)
+                if client in current:
+                    continue
+                current[client] = engines
+                entry = usage.setdefault((pid, pdev), [0, False, {}])
+                if memory is not None:
+                    entry[0] += memory
+                    entry[1] = True
+                previous = self._previous.get(client)
+                if previous is None:
+                    continue
+                elapsed = now - previous[0]
+                for engine, busy in engines.items():
+                    delta = busy - previous[1].get(engine, busy)
+                    if elapsed > 0 and delta >= 0:
+                        percent = delta / (elapsed * capacities.get(engine, 1)) * 100
+                        entry[2][engine] = entry[2].get(engine, 0.0) + min(percent, 100.0)
+
+        self._previous = {client: (now, engines) for client, engines in current.items()}
+        return [
+            ProcessSample(
+                pid=pid,
+                name=self.names.get(pid, str(pid)),
+                bus_id=pdev,
+                memory_used=memory if has_memory else None,
+                engines=engines if self.samples > 1 else None,
+                timestamp=timestamp
+            )
+            for (pid, pdev), (memory, has_memory, engines) in sorted(usage.items(), key=lambda item: item[0][0])
+        ]
+
+
+_scanner_lock = threading.Lock()
+_scanner = None
+
+def probe_fdinfo(run):
+    global _scanner
+    with _scanner_lock:
+        if _scanner is None:
+            _scanner = FdinfoScanner()
+            _scanner.sample()
+            time.sleep(FIRST_WINDOW)
+        return _scanner.sample() or None
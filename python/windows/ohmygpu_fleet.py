@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+
+from ohmygpu_output import FIELDS
+
+SAMPLES_PATH = '/samples'
+DEFAULT_CONCURRENCY = 64
+DEFAULT_TIMEOUT = 5.0
+# Record fields that are numbers or null; index must be a number.
+NUMERIC_FIELDS = tuple(field for field in FIELDS if field not in ('bus_id', 'name'))
+
+
+class AgentError(Exception):
+    pass
+
+
+def split_address(address):
+    """(host, port) from 'HOST:PORT' or '[v6 address]:PORT'."""
+    host, sep, port = address.rpartition(':')
+    if not sep or not host or not port.isdigit() or int(port) > 65535:
+        raise ValueError(f"expected HOST:PORT, got '{address}'")
+    return host.strip('[]'), int(port)
+
+def parse_agents(values):
+    """Agent addresses from --collect values: comma-separated HOST:PORT
+    lists, or @FILE with one per line and '#' comments. Duplicates are
+    dropped, order is kept."""
+    addresses = []
+    for value in values:
+        if value.startswith('@'):
+            with open(value[1:], 'r', encoding='utf-8') as f:
+                items = [line.split('#', 1)[0] for line in f]
+        else:
+            items = value.split(',')
+        for item in items:
+            item = item.strip()
+            if item:
+                split_address(item)
+                if item not in addresses:
+                    addresses.append(item)
+    return addresses
+
+
+class AgentConnection:
+    """One keep-alive HTTP/1.1 connection to an agent (--serve-metrics),
+    opened on first use and kept for the next round."""
+
+    def __init__(self, address):
+        self.address = address
+        self.host, self.port = split_address(address)
+        self._reader = self._writer = None
+
+    async def fetch(self, path=SAMPLES_PATH):
+        reused = self._writer is not None
+        try:
+            return await self._fetch(path)
+        except (OSError, EOFError):
+            self.close()
+            if not reused:
+                raise
+        # The agent dropped the idle connection; one retry on a fresh one.
+        return await self._fetch(path)
+
+    async def _fetch(self, path):
+        if self._writer is None:
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+        self._writer.write(f"GET {path} HTTP/1.1\r\nHost: {self.address}\r\n\r\n".encode('ascii'))
+        await self._writer.drain()
+
+        status = (await self._reader.readuntil(b'\r\n')).decode('latin-1').split(None, 2)
+        headers = {}
+        while (line := await self._reader.readuntil(b'\r\n')) != b'\r\n':
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        if 'content-length' in headers:
+            body = await self._reader.readexactly(int(headers['content-length']))
+        else:
+            body = await self._reader.read()
+            headers['connection'] = 'close'
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+
+        if len(status) < 2 or status[1] != '200':
+            raise AgentError(f"HTTP {' '.join(status[1:]).strip()}")
+        return body
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        self._reader = self._writer = None
+
+
+def parse_records(address, body):
+    records = []
+    try:
+        lines = body.decode('utf-8').splitlines()
+        for line in lines:
+            if line:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError('not an object')
+                if not isinstance(record.get('index'), int) or not all(
+                        isinstance(record.get(field), (int, float, type(None))) for field in NUMERIC_FIELDS):
+                    raise ValueError('missing or non-numeric fields')
+                if not isinstance(record.get('name'), (str, type(None))):
+                    raise ValueError('name is not a string')
+                records.append({'host': address, **record})
+    except ValueError as e:
+        raise AgentError(f"bad sample: {e}")
+    return records
+
+
+class Collector:
+    """Polls agents with at most `concurrency` requests in flight and
+    timeout seconds per agent, keeping connections open between rounds.
+    Must be created and used inside one event loop."""
+
+    def __init__(self, addresses, concurrency=DEFAULT_CONCURRENCY, timeout=DEFAULT_TIMEOUT):
+        self.connections = [AgentConnection(address) for address in addresses]
+        self.timeout = timeout
+        self._slots = asyncio.Semaphore(concurrency)
+
+    async def _poll(self, connection):
+        async with self._slots:
+            started = time.perf_counter()
+            try:
+                body = await asyncio.wait_for(connection.fetch(), self.timeout)
+                records, error = parse_records(connection.address, body), None
+            except asyncio.TimeoutError:
+                records, error = None, 'timed out'
+            except EOFError:
+                records, error = None, 'connection closed'
+            except OSError as e:
+                records, error = None, e.strerror or str(e) or type(e).__name__
+            except asyncio.LimitOverrunError:
+                records, error = None, 'response header too long'
+            except (AgentError, ValueError) as e:
+                records, error = None, str(e)
+            if error is not None:
+                connection.close()
+            return connection.address, records, error, time.perf_counter() - started
+
+    async def poll(self):
+        """Yield (address, records, error, seconds) for every agent, in the
+        order they answer. records are ohmygpu_output records plus 'host'."""
+        for result in asyncio.as_completed([self._poll(connection) for connection in self.connections]):
+            yield await result
+
+    def close(self):
+        for connection in self.connections:
+            connection.close()
@@ -0,0 +1,232 @@
+import math
+from array import array
+from bisect import bisect_left
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+NS = 1_000_000_000
+
+# (bucket seconds, bucket count): an hour of 1 s points, a day of 1 min
+# rollups and thirty days of 1 h rollups per GPU and metric.
+DEFAULT_LEVELS = ((1, 3600), (60, 24 * 60), (3600, 24 * 30))
+METRICS = ('utilization', 'memory_used', 'temperature')
+MAX_GPUS = 16
+
+_COLUMNS = ('mean', 'min', 'max')
+
+
+class RingBuffer:
+    """Preallocated circular buffer of timestamps plus mean/min/max columns.
+
+    Uses NumPy arrays when NumPy is installed and array.array otherwise.
+    Appends are O(1), and a time window is at most two contiguous slices."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.size = 0
+        self.head = 0
+        if np is not None:
+            self.timestamps = np.zeros(capacity, dtype=np.int64)
+            self.columns = {name: np.full(capacity, np.nan) for name in _COLUMNS}
+        else:
+            self.timestamps = array('q', bytes(8 * capacity))
+            self.columns = {name: array('d', [math.nan]) * capacity for name in _COLUMNS}
+
+    @property
+    def nbytes(self):
+        return self.capacity * 8 * (1 + len(_COLUMNS))
+
+    def append(self, timestamp, mean, minimum, maximum):
+        head = self.head
+        self.timestamps[head] = timestamp
+        self.columns['mean'][head] = mean
+        self.columns['min'][head] = minimum
+        self.columns['max'][head] = maximum
+        self.head = (head + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def _segments(self):
+        if self.size < self.capacity:
+            return [(0, self.size)]
+        return [(self.head, self.capacity), (0, self.head)]
+
+    def window(self, since):
+        """Return {column: values} for every bucket at or after since."""
+        parts = {name: [] for name in _COLUMNS}
+        for start, end in self._segments():
+            if np is not None:
+                first = start + int(np.searchsorted(self.timestamps[start:end], since))
+            else:
+                first = bisect_left(self.timestamps, since, start, end)
+            for name in _COLUMNS:
+                parts[name].append(self.columns[name][first:end])
+
+        if np is not None:
+            return {name: np.concatenate(values) for name, values in parts.items()}
+        return {name: [v for part in values for v in part] for name, values in parts.items()}
+
+
+class _Level:
+    def __init__(self, seconds, capacity):
+        self.resolution = seconds * NS
+        self.buffer = RingBuffer(capacity)
+        self.pending = None
+
+    @property
+    def span(self):
+        return self.resolution * self.buffer.capacity
+
+    def add(self, timestamp, mean, minimum, maximum, count):
+        """Fold a value into the open bucket. Returns the bucket it closed,
+        if any, so it can be rolled up into the next level."""
+        bucket = timestamp // self.resolution
+        closed = None
+        pending = self.pending
+        if pending is not None and bucket != pending[0]:
+            closed = self._close()
+            pending = None
+        if pending is None:
+            self.pending = [bucket, mean * count, count, minimum, maximum]
+        else:
+            pending[1] += mean * count
+            pending[2] += count
+            pending[3] = min(pending[3], minimum)
+            pending[4] = max(pending[4], maximum)
+        return closed
+
+    def _close(self):
+        bucket, total, count, minimum, maximum = self.pending
+        self.pending = None
+        timestamp = bucket * self.resolution
+        self.buffer.append(timestamp, total / count, minimum, maximum)
+        return timestamp, total / count, minimum, maximum, count
+
+
+class RollupSeries:
+    """One metric of one GPU, kept at every resolution in levels."""
+
+    def __init__(self, levels=DEFAULT_LEVELS):
+        self.levels = [_Level(seconds, capacity) for seconds, capacity in levels]
+
+    @property
+    def nbytes(self):
+        return sum(level.buffer.nbytes for level in self.levels)
+
+    def add(self, timestamp, value):
+        if value is None:
+            return
+        rolled = (timestamp, value, value, value, 1)
+        for level in self.levels:
+            rolled = level.add(*rolled)
+            if rolled is None:
+                break
+
+    def window(self, since, level=0):
+        level = self.levels[level]
+        values = level.buffer.window(since)
+        if level.pending is not None:
+            bucket, total, count, minimum, maximum = level.pending
+            pending = {'mean': total / count, 'min': minimum, 'max': maximum}
+            if np is not None:
+                values = {name: np.append(column, pending[name]) for name, column in values.items()}
+            else:
+                for name, column in values.items():
+                    column.append(pending[name])
+        return values
+
+    def level_for(self, seconds):
+        """Pick the finest level whose ring still covers the window."""
+        for i, level in enumerate(self.levels):
+            if level.span >= seconds * NS:
+                return i
+        return len(self.levels) - 1
+
+
+def _percentile(ordered, q):
+    # Linear interpolation, matching numpy.percentile's default.
+    position = (len(ordered) - 1) * q / 100
+    low = math.floor(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+def summarize(values):
+    """min/max/mean/p95/p99 over a window. With rolled-up levels the
+    percentiles are taken over bucket means."""
+    means, minimums, maximums = values['mean'], values['min'], values['max']
+    if np is not None:
+        keep = ~np.isnan(means)
+        means = means[keep]
+        if not means.size:
+            return None
+        p95, p99 = np.percentile(means, [95, 99])
+        return {
+            'count': int(means.size),
+            'min': float(minimums[keep].min()),
+            'max': float(maximums[keep].max()),
+            'mean': float(means.mean()),
+            'p95': float(p95),
+            'p99': float(p99),
+        }
+
+    rows = [row for row in zip(means, minimums, maximums) if not math.isnan(row[0])]
+    if not rows:
+        return None
+    ordered = sorted(row[0] for row in rows)
+    return {
+        'count': len(rows),
+        'min': min(row[1] for row in rows),
+        'max': max(row[2] for row in rows),
+        'mean': math.fsum(ordered) / len(ordered),
+        'p95': _percentile(ordered, 95),
+        'p99': _percentile(ordered, 99),
+    }
+
+
+class MetricsStore:
+    """Bounded in-process history of GpuSample values.
+
+    Every GPU (up to max_gpus) gets a RollupSeries per metric. Series are
+    allocated on first sight but their size is fixed, so max_nbytes is an
+    upper bound known before the first sample arrives."""
+
+    def __init__(self, levels=DEFAULT_LEVELS, metrics=METRICS, max_gpus=MAX_GPUS):
+        self.levels = levels
+        self.metrics = metrics
+        self.max_gpus = max_gpus
+        self.series = {}
+        self.latest = None
+
+    @property
+    def max_nbytes(self):
+        per_series = sum(capacity for _, capacity in self.levels) * 8 * (1 + len(_COLUMNS))
+        return per_series * len(self.metrics) * self.max_gpus
+
+    @staticmethod
+    def key(gpu):
+        return gpu.bus_id or gpu.index
+
+    def add(self, gpus):
+        for gpu in gpus:
+            key = self.key(gpu)
+            series = self.series.get(key)
+            if series is None:
+                if len(self.series) >= self.max_gpus:
+                    continue
+                series = self.series[key] = {metric: RollupSeries(self.levels) for metric in self.metrics}
+            for metric in self.metrics:
+                series[metric].add(gpu.timestamp, getattr(gpu, metric))
+            if self.latest is None or gpu.timestamp > self.latest:
+                self.latest = gpu.timestamp
+
+    def stats(self, gpu, metric, seconds, now=None):
+        """Rolling statistics for one GPU (a GpuSample or its key) over the
+        last seconds, or None if nothing was recorded in that window."""
+        key = gpu if isinstance(gpu, (str, int)) else self.key(gpu)
+        series = self.series.get(key, {}).get(metric)
+        if series is None or self.latest is None:
+            return None
+        now = self.latest if now is None else now
+        return summarize(series.window(now - int(seconds * NS), series.level_for(seconds)))
@@ -0,0 +1,154 @@
+import json
+import re
+import subprocess
+
+import ohmygpu_core
+from ohmygpu_sample import GpuSample, MIB
+
+SYSTEM_PROFILER = ['system_profiler', 'SPDisplaysDataType', '-json']
+IOREG = ['ioreg', '-r', '-d', '1', '-w', '0', '-a', '-c', 'IOAccelerator']
+
+# PerformanceStatistics keys per field, in order of preference. Apple
+# Silicon and Intel report memory as system memory in use, AMD as VRAM.
+IOREG_FIELDS = {
+    'utilization': ('Device Utilization %', 'GPU Activity(%)'),
+    'memory_used': ('vramUsedBytes', 'In use system memory'),
+    'temperature': ('Temperature(C)',),
+    'power': ('Total Power(W)',),
+    'clock_graphics': ('Core Clock(MHz)',),
+    'clock_memory': ('Memory Clock(MHz)',),
+}
+
+_SIZE_RE = re.compile(r'(\d+)\s*([MG])')
+_SIZE_UNITS = {'M': MIB, 'G': 1024 * MIB}
+
+
+def _parse_size(text):
+    match = _SIZE_RE.search(text or '')
+    return int(match.group(1)) * _SIZE_UNITS[match.group(2)] if match else None
+
+def parse_system_profiler_json(text):
+    try:
+        displays = json.loads(text).get('SPDisplaysDataType')
+    except (ValueError, AttributeError):
+        return None
+    if not isinstance(displays, list):
+        return None
+
+    gpus = []
+    for display in displays:
+        name = display.get('sppci_model') or display.get('_name')
+        if not name:
+            continue
+        # 'spdisplays_vram' on discrete cards, '_vram_shared' on integrated
+        # Intel ones; Apple Silicon has unified memory and reports neither.
+        vram = next((value for key, value in sorted(display.items()) if key.startswith('spdisplays_vram')), None)
+        gpus.append(GpuSample(len(gpus), name, memory_total=_parse_size(vram)))
+    return gpus
+
+def parse_system_profiler_text(text):
+    """The plain-text report, for macOS releases without -json."""
+    gpus = []
+    for line in text.split('\n'):
+        if 'Chipset Model' in line:
+            gpus.append(GpuSample(len(gpus), line.split(': ', 1)[-1].strip()))
+        if 'VRAM' in line and gpus:
+            gpus[-1].memory_total = _parse_size(line.split(': ', 1)[-1])
+    return gpus
+
+
+def parse_ioreg(data):
+    """Return (model, PerformanceStatistics) per IOAccelerator from
+    'ioreg -a' plist output."""
+    import plistlib
+
+    try:
+        entries = plistlib.loads(data.encode('utf-8') if isinstance(data, str) else data)
+    except Exception:
+        return []
+    if isinstance(entries, dict):
+        entries = [entries]
+    accelerators = []
+    for entry in entries if isinstance(entries, list) else []:
+        stats = entry.get('PerformanceStatistics') if isinstance(entry, dict) else None
+        if not isinstance(stats, dict):
+            continue
+        model = entry.get('model')
+        if isinstance(model, bytes):
+            model = model.rstrip(b'\x00').decode('utf-8', 'replace')
+        accelerators.append((model or None, stats))
+    return accelerators
+
+def ioreg_values(stats):
+    values = {}
+    for field, keys in IOREG_FIELDS.items():
+        value = next((stats[key] for key in keys if isinstance(stats.get(key), (int, float))), None)
+        if value is not None and field != 'memory_used':
+            value = float(value)
+        values[field] = value
+    return values
+
+def match_accelerators(gpus, accelerators):
+    """Pair each GPU with its IOAccelerator, by model name where ioreg
+    gives one and in order otherwise. Returns {index: values}."""
+    remaining = list(accelerators)
+    matched = {}
+    for gpu in gpus:
+        name = (gpu.name or '').lower()
+        match = next((entry for entry in remaining if (entry[0] or '').lower() == name), None)
+        if match is not None:
+            remaining.remove(match)
+            matched[gpu.index] = match
+    for gpu in gpus:
+        if gpu.index not in matched and remaining:
+            matched[gpu.index] = remaining.pop(0)
+    return {index: ioreg_values(stats) for index, (model, stats) in matched.items()}
+
+def read_ioreg(run, gpus):
+    try:
+        result = run(IOREG)
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    if result.returncode != 0:
+        return None
+    return match_accelerators(gpus, parse_ioreg(result.stdout))
+
+
+def probe_system_profiler(run):
+    result = run(SYSTEM_PROFILER)
+    gpus = parse_system_profiler_json(result.stdout) if result.returncode == 0 else None
+    if gpus is None:
+        result = run(SYSTEM_PROFILER[:-1])
+        if result.returncode != 0:
+            return None
+        gpus = parse_system_profiler_text(result.stdout)
+    if not gpus:
+        return None
+
+    for index, values in (read_ioreg(run, gpus) or {}).items():
+        for field, value in values.items():
+            setattr(gpus[index], field, value)
+    return gpus
+
+
+class IoregSampler:
+    """system_profiler takes seconds, so it only runs at discovery and its
+    inventory is served from the detection cache after that; every tick
+    is one ioreg call."""
+
+    fields = tuple(IOREG_FIELDS)
+    cached_static = True
+
+    def __init__(self, gpus, interval):
+        self.gpus = gpus
+
+    def read(self, fields):
+        readings = read_ioreg(ohmygpu_core.ProbeSession().run, self.gpus)
+        if not readings:
+            return None
+        return {index: {field: values[field] for field in fields} for index, values in readings.items()}
+
+    def close(self):
+        pass
+
+SAMPLERS = {'probe_system_profiler': IoregSampler}
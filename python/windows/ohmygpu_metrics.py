@@ -0,0 +1,179 @@
+import json
+import socket
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ohmygpu_core
+from ohmygpu_output import sample_record
+from ohmygpu_watch import BackgroundSampler, get_sampling_stats
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SAMPLES_CONTENT_TYPE = 'application/x-ndjson'
+DEFAULT_INTERVAL = 5
+KEEPALIVE_TIMEOUT = 120
+
+_GPU_METRICS = (
+    ('ohmygpu_memory_total_bytes', 'memory_total', 'Total GPU memory in bytes.'),
+    ('ohmygpu_memory_used_bytes', 'memory_used', 'Used GPU memory in bytes.'),
+    ('ohmygpu_utilization_percent', 'utilization', 'GPU utilization in percent.'),
+    ('ohmygpu_temperature_celsius', 'temperature', 'GPU temperature in degrees Celsius.'),
+    ('ohmygpu_power_watts', 'power', 'GPU power draw in watts.'),
+    ('ohmygpu_clock_graphics_mhz', 'clock_graphics', 'GPU graphics clock in MHz.'),
+    ('ohmygpu_clock_memory_mhz', 'clock_memory', 'GPU memory clock in MHz.'),
+)
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def render_metrics(gpus, probe_stats, sampler_stats, sampling_stats=None):
+    lines = []
+    for metric, field, help_text in _GPU_METRICS:
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} gauge")
+        for gpu in gpus or ():
+            value = getattr(gpu, field)
+            if value is None:
+                continue
+            labels = f'gpu="{gpu.index}",bus_id="{_label(gpu.bus_id or "")}",name="{_label(gpu.name)}"'
+            lines.append(f"{metric}{{{labels}}} {value}")
+
+    lines.append("# HELP ohmygpu_probe_runs_total Backend probes run, by probe.")
+    lines.append("# TYPE ohmygpu_probe_runs_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_runs_total{{probe="{name}"}} {stats["runs"]}')
+    lines.append("# HELP ohmygpu_probe_errors_total Backend probes that failed or timed out, by probe.")
+    lines.append("# TYPE ohmygpu_probe_errors_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_errors_total{{probe="{name}"}} {stats["errors"]}')
+    lines.append("# HELP ohmygpu_probe_duration_seconds Wall time of the last run, by probe.")
+    lines.append("# TYPE ohmygpu_probe_duration_seconds gauge")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_duration_seconds{{probe="{name}"}} {stats["last_seconds"]:.6f}')
+    lines.append("# HELP ohmygpu_probe_duration_seconds_total Total wall time, by probe.")
+    lines.append("# TYPE ohmygpu_probe_duration_seconds_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_duration_seconds_total{{probe="{name}"}} {stats["seconds_total"]:.6f}')
+    lines.append("# HELP ohmygpu_probe_cancelled_total Backend probes stopped because a higher-priority one answered, by probe.")
+    lines.append("# TYPE ohmygpu_probe_cancelled_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_cancelled_total{{probe="{name}"}} {stats["cancelled"]}')
+    lines.append("# HELP ohmygpu_probe_spawns_total Commands started by backend probes, by probe.")
+    lines.append("# TYPE ohmygpu_probe_spawns_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_spawns_total{{probe="{name}"}} {stats["spawns"]}')
+    lines.append("# HELP ohmygpu_probe_timeouts_total Commands killed for running past the timeout, by probe.")
+    lines.append("# TYPE ohmygpu_probe_timeouts_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_timeouts_total{{probe="{name}"}} {stats["timeouts"]}')
+    lines.append("# HELP ohmygpu_probe_command_seconds_total Wall time spent in spawned commands, by probe.")
+    lines.append("# TYPE ohmygpu_probe_command_seconds_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_command_seconds_total{{probe="{name}"}} {stats["command_seconds_total"]:.6f}')
+    lines.append("# HELP ohmygpu_probe_parse_seconds_total Wall time spent outside commands, parsing or in libraries, by probe.")
+    lines.append("# TYPE ohmygpu_probe_parse_seconds_total counter")
+    for name, stats in sorted(probe_stats.items()):
+        lines.append(f'ohmygpu_probe_parse_seconds_total{{probe="{name}"}} {stats["parse_seconds_total"]:.6f}')
+
+    lines.append("# HELP ohmygpu_samples_total Samples taken by the background sampler.")
+    lines.append("# TYPE ohmygpu_samples_total counter")
+    lines.append(f"ohmygpu_samples_total {sampler_stats['samples']}")
+    lines.append("# HELP ohmygpu_sampler_errors_total Times the sampler lost its backend and restarted.")
+    lines.append("# TYPE ohmygpu_sampler_errors_total counter")
+    lines.append(f"ohmygpu_sampler_errors_total {sampler_stats['errors']}")
+    lines.append("# HELP ohmygpu_last_sample_timestamp_seconds When the served values were sampled.")
+    lines.append("# TYPE ohmygpu_last_sample_timestamp_seconds gauge")
+    lines.append(f"ohmygpu_last_sample_timestamp_seconds {sampler_stats['last_sample']:.3f}")
+
+    if sampling_stats is not None:
+        lines.append("# HELP ohmygpu_sampling_cpu_seconds_total CPU time spent reading and assembling samples.")
+        lines.append("# TYPE ohmygpu_sampling_cpu_seconds_total counter")
+        lines.append(f"ohmygpu_sampling_cpu_seconds_total {sampling_stats['cpu_seconds_total']:.6f}")
+        lines.append("# HELP ohmygpu_sampling_interval_seconds Sampling interval currently in effect.")
+        lines.append("# TYPE ohmygpu_sampling_interval_seconds gauge")
+        lines.append(f"ohmygpu_sampling_interval_seconds {sampling_stats['last_interval']:.3f}")
+        lines.append("# HELP ohmygpu_sampling_core_fraction Share of one core spent on sampling.")
+        lines.append("# TYPE ohmygpu_sampling_core_fraction gauge")
+        lines.append(f"ohmygpu_sampling_core_fraction {sampling_stats['core_fraction']:.6f}")
+    return ("\n".join(lines) + "\n").encode('utf-8')
+
+def render_samples(gpus):
+    """The latest sample as NDJSON, one ohmygpu_output record per GPU, for
+    the fleet collector."""
+    return ''.join(json.dumps(sample_record(gpu), separators=(',', ':')) + '\n' for gpu in gpus or ()).encode('utf-8')
+
+
+class MetricsSampler(BackgroundSampler):
+    """Keeps the rendered exposition and samples in bytes buffers, so a
+    scrape never waits on a backend."""
+
+    def __init__(self, interval=DEFAULT_INTERVAL, use_cache=True, use_daemon=True, cadences=None,
+                 max_interval=None):
+        super().__init__(interval, use_cache, use_daemon, cadences, max_interval)
+        self.exposition = render_metrics(None, ohmygpu_core.get_probe_stats(), self.stats)
+        # None until the first sample, then b'' while no GPU is found.
+        self.samples = None
+
+    def _publish(self, gpus):
+        # Swapping the reference is atomic, so handlers never see a
+        # half-built buffer and never need a lock.
+        self.exposition = render_metrics(gpus, ohmygpu_core.get_probe_stats(), self.stats, get_sampling_stats())
+        self.samples = render_samples(gpus)
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so a collector polling many agents reuses its connections;
+    # idle ones are dropped after KEEPALIVE_TIMEOUT.
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+
+    def do_GET(self):
+        path = self.path.split('?', 1)[0]
+        if path in ('/', '/metrics'):
+            body, content_type = self.server.sampler.exposition, CONTENT_TYPE
+        elif path == '/samples':
+            body, content_type = self.server.sampler.samples, SAMPLES_CONTENT_TYPE
+            if body is None:
+                self.send_error(503, 'No sample yet')
+                return
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def parse_address(address):
+    """(host, port) from HOST:PORT, [IPv6]:PORT or :PORT for every IPv4
+    interface. Raises ValueError."""
+    from ohmygpu_fleet import split_address
+
+    if address.startswith(':'):
+        address = '0.0.0.0' + address
+    return split_address(address)
+
+class MetricsServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+class MetricsServer6(MetricsServer):
+    address_family = socket.AF_INET6
+
+def serve_metrics(address, interval=DEFAULT_INTERVAL, use_cache=True, use_daemon=True, cadences=None,
+                  max_interval=None):
+    sampler = MetricsSampler(interval, use_cache, use_daemon, cadences, max_interval)
+    host, port = parse_address(address)
+    server = (MetricsServer6 if ':' in host else MetricsServer)((host, port), MetricsHandler)
+    server.sampler = sampler
+    sampler.start()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sampler.stop()
+        server.server_close()
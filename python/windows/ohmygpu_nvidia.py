@@ -0,0 +1,119 @@
+import os
+import subprocess
+import threading
+
+import ohmygpu_core
+from ohmygpu_sample import GpuSample, ProcessSample, parse_mib, parse_number
+
+NVIDIA_SMI_QUERY = '--query-gpu=index,pci.bus_id,name,memory.total,memory.used,utilization.gpu,temperature.gpu'
+NVIDIA_SMI_FORMAT = '--format=csv,noheader,nounits'
+NVIDIA_SMI_APPS_QUERY = '--query-compute-apps=pid,gpu_bus_id,used_memory,process_name'
+
+
+def parse_nvidia_smi_line(line):
+    info = [part.strip() for part in line.split(',')]
+    if len(info) < 7:
+        return None
+    return GpuSample(
+        index=int(info[0]),
+        bus_id=ohmygpu_core.normalize_bus_id(info[1]),
+        name=', '.join(info[2:-4]),
+        memory_total=parse_mib(info[-4]),
+        memory_used=parse_mib(info[-3]),
+        utilization=parse_number(info[-2]),
+        temperature=parse_number(info[-1])
+    )
+
+def probe_nvidia_smi(run):
+    result = run(['nvidia-smi', NVIDIA_SMI_QUERY, NVIDIA_SMI_FORMAT])
+    if result.returncode != 0:
+        return None
+
+    gpus = []
+    for line in result.stdout.strip().split('\n'):
+        gpu = parse_nvidia_smi_line(line)
+        if gpu is not None:
+            gpus.append(gpu)
+    return sorted(gpus, key=lambda gpu: gpu.index) or None
+
+def probe_nvidia_smi_processes(run):
+    """Compute processes as nvidia-smi reports them: memory only, since it
+    has no per-process engine time."""
+    result = run(['nvidia-smi', NVIDIA_SMI_APPS_QUERY, NVIDIA_SMI_FORMAT])
+    if result.returncode != 0:
+        return None
+
+    processes = []
+    for line in result.stdout.strip().split('\n'):
+        info = [part.strip() for part in line.split(',', 3)]
+        if len(info) < 4 or not info[0].isdigit():
+            continue
+        processes.append(ProcessSample(
+            pid=int(info[0]),
+            name=info[3].rsplit('/', 1)[-1].rsplit('\\', 1)[-1],
+            bus_id=ohmygpu_core.normalize_bus_id(info[1]),
+            memory_used=parse_mib(info[2])
+        ))
+    return processes or None
+
+class NvidiaSmiSampler:
+    """Keeps one long-lived 'nvidia-smi -lms' child instead of spawning
+    nvidia-smi every tick. A reader thread keeps the latest complete tick,
+    so read() never blocks on the pipe once the first tick is in."""
+
+    fields = ('memory_used', 'utilization', 'temperature')
+
+    def __init__(self, gpus, interval):
+        self.proc = subprocess.Popen(
+            ['nvidia-smi', NVIDIA_SMI_QUERY, NVIDIA_SMI_FORMAT,
+             '-lms', str(max(int(interval * 1000), 1))],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True,
+            bufsize=1,
+            start_new_session=(os.name == 'posix')
+        )
+        self.latest = None
+        self._timeout = interval + ohmygpu_core.PROBE_TIMEOUT
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._read_ticks, args=(len(gpus),), daemon=True)
+        self._thread.start()
+
+    def _read_ticks(self, gpu_count):
+        batch = []
+        try:
+            for line in self.proc.stdout:
+                gpu = parse_nvidia_smi_line(line)
+                if gpu is None:
+                    continue
+                # Every tick repeats the GPUs in index order, so a
+                # non-increasing index starts the next tick.
+                if batch and gpu.index <= batch[-1].index:
+                    batch = []
+                batch.append(gpu)
+                if len(batch) == gpu_count:
+                    self.latest = {
+                        gpu.index: {field: getattr(gpu, field) for field in self.fields}
+                        for gpu in batch
+                    }
+                    self._ready.set()
+                    batch = []
+        finally:
+            # nvidia-smi exited, e.g. across a driver reload.
+            self.latest = None
+            self._ready.set()
+
+    def read(self, fields):
+        self._ready.wait(self._timeout)
+        latest = self.latest
+        if latest is None:
+            return None
+        return {index: {field: values[field] for field in fields} for index, values in latest.items()}
+
+    def close(self):
+        ohmygpu_core.kill_process(self.proc)
+        self.proc.wait()
+        self._thread.join(timeout=1)
+        self.proc.stdout.close()
+
+SAMPLERS = {'probe_nvidia_smi': NvidiaSmiSampler}
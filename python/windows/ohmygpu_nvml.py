@@ -0,0 +1,227 @@
+import ctypes
+import os
+import sys
+import threading
+
+import ohmygpu_core
+from ohmygpu_sample import GpuSample
+
+NVML_SUCCESS = 0
+NVML_TEMPERATURE_GPU = 0
+NVML_CLOCK_GRAPHICS = 0
+NVML_CLOCK_MEM = 2
+NVML_DEVICE_NAME_BUFFER_SIZE = 96
+
+FIELDS = ('memory_used', 'utilization', 'temperature', 'power', 'clock_graphics', 'clock_memory')
+
+# Codes meaning "this GPU cannot report that"; anything else is an error.
+NVML_UNAVAILABLE = {
+    2,   # NVML_ERROR_INVALID_ARGUMENT, e.g. a sensor the board lacks
+    3,   # NVML_ERROR_NOT_SUPPORTED
+    4,   # NVML_ERROR_NO_PERMISSION
+    6,   # NVML_ERROR_NOT_FOUND
+}
+
+# OHMYGPU_NVML_LIBRARY loads another build instead, e.g. a stub library.
+NVML_LIBRARY = os.environ.get('OHMYGPU_NVML_LIBRARY')
+
+
+class NvmlError(Exception):
+    def __init__(self, function, code):
+        super().__init__(f"{function} failed with NVML error {code}")
+        self.function = function
+        self.code = code
+
+
+class _PciInfo(ctypes.Structure):
+    _fields_ = [
+        ('busIdLegacy', ctypes.c_char * 16),
+        ('domain', ctypes.c_uint),
+        ('bus', ctypes.c_uint),
+        ('device', ctypes.c_uint),
+        ('pciDeviceId', ctypes.c_uint),
+        ('pciSubSystemId', ctypes.c_uint),
+        ('busId', ctypes.c_char * 32),
+    ]
+
+class _Memory(ctypes.Structure):
+    _fields_ = [
+        ('total', ctypes.c_ulonglong),
+        ('free', ctypes.c_ulonglong),
+        ('used', ctypes.c_ulonglong),
+    ]
+
+class _Utilization(ctypes.Structure):
+    _fields_ = [
+        ('gpu', ctypes.c_uint),
+        ('memory', ctypes.c_uint),
+    ]
+
+
+def library_paths():
+    if NVML_LIBRARY:
+        return [NVML_LIBRARY]
+    if sys.platform == 'win32':
+        program_files = os.environ.get('ProgramFiles', r'C:\Program Files')
+        return ['nvml.dll', os.path.join(program_files, 'NVIDIA Corporation', 'NVSMI', 'nvml.dll')]
+    return ['libnvidia-ml.so.1', 'libnvidia-ml.so']
+
+def load_library():
+    for path in library_paths():
+        try:
+            return ctypes.CDLL(path)
+        except OSError:
+            continue
+    return None
+
+
+class Nvml:
+    """An initialised NVML session.
+
+    lib is anything exposing NVML's symbols as attributes: the loaded
+    ctypes.CDLL, a stub shared library, or an object of Python functions
+    taking the same ctypes arguments. Devices and their static fields are
+    read once by discover(); read() then costs one plain call per GPU and
+    dynamic field into preallocated structures."""
+
+    def __init__(self, lib):
+        self.lib = lib
+        self.devices = []
+        self._memory = _Memory()
+        self._utilization = _Utilization()
+        self._value = ctypes.c_uint()
+        self._call('nvmlInit_v2')
+
+    def _call(self, function, *args):
+        code = getattr(self.lib, function)(*args)
+        if code != NVML_SUCCESS:
+            raise NvmlError(function, code)
+
+    def _read(self, function, *args):
+        """Like _call(), but returns False for a reading the GPU does not
+        offer."""
+        code = getattr(self.lib, function)(*args)
+        if code == NVML_SUCCESS:
+            return True
+        if code in NVML_UNAVAILABLE:
+            return False
+        raise NvmlError(function, code)
+
+    def discover(self):
+        count = ctypes.c_uint()
+        self._call('nvmlDeviceGetCount_v2', ctypes.byref(count))
+        self.devices = []
+        for index in range(count.value):
+            handle = ctypes.c_void_p()
+            self._call('nvmlDeviceGetHandleByIndex_v2', ctypes.c_uint(index), ctypes.byref(handle))
+            name = ctypes.create_string_buffer(NVML_DEVICE_NAME_BUFFER_SIZE)
+            self._call('nvmlDeviceGetName', handle, name, ctypes.c_uint(NVML_DEVICE_NAME_BUFFER_SIZE))
+            pci = _PciInfo()
+            bus_id = None
+            if self._read('nvmlDeviceGetPciInfo_v3', handle, ctypes.byref(pci)):
+                # busId carries the PCI function, which multi-function and
+                # SR-IOV devices need to match sysfs and fdinfo.
+                bus_id = ohmygpu_core.normalize_bus_id((pci.busId or pci.busIdLegacy).decode('ascii', 'replace'))
+            memory_total = None
+            if self._read('nvmlDeviceGetMemoryInfo', handle, ctypes.byref(self._memory)):
+                memory_total = self._memory.total
+            self.devices.append((index, handle, name.value.decode('utf-8', 'replace'), bus_id, memory_total))
+
+    def read(self, fields=FIELDS):
+        """Return {index: {field: value}} for the given dynamic fields,
+        making only the NVML calls those fields need."""
+        memory, utilization, value = self._memory, self._utilization, self._value
+        value_ref = ctypes.byref(value)
+        want = set(fields)
+        readings = {}
+        for index, handle, name, bus_id, memory_total in self.devices:
+            values = readings[index] = {}
+            if 'memory_used' in want and self._read('nvmlDeviceGetMemoryInfo', handle, ctypes.byref(memory)):
+                values['memory_used'] = memory.used
+            if 'utilization' in want and self._read('nvmlDeviceGetUtilizationRates', handle, ctypes.byref(utilization)):
+                values['utilization'] = float(utilization.gpu)
+            if 'temperature' in want and self._read('nvmlDeviceGetTemperature', handle, NVML_TEMPERATURE_GPU, value_ref):
+                values['temperature'] = float(value.value)
+            if 'power' in want and self._read('nvmlDeviceGetPowerUsage', handle, value_ref):
+                values['power'] = value.value / 1000
+            if 'clock_graphics' in want and self._read('nvmlDeviceGetClockInfo', handle, NVML_CLOCK_GRAPHICS, value_ref):
+                values['clock_graphics'] = value.value
+            if 'clock_memory' in want and self._read('nvmlDeviceGetClockInfo', handle, NVML_CLOCK_MEM, value_ref):
+                values['clock_memory'] = value.value
+        return readings
+
+    def sample(self):
+        readings = self.read()
+        return [
+            GpuSample(index, name, bus_id, memory_total, **readings[index])
+            for index, handle, name, bus_id, memory_total in self.devices
+        ]
+
+    def close(self):
+        self.devices = []
+        self.lib.nvmlShutdown()
+
+
+_session_lock = threading.Lock()
+_session = None
+
+def open_session(lib=None):
+    """Return the process-wide NVML session, loading the library and
+    initialising NVML on first use. Returns None if NVML is unavailable."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            lib = lib or load_library()
+            if lib is None:
+                return None
+            session = Nvml(lib)
+            try:
+                session.discover()
+            except Exception:
+                session.close()
+                raise
+            _session = session
+        return _session
+
+def close_session():
+    """Drop the shared session, e.g. after the driver lost a GPU, so the
+    next open_session() starts over."""
+    global _session
+    with _session_lock:
+        session, _session = _session, None
+    if session is not None:
+        try:
+            session.close()
+        except NvmlError:
+            pass
+
+def probe_nvml(run):
+    session = open_session()
+    if session is None:
+        return None
+    try:
+        return session.sample() or None
+    except NvmlError:
+        close_session()
+        raise
+
+
+class NvmlSampler:
+    fields = FIELDS
+
+    def __init__(self, gpus, interval):
+        self.session = open_session()
+        if self.session is None:
+            raise NvmlError('nvmlInit_v2', None)
+
+    def read(self, fields):
+        try:
+            return self.session.read(fields)
+        except NvmlError:
+            close_session()
+            return None
+
+    def close(self):
+        pass
+
+SAMPLERS = {'probe_nvml': NvmlSampler}
@@ -0,0 +1,121 @@
+import csv
+import io
+import json
+import sys
+import time
+
+FORMATS = ('json', 'ndjson', 'csv')  # mirrored in ohmygpu_cmd
+FIELDS = (
+    'timestamp_ns',
+    'index',
+    'bus_id',
+    'name',
+    'memory_total_bytes',
+    'memory_used_bytes',
+    'utilization_percent',
+    'temperature_celsius',
+    'power_watts',
+    'clock_graphics_mhz',
+    'clock_memory_mhz',
+)
+
+FLUSH_RECORDS = 512
+FLUSH_INTERVAL = 5.0
+
+
+def sample_record(gpu):
+    return {
+        'timestamp_ns': gpu.timestamp,
+        'index': gpu.index,
+        'bus_id': gpu.bus_id,
+        'name': gpu.name,
+        'memory_total_bytes': gpu.memory_total,
+        'memory_used_bytes': gpu.memory_used,
+        'utilization_percent': gpu.utilization,
+        'temperature_celsius': gpu.temperature,
+        'power_watts': gpu.power,
+        'clock_graphics_mhz': gpu.clock_graphics,
+        'clock_memory_mhz': gpu.clock_memory,
+    }
+
+
+class SampleWriter:
+    """Writes one record per GPU per sample.
+
+    Records are rendered into an in-memory buffer and handed to the stream
+    in one write per batch: every FLUSH_RECORDS records or FLUSH_INTERVAL
+    seconds. A terminal is flushed after every sample so it stays live."""
+
+    def __init__(self, stream=None, flush_records=FLUSH_RECORDS, flush_interval=FLUSH_INTERVAL):
+        self.stream = stream or sys.stdout
+        interactive = getattr(self.stream, 'isatty', lambda: False)()
+        self.flush_records = 1 if interactive else flush_records
+        self.flush_interval = 0 if interactive else flush_interval
+        self._buffer = io.StringIO()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def write(self, gpus):
+        for gpu in gpus:
+            self._write_record(sample_record(gpu))
+            self._pending += 1
+        if (self._pending >= self.flush_records
+                or time.monotonic() - self._last_flush >= self.flush_interval):
+            self.flush()
+
+    def flush(self):
+        data = self._buffer.getvalue()
+        if data:
+            self.stream.write(data)
+            self._buffer.seek(0)
+            self._buffer.truncate()
+        self.stream.flush()
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def close(self):
+        self.flush()
+
+    def _write_record(self, record):
+        raise NotImplementedError
+
+
+class NdjsonWriter(SampleWriter):
+    def _write_record(self, record):
+        self._buffer.write(json.dumps(record, separators=(',', ':')))
+        self._buffer.write('\n')
+
+
+class JsonWriter(SampleWriter):
+    """A single JSON array, streamed element by element."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._buffer.write('[')
+        self._first = True
+
+    def _write_record(self, record):
+        if not self._first:
+            self._buffer.write(',')
+        self._first = False
+        self._buffer.write('\n  ')
+        self._buffer.write(json.dumps(record, separators=(', ', ': ')))
+
+    def close(self):
+        self._buffer.write('\n]\n' if not self._first else ']\n')
+        super().close()
+
+
+class CsvWriter(SampleWriter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._csv = csv.DictWriter(self._buffer, fieldnames=FIELDS, lineterminator='\n')
+        self._csv.writeheader()
+
+    def _write_record(self, record):
+        self._csv.writerow(record)
+
+
+def open_writer(fmt, stream=None):
+    writers = {'json': JsonWriter, 'ndjson': NdjsonWriter, 'csv': CsvWriter}
+    return writers[fmt](stream)
@@ -0,0 +1,95 @@
+import re
+
+import ohmygpu_core
+import ohmygpu_pciids
+import ohmygpu_sysfs
+from ohmygpu_sample import GpuSample
+
+
+def sysfs_samples(backend):
+    gpus = []
+    for card in backend.sample():
+        busy = card['utilization']
+        gpus.append(GpuSample(
+            index=len(gpus),
+            bus_id=card['bus_id'],
+            name=ohmygpu_pciids.resolve_name(card['vendor_id'], card['device_id']),
+            memory_total=card['memory_total'],
+            memory_used=card['memory_used'],
+            utilization=float(busy) if busy is not None else None,
+            temperature=card['temperature']
+        ))
+    return gpus
+
+def probe_sysfs(run):
+    backend = ohmygpu_sysfs.SysfsBackend()
+    try:
+        backend.discover()
+        return sysfs_samples(backend) or None
+    finally:
+        backend.close()
+
+def probe_pci(run):
+    gpus = []
+    for device in ohmygpu_sysfs.scan_display_devices():
+        gpus.append(GpuSample(
+            index=len(gpus),
+            bus_id=device['bus_id'],
+            name=ohmygpu_pciids.resolve_name(device['vendor_id'], device['device_id'])
+        ))
+    return gpus or None
+
+def probe_lspci(run):
+    result = run(['lspci', '-v'])
+    if result.returncode != 0:
+        return None
+
+    gpus = []
+    lines = result.stdout.split('\n')
+    for i, line in enumerate(lines):
+        if 'VGA compatible controller' in line or 'Display controller' in line or '3D controller' in line:
+            gpu_name = line.split(': ', 1)[-1] if ': ' in line else line
+            gpu_name = gpu_name.strip()
+
+            mem = None
+            for j in range(i+1, min(i+10, len(lines))):
+                if not lines[j].startswith(('\t', ' ')):
+                    break
+                if 'Memory at' in lines[j] or 'Region' in lines[j]:
+                    match = re.search(r'(\d+)([KMG])', lines[j])
+                    if match:
+                        size = int(match.group(1))
+                        unit = match.group(2)
+                        mem = size * {'K': 1024, 'M': 1024**2, 'G': 1024**3}.get(unit, 1)
+                        break
+
+            gpus.append(GpuSample(
+                index=len(gpus),
+                bus_id=ohmygpu_core.normalize_bus_id(line.split(None, 1)[0]),
+                name=gpu_name,
+                memory_total=mem
+            ))
+    return gpus or None
+
+class SysfsSampler:
+    """Keeps the DRM attribute files open and preads only the due ones."""
+
+    fields = ('memory_used', 'utilization', 'temperature')
+
+    def __init__(self, gpus, interval):
+        self.backend = ohmygpu_sysfs.SysfsBackend()
+        self.backend.discover()
+
+    def read(self, fields):
+        readings = {}
+        for index, card in enumerate(self.backend.sample(fields)):
+            busy = card['utilization']
+            if busy is not None:
+                card['utilization'] = float(busy)
+            readings[index] = {field: card[field] for field in fields}
+        return readings
+
+    def close(self):
+        self.backend.close()
+
+SAMPLERS = {'probe_sysfs': SysfsSampler}
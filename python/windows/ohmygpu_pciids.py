@@ -0,0 +1,197 @@
+import argparse
+import mmap
+import os
+import struct
+import sys
+
+import ohmygpu_cache
+
+# OHMYGPU_PCI_IDS points at another pci.ids, e.g. a test fixture.
+PCI_IDS_PATHS = [p for p in [os.environ.get('OHMYGPU_PCI_IDS')] if p] + [
+    '/usr/share/hwdata/pci.ids',
+    '/usr/share/misc/pci.ids',
+    '/usr/share/pci.ids',
+    '/usr/local/share/pci.ids',
+]
+
+# Index layout (little endian):
+#   header  : magic, entry count
+#   entries : sorted (key, string offset, string length), key = vendor << 16 | device
+#   strings : UTF-8 names, referenced by the entries
+# Vendor names use device 0xffff, which PCI reserves as "no device".
+INDEX_MAGIC = b'OMGPCI01'
+_HEADER = struct.Struct('<8sI')
+_ENTRY = struct.Struct('<III')
+_VENDOR_ONLY = 0xffff
+
+VENDOR_NAMES = {
+    0x1002: 'AMD',
+    0x10de: 'NVIDIA',
+    0x8086: 'Intel',
+    0x1a03: 'ASPEED',
+    0x15ad: 'VMware',
+    0x1af4: 'Red Hat',
+    0x1234: 'QEMU',
+}
+
+
+def default_index_path():
+    return os.path.join(ohmygpu_cache.cache_dir(), 'pci.ids.idx')
+
+def find_pci_ids():
+    for path in PCI_IDS_PATHS:
+        if os.path.exists(path):
+            return path
+    return None
+
+def parse_pci_ids(lines):
+    """Yield (vendor, device, name) from pci.ids text; device is None for
+    vendor lines. Subsystems and the device class section are skipped."""
+    vendor = None
+    for line in lines:
+        if not line.strip() or line.startswith('#'):
+            continue
+        if line.startswith('C '):
+            break
+        if line.startswith('\t\t'):
+            continue
+        try:
+            if line.startswith('\t'):
+                if vendor is not None:
+                    ident, _, name = line.strip().partition(' ')
+                    yield vendor, int(ident, 16), name.strip()
+            else:
+                ident, _, name = line.partition(' ')
+                vendor = int(ident, 16)
+                yield vendor, None, name.strip()
+        except ValueError:
+            continue
+
+def build_index(source, dest):
+    """Compile pci.ids into the binary index read by PciIdIndex. open_index()
+    does this on first use and whenever pci.ids is updated; running this
+    module does it ahead of time (e.g. from a package hook)."""
+    with open(source, 'r', encoding='utf-8', errors='replace') as f:
+        records = {}
+        for vendor, device, name in parse_pci_ids(f):
+            device = _VENDOR_ONLY if device is None else device
+            records[vendor << 16 | device] = name.encode('utf-8')
+
+    strings = bytearray()
+    entries = bytearray()
+    for key in sorted(records):
+        name = records[key]
+        entries += _ENTRY.pack(key, len(strings), len(name))
+        strings += name
+
+    os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+    tmp_path = f"{dest}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_HEADER.pack(INDEX_MAGIC, len(records)))
+        f.write(entries)
+        f.write(strings)
+    os.replace(tmp_path, dest)
+    return len(records)
+
+
+class PciIdIndex:
+    """Memory-mapped, binary-searched view of a prebuilt pci.ids index."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, self._count = _HEADER.unpack_from(self._map, 0)
+        except struct.error:
+            magic = None
+        self._strings = _HEADER.size + (self._count if magic else 0) * _ENTRY.size
+        if magic != INDEX_MAGIC or self._strings > len(self._map):
+            self._map.close()
+            raise ValueError(f"{path} is not a pci.ids index or is truncated")
+
+    def _find(self, key):
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_key, offset, length = _ENTRY.unpack_from(self._map, _HEADER.size + mid * _ENTRY.size)
+            if mid_key < key:
+                lo = mid + 1
+            elif mid_key > key:
+                hi = mid
+            else:
+                start = self._strings + offset
+                return self._map[start:start + length].decode('utf-8', errors='replace')
+        return None
+
+    def vendor_name(self, vendor):
+        return self._find(vendor << 16 | _VENDOR_ONLY)
+
+    def device_name(self, vendor, device):
+        return self._find(vendor << 16 | device)
+
+    def close(self):
+        self._map.close()
+
+
+_index = None
+_index_loaded = False
+
+def _index_is_current(path, source):
+    try:
+        return source is None or os.path.getmtime(path) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+def open_index(path=None):
+    """Return the shared index, building it from the system pci.ids first if
+    it is missing, damaged or older than pci.ids. None if there is no
+    pci.ids or the cache directory is not writable."""
+    global _index, _index_loaded
+    if path is not None:
+        return PciIdIndex(path)
+    if not _index_loaded:
+        _index_loaded = True
+        path, source = default_index_path(), find_pci_ids()
+        for attempt in range(2):
+            try:
+                if _index_is_current(path, source):
+                    _index = PciIdIndex(path)
+                    break
+            except (OSError, ValueError):
+                pass
+            if attempt or source is None:
+                break
+            try:
+                build_index(source, path)
+            except OSError:
+                break
+    return _index
+
+def resolve_name(vendor, device, index=None):
+    index = index or open_index()
+    vendor_name = device_name = None
+    if index:
+        vendor_name = index.vendor_name(vendor)
+        device_name = index.device_name(vendor, device)
+    vendor_name = vendor_name or VENDOR_NAMES.get(vendor)
+    if vendor_name and device_name:
+        return f"{vendor_name} {device_name}"
+    return f"{vendor_name or 'Unknown vendor'} GPU [{vendor:04x}:{device:04x}]"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the compact pci.ids index used for GPU names.')
+    parser.add_argument('--input', default=find_pci_ids(), help='pci.ids source file')
+    parser.add_argument('--output', default=default_index_path(), help='where to write the index')
+    args = parser.parse_args()
+
+    if not args.input:
+        print("[ERROR] pci.ids not found, pass --input.")
+        return 1
+    count = build_index(args.input, args.output)
+    print(f"Indexed {count} vendor/device names into {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+
+# Set by enable(). Instrumented code checks this and nothing else, so a run
+# without --profile pays one attribute lookup per probe, spawn or sample.
+active = None
+
+MAX_EVENTS = 100_000
+
+
+class Profiler:
+    """Timeline of probes, the commands they spawned and sampler ticks.
+
+    Times are time.perf_counter() values; events keep their thread so
+    probes racing in run_probes() show up side by side in a trace."""
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.origin = time.perf_counter()
+        self.max_events = max_events
+        self.events = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def add(self, name, category, started, ended, **args):
+        event = {
+            'name': name,
+            'cat': category,
+            'start': started - self.origin,
+            'seconds': ended - started,
+            'tid': threading.get_ident(),
+            'args': args,
+        }
+        with self._lock:
+            if len(self.events) < self.max_events:
+                self.events.append(event)
+            else:
+                self.dropped += 1
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.events)
+
+    def trace(self):
+        """The events in Chrome's trace_event format, for chrome://tracing
+        or Perfetto."""
+        pid = os.getpid()
+        threads = {}
+        trace = []
+        for event in self.snapshot():
+            tid = threads.setdefault(event['tid'], len(threads) + 1)
+            trace.append({
+                'name': event['name'],
+                'cat': event['cat'],
+                'ph': 'X',
+                'ts': round(event['start'] * 1e6, 1),
+                'dur': round(event['seconds'] * 1e6, 1),
+                'pid': pid,
+                'tid': tid,
+                'args': event['args'],
+            })
+        return {'traceEvents': trace, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, path):
+        import json
+
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.trace(), f, separators=(',', ':'))
+
+    def summary(self):
+        """One line per probe with the commands it ran under it, then the
+        commands run outside probes (samplers) and the sampler ticks in
+        aggregate."""
+        lines = [f"{'PROBE / COMMAND':<48}{'START ms':>10}{'WALL ms':>10}{'SPAWN ms':>10}{'PARSE ms':>10}  RESULT"]
+        events = sorted(self.snapshot(), key=lambda event: event['start'])
+        commands = [event for event in events if event['cat'] == 'command']
+        ticks = [event['seconds'] for event in events if event['cat'] == 'sample']
+        for event in events:
+            if event['cat'] != 'probe':
+                continue
+            args = event['args']
+            # The exception type is enough here; the message is in the trace.
+            if args['error']:
+                result = args['error'].partition(':')[0]
+            elif args['cancelled']:
+                result = 'cancelled'
+            else:
+                result = f"{args['gpus']} GPUs" if args['gpus'] else 'no GPU'
+            lines.append(
+                f"{event['name'][:47]:<48}{event['start'] * 1000:>10.1f}{event['seconds'] * 1000:>10.1f}"
+                f"{'':>10}{args['parse_seconds'] * 1000:>10.1f}  {result}"
+            )
+            end = event['start'] + event['seconds']
+            owned = [command for command in commands
+                     if command['args']['probe'] == event['name'] and event['start'] <= command['start'] <= end]
+            for command in owned:
+                commands.remove(command)
+                lines.append(self._command_line(command, '  '))
+        lines.extend(self._command_line(command) for command in commands)
+        if ticks:
+            lines.append("")
+            lines.append(
+                f"{len(ticks)} samples: {sum(ticks) / len(ticks) * 1000:.2f} ms mean, "
+                f"{max(ticks) * 1000:.2f} ms max"
+            )
+        if self.dropped:
+            lines.append(f"{self.dropped} events dropped after the first {self.max_events}")
+        return lines
+
+    @staticmethod
+    def _command_line(event, indent=''):
+        args = event['args']
+        result = args['error'] or ('timed out' if args['timed_out'] else f"exit {args['exit_code']}")
+        return (
+            f"{indent + event['name'][:47 - len(indent)]:<48}{event['start'] * 1000:>10.1f}"
+            f"{event['seconds'] * 1000:>10.1f}{args['spawn_seconds'] * 1000:>10.1f}{'':>10}  {result}"
+        )
+
+
+def enable(max_events=MAX_EVENTS):
+    global active
+    active = Profiler(max_events)
+    return active
+
+def disable():
+    global active
+    profiler, active = active, None
+    return profiler
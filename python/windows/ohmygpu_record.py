@@ -0,0 +1,278 @@
+import argparse
+import math
+import mmap
+import os
+import struct
+import time
+
+from ohmygpu_sample import GpuSample
+
+NS = 1_000_000_000
+
+# A recording is a 64-byte header followed by 64-byte frames, so frame i
+# always sits at HEADER.size + i * FRAME_SIZE and a torn write at the end
+# costs at most one frame. Every CHUNK_FRAMES frames start with an index
+# frame holding the first timestamp of the chunk, followed by the device
+# table in effect, which makes each chunk readable on its own.
+MAGIC = b'OHMYGPU\x00'
+VERSION = 1
+FRAME_SIZE = 64
+CHUNK_FRAMES = 1024
+
+HEADER = struct.Struct('<8sHHIq40x')
+INDEX = struct.Struct('<cxxxIq48x')
+DEVICE = struct.Struct('<cBHq16s36s')
+RECORD = struct.Struct('<cxHIqq5d')
+
+INDEX_TAG = b'I'
+DEVICE_TAG = b'D'
+RECORD_TAG = b'R'
+
+# Record flags: which fields were read, and whether the record is the last
+# GPU of its sample.
+RECORD_FIELDS = ('memory_used', 'utilization', 'temperature', 'power', 'clock_graphics', 'clock_memory')
+LAST_IN_SAMPLE = 1 << 15
+
+# Replay sleeps between samples as they were recorded, but not across gaps
+# longer than this, e.g. between two recording sessions.
+MAX_REPLAY_GAP = 5.0
+
+_DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class RecordingError(Exception):
+    pass
+
+
+def _text(value, size):
+    return (value or '').encode('utf-8')[:size]
+
+def _untext(raw):
+    return raw.rstrip(b'\x00').decode('utf-8', 'ignore') or None
+
+def device_frames(gpus):
+    """The device table for a sample. Names longer than 36 bytes are cut."""
+    return [
+        DEVICE.pack(DEVICE_TAG, i == 0, gpu.index,
+                    -1 if gpu.memory_total is None else gpu.memory_total,
+                    _text(gpu.bus_id, 16), _text(gpu.name, 36))
+        for i, gpu in enumerate(gpus)
+    ]
+
+def record_frame(gpu, last):
+    flags = LAST_IN_SAMPLE if last else 0
+    values = []
+    for bit, field in enumerate(RECORD_FIELDS):
+        value = getattr(gpu, field)
+        if value is not None:
+            flags |= 1 << bit
+        values.append(value)
+    memory_used = int(values[0]) if values[0] is not None else 0
+    floats = [math.nan if value is None else float(value) for value in values[1:]]
+    return RECORD.pack(RECORD_TAG, gpu.index, flags, gpu.timestamp, memory_used, *floats)
+
+
+class RecordWriter:
+    """Appends samples to a recording, creating it if needed.
+
+    Each sample goes to the file in one write and is flushed, so a crash
+    loses at most the sample being written."""
+
+    def __init__(self, path, chunk_frames=CHUNK_FRAMES):
+        self.file = open(path, 'a+b')
+        try:
+            self._open(chunk_frames)
+        except Exception:
+            self.file.close()
+            raise
+        self.devices = []
+
+    def _open(self, chunk_frames):
+        size = self.file.seek(0, os.SEEK_END)
+        if size == 0:
+            self.chunk_frames = chunk_frames
+            self.file.write(HEADER.pack(MAGIC, VERSION, FRAME_SIZE, chunk_frames, time.time_ns()))
+            self.frames = 0
+            return
+        self.file.seek(0)
+        self.chunk_frames = _read_header(self.file.read(HEADER.size))
+        self.frames = (size - HEADER.size) // FRAME_SIZE
+        if HEADER.size + self.frames * FRAME_SIZE != size:
+            # Drop a frame torn by a crash so later frames stay aligned.
+            self.file.truncate(HEADER.size + self.frames * FRAME_SIZE)
+
+    def _append(self, out, frame, timestamp):
+        if self.frames % self.chunk_frames == 0:
+            out.append(INDEX.pack(INDEX_TAG, self.frames // self.chunk_frames, timestamp))
+            self.frames += 1
+            for device in self.devices:
+                self._append(out, device, timestamp)
+        out.append(frame)
+        self.frames += 1
+
+    def write(self, gpus):
+        if not gpus:
+            return
+        timestamp = gpus[0].timestamp
+        out = []
+        devices = device_frames(gpus)
+        if devices != self.devices:
+            self.devices = devices
+            for device in devices:
+                self._append(out, device, timestamp)
+        for i, gpu in enumerate(gpus):
+            self._append(out, record_frame(gpu, i == len(gpus) - 1), timestamp)
+        self.file.write(b''.join(out))
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _read_header(data):
+    if len(data) < HEADER.size:
+        raise RecordingError("not an oh-my-gpu recording")
+    magic, version, frame_size, chunk_frames, created = HEADER.unpack(data)
+    if magic != MAGIC:
+        raise RecordingError("not an oh-my-gpu recording")
+    if version != VERSION or frame_size != FRAME_SIZE or chunk_frames < 2:
+        raise RecordingError(f"unsupported recording version {version}")
+    return chunk_frames
+
+
+class Recording:
+    """A recording mapped read-only into memory.
+
+    Opening it reads only the header; a time range is found by a binary
+    search over the index frames, so only the pages holding the samples
+    asked for are ever touched."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            self.chunk_frames = _read_header(f.read(HEADER.size))
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.frames = (len(self.map) - HEADER.size) // FRAME_SIZE
+        self.chunks = -(-self.frames // self.chunk_frames)
+
+    def close(self):
+        self.map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _frame(self, slot):
+        offset = HEADER.size + slot * FRAME_SIZE
+        return self.map[offset:offset + 1], offset
+
+    def _chunk_start(self, chunk):
+        tag, offset = self._frame(chunk * self.chunk_frames)
+        if tag != INDEX_TAG:
+            raise RecordingError(f"index frame of chunk {chunk} is damaged")
+        return INDEX.unpack_from(self.map, offset)[2]
+
+    def _find_chunk(self, start):
+        """The last chunk beginning before start, where a sample at start
+        could begin."""
+        low, high = 0, self.chunks
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self._chunk_start(middle) < start:
+                low = middle
+            else:
+                high = middle
+        return low
+
+    def time_range(self):
+        """(first, last) sample timestamp in epoch nanoseconds, or None for
+        an empty recording."""
+        if not self.chunks:
+            return None
+        for slot in range(self.frames - 1, -1, -1):
+            tag, offset = self._frame(slot)
+            if tag == RECORD_TAG:
+                return self._chunk_start(0), RECORD.unpack_from(self.map, offset)[3]
+        return None
+
+    def resolve(self, timestamp):
+        """Turn a negative timestamp, as parse_time() returns for '-10m',
+        into one relative to the end of the recording."""
+        if timestamp is None or timestamp >= 0:
+            return timestamp
+        span = self.time_range()
+        return span[1] + timestamp if span else 0
+
+    def samples(self, start=None, end=None):
+        """Yield each recorded sample, a list of GpuSample, with a
+        timestamp in [start, end]."""
+        start, end = self.resolve(start), self.resolve(end)
+        if not self.chunks:
+            return
+        slot = self._find_chunk(start) * self.chunk_frames if start is not None else 0
+        devices = {}
+        sample = []
+        for slot in range(slot, self.frames):
+            tag, offset = self._frame(slot)
+            if tag == RECORD_TAG:
+                _, index, flags, timestamp, memory_used, *floats = RECORD.unpack_from(self.map, offset)
+                values = dict(zip(RECORD_FIELDS, [memory_used] + floats))
+                for bit, field in enumerate(RECORD_FIELDS):
+                    if not flags & 1 << bit:
+                        values[field] = None
+                name, bus_id, memory_total = devices.get(index, (f"GPU {index}", None, None))
+                sample.append(GpuSample(index, name, bus_id, memory_total, timestamp=timestamp, **values))
+                if flags & LAST_IN_SAMPLE:
+                    if end is not None and sample[0].timestamp > end:
+                        return
+                    if start is None or sample[0].timestamp >= start:
+                        yield sample
+                    sample = []
+            elif tag == DEVICE_TAG:
+                _, first, index, memory_total, bus_id, name = DEVICE.unpack_from(self.map, offset)
+                if first:
+                    devices = {}
+                devices[index] = (_untext(name) or f"GPU {index}", _untext(bus_id),
+                                  memory_total if memory_total >= 0 else None)
+
+
+def replay(path, start=None, end=None, speed=1.0):
+    """Yield the recorded samples in [start, end], paced as they were
+    recorded and sped up by speed, or as fast as possible for speed 0."""
+    with Recording(path) as recording:
+        previous = None
+        for gpus in recording.samples(start, end):
+            if speed and previous is not None:
+                gap = (gpus[0].timestamp - previous) / NS
+                time.sleep(min(max(gap, 0), MAX_REPLAY_GAP) / speed)
+            previous = gpus[0].timestamp
+            yield gpus
+
+def parse_time(text):
+    """Epoch nanoseconds from epoch seconds or an ISO 8601 time, or a
+    negative offset from the end of the recording for '-30s', '-10m',
+    '-2h' or '-1d'. Raises ArgumentTypeError, so it can serve as the type
+    of --since and --until."""
+    from datetime import datetime
+
+    text = text.strip()
+    if text.startswith('-') and text[-1:] in _DURATIONS:
+        try:
+            return -int(float(text[1:-1]) * _DURATIONS[text[-1]] * NS)
+        except ValueError:
+            pass
+    try:
+        return int(float(text) * NS)
+    except ValueError:
+        pass
+    try:
+        return int(datetime.fromisoformat(text).timestamp() * NS)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected epoch seconds, an ISO 8601 time or -DURATION, got '{text}'")
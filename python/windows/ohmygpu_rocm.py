@@ -0,0 +1,216 @@
+import json
+import subprocess
+
+import ohmygpu_core
+from ohmygpu_sample import GpuSample, MIB, parse_number
+
+# One rocm-smi call reports everything; each dynamic field adds its flag.
+ROCM_SMI_STATIC = ('--showproductname', '--showbus')
+ROCM_SMI_FIELDS = {
+    'memory_total': ('--showmeminfo', 'vram'),
+    'memory_used': ('--showmeminfo', 'vram'),
+    'utilization': ('--showuse',),
+    'temperature': ('--showtemp',),
+    'power': ('--showpower',),
+}
+ROCM_SMI_NAME_KEYS = ('Card Series', 'Card series', 'Device Name', 'Card SKU', 'Card model')
+ROCM_SMI_TEMPERATURE_KEYS = ('Temperature (Sensor edge) (C)', 'Temperature (Sensor junction) (C)')
+ROCM_SMI_POWER_KEYS = ('Average Graphics Package Power (W)', 'Current Socket Graphics Package Power (W)')
+
+# amd-smi splits static and live values over two commands, so a probe costs
+# two calls and a sampler tick one.
+AMD_SMI_STATIC = ('amd-smi', 'static', '--asic', '--bus', '--vram', '--json')
+AMD_SMI_FIELDS = {
+    'memory_total': '--mem-usage',
+    'memory_used': '--mem-usage',
+    'utilization': '--usage',
+    'temperature': '--temperature',
+    'power': '--power',
+}
+
+_UNITS = {'B': 1, 'KB': 1024, 'MB': MIB, 'GB': 1024 * MIB}
+
+DEFAULT_NAME = 'AMD Radeon GPU'
+DYNAMIC_FIELDS = ('memory_used', 'utilization', 'temperature', 'power')
+
+
+def rocm_smi_args(fields, static=False):
+    args = ['rocm-smi'] + list(ROCM_SMI_STATIC if static else ())
+    for field in fields:
+        for flag in ROCM_SMI_FIELDS[field]:
+            if flag not in args:
+                args.append(flag)
+    return args + ['--json']
+
+def _first(card, keys):
+    for key in keys:
+        value = parse_number(card.get(key))
+        if value is not None:
+            return value
+    return None
+
+def parse_rocm_smi_json(text):
+    """Return {card index: card} from 'rocm-smi --json', where every card
+    maps rocm-smi's labels to its values, or None if it is not JSON."""
+    # Some releases print warnings (e.g. about permissions) ahead of the JSON.
+    try:
+        data = json.loads(text[text.find('{'):])
+    except ValueError:
+        return None
+    if not isinstance(data, dict):
+        return None
+    cards = {}
+    for key, card in data.items():
+        if key.startswith('card') and key[4:].isdigit() and isinstance(card, dict):
+            cards[int(key[4:])] = card
+    return cards
+
+def rocm_smi_values(card):
+    values = {}
+    if 'VRAM Total Memory (B)' in card:
+        memory = parse_number(card['VRAM Total Memory (B)'])
+        values['memory_total'] = int(memory) if memory is not None else None
+    if 'VRAM Total Used Memory (B)' in card:
+        memory = parse_number(card['VRAM Total Used Memory (B)'])
+        values['memory_used'] = int(memory) if memory is not None else None
+    if 'GPU use (%)' in card:
+        values['utilization'] = parse_number(card['GPU use (%)'])
+    if any(key.startswith('Temperature') for key in card):
+        values['temperature'] = _first(card, ROCM_SMI_TEMPERATURE_KEYS)
+    if any(key in card for key in ROCM_SMI_POWER_KEYS):
+        values['power'] = _first(card, ROCM_SMI_POWER_KEYS)
+    return values
+
+def probe_rocm_smi(run):
+    result = run(rocm_smi_args(ROCM_SMI_FIELDS, static=True))
+    if result.returncode != 0:
+        return None
+    cards = parse_rocm_smi_json(result.stdout)
+    if not cards:
+        return None
+
+    gpus = []
+    for index, card in sorted(cards.items()):
+        name = next((card[key].strip() for key in ROCM_SMI_NAME_KEYS if card.get(key, '').strip()), DEFAULT_NAME)
+        bus_id = card.get('PCI Bus')
+        gpus.append(GpuSample(index, name, ohmygpu_core.normalize_bus_id(bus_id) if bus_id else None,
+                              **rocm_smi_values(card)))
+    return gpus
+
+
+def _amd_smi_list(text):
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    # Newer releases wrap the per-GPU list in {"gpu_data": [...]}.
+    if isinstance(data, dict):
+        data = data.get('gpu_data')
+    if not isinstance(data, list):
+        return None
+    return {item['gpu']: item for item in data if isinstance(item, dict) and isinstance(item.get('gpu'), int)}
+
+def _quantity(node, scale_units=None):
+    """A number out of amd-smi's {"value": 45, "unit": "C"}, a bare number
+    or a '45 C' string, in bytes when scale_units is given."""
+    unit = None
+    if isinstance(node, dict):
+        node, unit = node.get('value'), node.get('unit')
+    elif isinstance(node, str) and ' ' in node.strip():
+        node, unit = node.split(None, 1)
+    value = parse_number(node)
+    if value is None or scale_units is None:
+        return value
+    return int(value * scale_units.get(unit, MIB))
+
+def amd_smi_values(item):
+    usage = item.get('usage') or {}
+    memory = item.get('mem_usage') or {}
+    temperature = item.get('temperature') or {}
+    power = item.get('power') or {}
+    values = {}
+    if memory:
+        values['memory_total'] = _quantity(memory.get('total_vram'), _UNITS)
+        values['memory_used'] = _quantity(memory.get('used_vram'), _UNITS)
+    if usage:
+        values['utilization'] = _quantity(usage.get('gfx_activity'))
+    if temperature:
+        values['temperature'] = _quantity(temperature.get('edge'))
+        if values['temperature'] is None:
+            values['temperature'] = _quantity(temperature.get('hotspot'))
+    if power:
+        values['power'] = _quantity(power.get('socket_power'))
+        if values['power'] is None:
+            values['power'] = _quantity(power.get('average_socket_power'))
+    return values
+
+def amd_smi_args(fields):
+    args = ['amd-smi', 'metric']
+    for field in fields:
+        if AMD_SMI_FIELDS[field] not in args:
+            args.append(AMD_SMI_FIELDS[field])
+    return args + ['--json']
+
+def probe_amd_smi(run):
+    result = run(list(AMD_SMI_STATIC))
+    if result.returncode != 0:
+        return None
+    static = _amd_smi_list(result.stdout)
+    if not static:
+        return None
+    result = run(amd_smi_args(AMD_SMI_FIELDS))
+    metrics = _amd_smi_list(result.stdout) if result.returncode == 0 else None
+
+    gpus = []
+    for index, item in sorted(static.items()):
+        values = amd_smi_values((metrics or {}).get(index, {}))
+        if values.get('memory_total') is None:
+            values['memory_total'] = _quantity((item.get('vram') or {}).get('size'), _UNITS)
+        name = ((item.get('asic') or {}).get('market_name') or '').strip() or DEFAULT_NAME
+        bus_id = (item.get('bus') or {}).get('bdf')
+        gpus.append(GpuSample(index, name, ohmygpu_core.normalize_bus_id(bus_id) if bus_id else None, **values))
+    return gpus
+
+
+class _ToolSampler:
+    """Runs the tool once per tick, asking only for the due fields. Neither
+    rocm-smi nor amd-smi can stream, unlike nvidia-smi -lms."""
+
+    fields = DYNAMIC_FIELDS
+
+    def __init__(self, gpus, interval):
+        pass
+
+    def _run(self, args):
+        session = ohmygpu_core.ProbeSession()
+        try:
+            result = session.run(args)
+        except (OSError, subprocess.TimeoutExpired):
+            return None
+        return result.stdout if result.returncode == 0 else None
+
+    def read(self, fields):
+        output = self._run(self.args(fields))
+        items = self.parse(output) if output is not None else None
+        if not items:
+            return None
+        readings = {}
+        for index, item in items.items():
+            values = self.values(item)
+            readings[index] = {field: values.get(field) for field in fields}
+        return readings
+
+    def close(self):
+        pass
+
+class RocmSmiSampler(_ToolSampler):
+    args = staticmethod(rocm_smi_args)
+    parse = staticmethod(parse_rocm_smi_json)
+    values = staticmethod(rocm_smi_values)
+
+class AmdSmiSampler(_ToolSampler):
+    args = staticmethod(amd_smi_args)
+    parse = staticmethod(_amd_smi_list)
+    values = staticmethod(amd_smi_values)
+
+SAMPLERS = {'probe_rocm_smi': RocmSmiSampler, 'probe_amd_smi': AmdSmiSampler}
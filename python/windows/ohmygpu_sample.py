@@ -0,0 +1,133 @@
+import math
+import time
+
+MIB = 1024 * 1024
+
+
+class GpuSample:
+    """One reading of one GPU.
+
+    Memory is in bytes, utilization in percent, temperature in degrees
+    Celsius, power in watts, clocks in MHz and the timestamp in epoch
+    nanoseconds. Anything the backend
+    could not read is None; turning values into text is left to the front
+    ends."""
+
+    __slots__ = (
+        'timestamp',
+        'index',
+        'bus_id',
+        'name',
+        'memory_total',
+        'memory_used',
+        'utilization',
+        'temperature',
+        'power',
+        'clock_graphics',
+        'clock_memory',
+    )
+
+    def __init__(self, index, name, bus_id=None, memory_total=None, memory_used=None,
+                 utilization=None, temperature=None, timestamp=None, power=None,
+                 clock_graphics=None, clock_memory=None):
+        self.timestamp = time.time_ns() if timestamp is None else timestamp
+        self.index = index
+        self.bus_id = bus_id
+        self.name = name
+        self.memory_total = memory_total
+        self.memory_used = memory_used
+        self.utilization = utilization
+        self.temperature = temperature
+        self.power = power
+        self.clock_graphics = clock_graphics
+        self.clock_memory = clock_memory
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"GpuSample({fields})"
+
+
+class ProcessSample:
+    """GPU use of one process on one GPU.
+
+    memory_used is in bytes and engines maps an engine name ('render',
+    'video', ...) to its busy percent since the previous sample. Either is
+    None when the source cannot tell."""
+
+    __slots__ = (
+        'timestamp',
+        'pid',
+        'name',
+        'bus_id',
+        'memory_used',
+        'engines',
+    )
+
+    def __init__(self, pid, name, bus_id=None, memory_used=None, engines=None, timestamp=None):
+        self.timestamp = time.time_ns() if timestamp is None else timestamp
+        self.pid = pid
+        self.name = name
+        self.bus_id = bus_id
+        self.memory_used = memory_used
+        self.engines = engines
+
+    def as_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__}
+
+    def __repr__(self):
+        fields = ', '.join(f"{field}={getattr(self, field)!r}" for field in self.__slots__)
+        return f"ProcessSample({fields})"
+
+
+def parse_number(text):
+    """Parse a tool's numeric column, mapping '[N/A]', 'N/A' or '[Not
+    Supported]' to None."""
+    try:
+        return float(text)
+    except (TypeError, ValueError):
+        return None
+
+def parse_mib(text):
+    value = parse_number(text)
+    return int(value * MIB) if value is not None else None
+
+def format_memory(bytes_value):
+    if bytes_value is None:
+        return 'N/A'
+    for unit in ['B', 'KB', 'MB', 'GB']:
+        if bytes_value < 1024:
+            return f"{bytes_value:.1f} {unit}"
+        bytes_value /= 1024
+    return f"{bytes_value:.1f} TB"
+
+def format_percent(value):
+    if value is None:
+        return 'N/A'
+    return f"{value:.0f} %"
+
+def format_temperature(value):
+    if value is None:
+        return 'N/A'
+    return f"{value:.0f} °C"
+
+def _number_argument(text, allow_zero):
+    try:
+        value = float(text)
+    except ValueError:
+        value = math.nan
+    if not math.isfinite(value) or value < 0 or value == 0 and not allow_zero:
+        import argparse
+        raise argparse.ArgumentTypeError(
+            f"expected a {'non-negative' if allow_zero else 'positive'} number, got '{text}'")
+    return value
+
+def positive_float(text):
+    """argparse type for intervals and timeouts."""
+    return _number_argument(text, allow_zero=False)
+
+def non_negative_float(text):
+    """argparse type for values where 0 means 'off', such as --speed."""
+    return _number_argument(text, allow_zero=True)
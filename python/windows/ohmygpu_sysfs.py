@@ -0,0 +1,160 @@
+import os
+import re
+
+# OHMYGPU_SYSFS_ROOT and OHMYGPU_PROC_ROOT point every sysfs and procfs
+# reader at a fake tree.
+SYSFS_ROOT = os.environ.get('OHMYGPU_SYSFS_ROOT', '/sys')
+PROC_ROOT = os.environ.get('OHMYGPU_PROC_ROOT', '/proc')
+PCI_DEVICES_PATH = os.path.join(SYSFS_ROOT, 'bus', 'pci', 'devices')
+
+_CARD_RE = re.compile(r'card\d+$')
+
+_DYNAMIC_FILES = {
+    'memory_total': 'mem_info_vram_total',
+    'memory_used': 'mem_info_vram_used',
+    'utilization': 'gpu_busy_percent',
+}
+
+
+def _read_text(path):
+    with open(path, 'r', encoding='ascii', errors='ignore') as f:
+        return f.read().strip()
+
+def _pread_int(fd):
+    try:
+        return int(os.pread(fd, 32, 0))
+    except (OSError, ValueError):
+        return None
+
+
+class SysfsBackend:
+    """Reads GPU state straight from /sys/class/drm/card*/device.
+
+    Attribute files are opened once by discover() and re-read with pread(),
+    so a sample costs one syscall per value and never forks. The root is
+    configurable so the backend can be pointed at a fake tree."""
+
+    def __init__(self, root=SYSFS_ROOT):
+        self.root = root
+        self.cards = []
+
+    def discover(self):
+        self.close()
+        drm_dir = os.path.join(self.root, 'class', 'drm')
+        try:
+            entries = sorted(e for e in os.listdir(drm_dir) if _CARD_RE.match(e))
+        except OSError:
+            return self.cards
+
+        for entry in entries:
+            device_dir = os.path.join(drm_dir, entry, 'device')
+            try:
+                vendor = int(_read_text(os.path.join(device_dir, 'vendor')), 16)
+                device = int(_read_text(os.path.join(device_dir, 'device')), 16)
+            except (OSError, ValueError):
+                continue
+
+            fds = {}
+            for field, filename in _DYNAMIC_FILES.items():
+                fd = self._open(os.path.join(device_dir, filename))
+                if fd is not None:
+                    fds[field] = fd
+            temp_path = self._find_temp_input(device_dir)
+            if temp_path:
+                fd = self._open(temp_path)
+                if fd is not None:
+                    fds['temperature'] = fd
+
+            self.cards.append({
+                'card': entry,
+                'bus_id': os.path.basename(os.path.realpath(device_dir)),
+                'vendor_id': vendor,
+                'device_id': device,
+                'fds': fds,
+            })
+        return self.cards
+
+    def sample(self, fields=None):
+        """Read every card, or only the given fields of every card."""
+        samples = []
+        for card in self.cards:
+            fds = card['fds']
+            values = {
+                field: _pread_int(fd) for field, fd in fds.items()
+                if fields is None or field in fields
+            }
+            temperature = values.get('temperature')
+            samples.append({
+                'card': card['card'],
+                'bus_id': card['bus_id'],
+                'vendor_id': card['vendor_id'],
+                'device_id': card['device_id'],
+                'memory_total': values.get('memory_total'),
+                'memory_used': values.get('memory_used'),
+                'utilization': values.get('utilization'),
+                'temperature': temperature / 1000 if temperature is not None else None,
+            })
+        return samples
+
+    def close(self):
+        for card in self.cards:
+            for fd in card['fds'].values():
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self.cards = []
+
+    @staticmethod
+    def _open(path):
+        try:
+            return os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+
+    @staticmethod
+    def _find_temp_input(device_dir):
+        hwmon_dir = os.path.join(device_dir, 'hwmon')
+        try:
+            hwmons = sorted(os.listdir(hwmon_dir))
+        except OSError:
+            return None
+        for hwmon in hwmons:
+            path = os.path.join(hwmon_dir, hwmon, 'temp1_input')
+            if os.path.exists(path):
+                return path
+        return None
+
+
+def scan_display_devices(root=PCI_DEVICES_PATH):
+    """List PCI display controllers (class 0x03xxxx) from sysfs."""
+    devices = []
+    try:
+        entries = sorted(os.listdir(root))
+    except OSError:
+        return devices
+
+    for entry in entries:
+        path = os.path.join(root, entry)
+        try:
+            with open(os.path.join(path, 'class'), 'r') as f:
+                pci_class = int(f.read(), 16)
+            if pci_class >> 16 != 0x03:
+                continue
+            with open(os.path.join(path, 'vendor'), 'r') as f:
+                vendor = int(f.read(), 16)
+            with open(os.path.join(path, 'device'), 'r') as f:
+                device = int(f.read(), 16)
+        except (OSError, ValueError):
+            continue
+        try:
+            driver = os.path.basename(os.readlink(os.path.join(path, 'driver')))
+        except OSError:
+            driver = None
+        devices.append({
+            'bus_id': entry,
+            'vendor_id': vendor,
+            'device_id': device,
+            'driver': driver,
+        })
+    return devices
@@ -1,228 +1,129 @@
+import argparse
+import queue
+import threading
+from collections import deque
 import tkinter as tk
 from tkinter import ttk
-import subprocess
-import platform
-import re
+from ohmygpu_core import get_gpu_info
+from ohmygpu_record import RecordingError, parse_time, replay
+from ohmygpu_sample import format_memory, format_percent, format_temperature, non_negative_float, positive_float
+from ohmygpu_watch import watch
 
-def get_gpu_info():
-    system = platform.system()
-    
-    if system == "Windows":
-        return get_gpu_info_windows()
-    elif system == "Linux":
-        return get_gpu_info_linux()
-    elif system == "Darwin":
-        return get_gpu_info_macos()
-    
-    return None
+POLL_MS = 100
+# Samples the worker may get ahead of the window by; a fast replay waits.
+QUEUE_SIZE = 256
+HISTORY_SPAN = 300
+CHART_WIDTH = 240
+CHART_HEIGHT = 60
 
-def get_gpu_info_windows():
-    try:
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=name,memory.total,memory.used,utilization.gpu', '--format=csv,noheader'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            info = result.stdout.strip().split(',')
-            return {
-                'name': info[0].strip(),
-                'total_memory': info[1].strip(),
-                'used_memory': info[2].strip(),
-                'utilization': info[3].strip()
-            }
-    except:
-        pass
-    
-    try:
-        result = subprocess.run(
-            ['rocm-smi', '--showid', '--showtemp'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0 and 'GPU' in result.stdout:
-            return {
-                'name': 'AMD Radeon GPU',
-                'total_memory': 'N/A',
-                'used_memory': 'N/A',
-                'utilization': 'N/A'
-            }
-    except:
-        pass
+class HistoryChart:
+    """Scrolling line chart of 0-100 % series on a tk.Canvas.
     
-    try:
-        result = subprocess.run(
-            ['wmic', 'path', 'win32_videocontroller', 'get', 'name,adapterram'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        
-        if result.returncode == 0:
-            lines = result.stdout.strip().split('\n')
-            gpus = []
-            for i in range(1, len(lines)):
-                if lines[i].strip():
-                    parts = lines[i].strip().rsplit(None, 1)
-                    if len(parts) == 2:
-                        name, mem = parts
-                        gpus.append({
-                            'name': name.strip(),
-                            'total_memory': format_memory(int(mem)) if mem.isdigit() else 'N/A',
-                            'used_memory': 'N/A',
-                            'utilization': 'N/A'
-                        })
-            if gpus:
-                return gpus[0]
-    except:
-        pass
+    The span is folded into one bucket per horizontal pixel, and a bucket
+    shows the mean of the samples that fell into it. When a new bucket
+    starts, the existing segments are shifted left with canvas.move() and
+    one new segment is appended. A sample in the current bucket only moves
+    the end of the last segment. Drawing therefore costs the same for a
+    minute of history as for a day."""
     
-    return None
-
-def get_gpu_info_linux():
-    try:
-        result = subprocess.run(
-            ['nvidia-smi', '--query-gpu=name,memory.total,memory.used,utilization.gpu', '--format=csv,noheader'],
-            capture_output=True,
-            text=True,
-            timeout=5
+    def __init__(self, parent, colors, span=HISTORY_SPAN, width=CHART_WIDTH, height=CHART_HEIGHT):
+        self.canvas = tk.Canvas(
+            parent,
+            width=width,
+            height=height,
+            bg='#141414',
+            highlightthickness=0
         )
-        if result.returncode == 0:
-            info = result.stdout.strip().split(',')
-            return {
-                'name': info[0].strip(),
-                'total_memory': info[1].strip(),
-                'used_memory': info[2].strip(),
-                'utilization': info[3].strip()
-            }
-    except:
-        pass
+        self.width = width
+        self.height = height
+        self.bucket_ns = span * 1_000_000_000 / width
+        self.bucket = None
+        self.colors = colors
+        self.series = {
+            name: {'sum': 0.0, 'count': 0, 'y': None, 'prev_x': None, 'prev_y': None,
+                   'segment': None, 'segments': deque()}
+            for name in colors
+        }
+        for fraction in (0.25, 0.5, 0.75):
+            y = self._y(fraction * 100)
+            self.canvas.create_line(0, y, width, y, fill='#2b2b2b')
     
-    try:
-        result = subprocess.run(
-            ['rocm-smi', '--showid'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0 and 'GPU' in result.stdout:
-            try:
-                result2 = subprocess.run(
-                    ['rocm-smi', '--showmeminfo', 'all'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                if result2.returncode == 0:
-                    lines = result2.stdout.split('\n')
-                    total_mem = 'N/A'
-                    for line in lines:
-                        if 'Total Memory' in line or 'Total' in line and 'Memory' in line:
-                            match = re.search(r'(\d+)', line)
-                            if match:
-                                total_mem = format_memory(int(match.group(1)) * 1024 * 1024)
-                                break
-                    
-                    return {
-                        'name': 'AMD Radeon GPU',
-                        'total_memory': total_mem,
-                        'used_memory': 'N/A',
-                        'utilization': 'N/A'
-                    }
-            except:
-                pass
-            
-            return {
-                'name': 'AMD Radeon GPU',
-                'total_memory': 'N/A',
-                'used_memory': 'N/A',
-                'utilization': 'N/A'
-            }
-    except:
-        pass
+    def _y(self, percent):
+        percent = min(max(percent, 0.0), 100.0)
+        return self.height - 1 - percent / 100 * (self.height - 2)
     
-    try:
-        result = subprocess.run(
-            ['lspci', '-v'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            for i, line in enumerate(lines):
-                if 'VGA compatible controller' in line or 'Display controller' in line or '3D controller' in line:
-                    if any(x in line for x in ['Intel', 'AMD', 'NVIDIA', 'Radeon', 'RTX', 'GTX', 'Arc']):
-                        gpu_name = line.split(': ', 1)[-1] if ': ' in line else line
-                        gpu_name = gpu_name.strip()
-                        
-                        mem = 'N/A'
-                        for j in range(i+1, min(i+10, len(lines))):
-                            if 'Memory at' in lines[j] or 'Region' in lines[j]:
-                                match = re.search(r'(\d+)([KMG])', lines[j])
-                                if match:
-                                    size = int(match.group(1))
-                                    unit = match.group(2)
-                                    bytes_val = size * {'K': 1024, 'M': 1024**2, 'G': 1024**3}.get(unit, 1)
-                                    mem = format_memory(bytes_val)
-                                    break
-                        
-                        return {
-                            'name': gpu_name,
-                            'total_memory': mem,
-                            'used_memory': 'N/A',
-                            'utilization': 'N/A'
-                        }
-    except:
-        pass
+    def _shift(self, pixels):
+        pixels = min(pixels, self.width + 1)
+        self.canvas.move('segment', -pixels, 0)
+        for state in self.series.values():
+            if state['y'] is not None:
+                state['prev_x'], state['prev_y'] = self.width - 1, state['y']
+            if state['prev_x'] is not None:
+                state['prev_x'] -= pixels
+            state['sum'], state['count'], state['y'], state['segment'] = 0.0, 0, None, None
+            segments = state['segments']
+            while segments and self.canvas.coords(segments[0])[2] < 0:
+                self.canvas.delete(segments.popleft())
     
-    return None
+    def add(self, timestamp, values):
+        bucket = int(timestamp // self.bucket_ns)
+        if self.bucket is None:
+            self.bucket = bucket
+        elif bucket > self.bucket:
+            self._shift(bucket - self.bucket)
+            self.bucket = bucket
+        elif bucket < self.bucket:
+            return
+        
+        x = self.width - 1
+        for name, value in values.items():
+            if value is None:
+                continue
+            state = self.series[name]
+            state['sum'] += value
+            state['count'] += 1
+            state['y'] = self._y(state['sum'] / state['count'])
+            if state['segment'] is not None:
+                self.canvas.coords(state['segment'], state['prev_x'], state['prev_y'], x, state['y'])
+            elif state['prev_y'] is not None and state['prev_x'] >= -1:
+                state['segment'] = self.canvas.create_line(
+                    state['prev_x'], state['prev_y'], x, state['y'],
+                    fill=self.colors[name],
+                    tags='segment'
+                )
+                state['segments'].append(state['segment'])
 
-def get_gpu_info_macos():
-    try:
-        result = subprocess.run(
-            ['system_profiler', 'SPDisplaysDataType'],
-            capture_output=True,
-            text=True,
-            timeout=5
-        )
-        if result.returncode == 0:
-            lines = result.stdout.split('\n')
-            gpu_info = {}
-            
-            for line in lines:
-                if 'Chipset Model' in line:
-                    gpu_info['name'] = line.split(': ', 1)[-1].strip()
-                if 'VRAM' in line:
-                    vram_str = line.split(': ', 1)[-1].strip()
-                    match = re.search(r'(\d+)\s*([MG])', vram_str)
-                    if match:
-                        size = int(match.group(1))
-                        unit = match.group(2)
-                        bytes_val = size * ({'M': 1024**2, 'G': 1024**3}.get(unit, 1))
-                        gpu_info['total_memory'] = format_memory(bytes_val)
-            
-            if gpu_info:
-                if 'total_memory' not in gpu_info:
-                    gpu_info['total_memory'] = 'N/A'
-                gpu_info['used_memory'] = 'N/A'
-                gpu_info['utilization'] = 'N/A'
-                return gpu_info
-    except:
-        pass
+def sample_worker(results, reload_requested, stopping, refresh_interval=None, use_cache=True,
+                  use_daemon=True, samples=None):
+    """Runs off the Tk thread: probes the GPUs, or reads samples, and hands
+    each result to the UI through the results queue. A recording that
+    cannot be read is handed over as its exception."""
+    if refresh_interval and samples is None:
+        samples = watch(refresh_interval, use_cache, use_daemon)
+    if samples is not None:
+        found = False
+        try:
+            for gpus in samples:
+                found = True
+                results.put(gpus)
+                if stopping.is_set():
+                    break
+        except (OSError, RecordingError) as e:
+            results.put(e)
+            return
+        finally:
+            samples.close()
+        if not found:
+            results.put(None)
+        return
     
-    return None
+    while not stopping.is_set():
+        results.put(get_gpu_info(use_cache, use_daemon))
+        reload_requested.wait()
+        reload_requested.clear()
 
-def format_memory(bytes_value):
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes_value < 1024:
-            return f"{bytes_value:.1f} {unit}"
-        bytes_value /= 1024
-    return f"{bytes_value:.1f} TB"
-
-def create_gpu_window():
+def create_gpu_window(refresh_interval=None, use_cache=True, history_span=HISTORY_SPAN, use_daemon=True,
+                      samples=None):
     root = tk.Tk()
     root.title("oh-my-gpu")
     root.configure(bg='#2b2b2b')
@@ -246,128 +147,182 @@ def create_gpu_window():
     info_display_frame = tk.Frame(main_frame, bg='#2b2b2b')
     info_display_frame.pack(fill=tk.BOTH, expand=True)
     
-    def update_display():
-        for widget in info_display_frame.winfo_children():
+    gpus_frame = tk.Frame(info_display_frame, bg='#2b2b2b')
+    
+    error_frame = tk.Frame(info_display_frame, bg='#1e1e1e', relief=tk.RAISED, bd=2)
+    
+    error_label = tk.Label(
+        error_frame,
+        text='GPU not found!',
+        font=('Arial', 12, 'bold'),
+        bg='#1e1e1e',
+        fg='#ff0000'
+    )
+    error_label.pack(pady=20)
+    
+    error_text = tk.Label(
+        error_frame,
+        text='Make sure that your GPU drivers are installed.',
+        font=('Arial', 10),
+        bg='#1e1e1e',
+        fg='#ffffff',
+        justify=tk.LEFT
+    )
+    error_text.pack(pady=10)
+    
+    status_label = tk.Label(
+        info_display_frame,
+        text='Probing GPUs...',
+        font=('Arial', 10),
+        bg='#2b2b2b',
+        fg='#00ff00'
+    )
+    status_label.pack(side=tk.BOTTOM, pady=10)
+    
+    # Widgets are only rebuilt when the set of GPUs changes; every other
+    # refresh just updates the value labels in place.
+    gpu_layout = {'keys': None, 'values': [], 'charts': []}
+    
+    def build_gpu_frames(gpus):
+        for widget in gpus_frame.winfo_children():
             widget.destroy()
+        gpu_layout['values'] = []
+        gpu_layout['charts'] = []
+        columns = min(len(gpus), 4)
         
-        gpu_info = get_gpu_info()
-        
-        if gpu_info:
-            info_frame = tk.Frame(info_display_frame, bg='#1e1e1e', relief=tk.RAISED, bd=2)
-            info_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        for i, gpu in enumerate(gpus):
+            info_frame = tk.Frame(gpus_frame, bg='#1e1e1e', relief=tk.RAISED, bd=2)
+            info_frame.grid(row=i // columns, column=i % columns, sticky='nsew', padx=5, pady=10)
             
-            name_label = tk.Label(
-                info_frame,
-                text='GPU model:',
-                font=('Arial', 11, 'bold'),
-                bg='#1e1e1e',
-                fg='#ffffff',
-                justify=tk.LEFT
-            )
-            name_label.pack(anchor=tk.W, padx=15, pady=(10, 5))
-            
-            name_value = tk.Label(
-                info_frame,
-                text=gpu_info['name'],
-                font=('Arial', 12),
-                bg='#1e1e1e',
-                fg='#00ff00'
-            )
-            name_value.pack(anchor=tk.W, padx=25, pady=(0, 10))
-            
-            sep2 = ttk.Separator(info_frame, orient='horizontal')
-            sep2.pack(fill=tk.X, padx=15, pady=5)
-            
-            memory_label = tk.Label(
-                info_frame,
-                text='Total memory:',
-                font=('Arial', 11, 'bold'),
-                bg='#1e1e1e',
-                fg='#ffffff'
-            )
-            memory_label.pack(anchor=tk.W, padx=15, pady=(10, 5))
-            
-            memory_value = tk.Label(
-                info_frame,
-                text=gpu_info['total_memory'],
-                font=('Arial', 12),
-                bg='#1e1e1e',
-                fg='#00ff00'
-            )
-            memory_value.pack(anchor=tk.W, padx=25, pady=(0, 10))
-            
-            sep3 = ttk.Separator(info_frame, orient='horizontal')
-            sep3.pack(fill=tk.X, padx=15, pady=5)
-            
-            used_label = tk.Label(
-                info_frame,
-                text='Used memory:',
-                font=('Arial', 11, 'bold'),
-                bg='#1e1e1e',
-                fg='#ffffff'
-            )
-            used_label.pack(anchor=tk.W, padx=15, pady=(10, 5))
+            if len(gpus) > 1:
+                gpu_label = tk.Label(
+                    info_frame,
+                    text=f"GPU {gpu.index}  {gpu.bus_id or ''}".rstrip(),
+                    font=('Arial', 10),
+                    bg='#1e1e1e',
+                    fg='#808080'
+                )
+                gpu_label.pack(anchor=tk.W, padx=15, pady=(10, 0))
             
-            used_value = tk.Label(
-                info_frame,
-                text=gpu_info['used_memory'],
-                font=('Arial', 12),
-                bg='#1e1e1e',
-                fg='#00ff00'
-            )
-            used_value.pack(anchor=tk.W, padx=25, pady=(0, 10))
+            labels = ['GPU model:', 'Total memory:', 'Used memory:', 'Utilization:', 'Temperature:']
+            values = []
+            for j, label in enumerate(labels):
+                if j:
+                    sep = ttk.Separator(info_frame, orient='horizontal')
+                    sep.pack(fill=tk.X, padx=15, pady=5)
+                
+                field_label = tk.Label(
+                    info_frame,
+                    text=label,
+                    font=('Arial', 11, 'bold'),
+                    bg='#1e1e1e',
+                    fg='#ffffff',
+                    justify=tk.LEFT
+                )
+                field_label.pack(anchor=tk.W, padx=15, pady=(10, 5))
+                
+                field_value = tk.Label(
+                    info_frame,
+                    font=('Arial', 12),
+                    bg='#1e1e1e',
+                    fg='#00ff00'
+                )
+                field_value.pack(anchor=tk.W, padx=25, pady=(0, 10))
+                values.append(field_value)
+            gpu_layout['values'].append(values)
             
-            sep4 = ttk.Separator(info_frame, orient='horizontal')
-            sep4.pack(fill=tk.X, padx=15, pady=5)
+            sep = ttk.Separator(info_frame, orient='horizontal')
+            sep.pack(fill=tk.X, padx=15, pady=5)
             
-            util_label = tk.Label(
-                info_frame,
-                text='Utilization:',
-                font=('Arial', 11, 'bold'),
-                bg='#1e1e1e',
-                fg='#ffffff'
-            )
-            util_label.pack(anchor=tk.W, padx=15, pady=(10, 5))
+            legend_frame = tk.Frame(info_frame, bg='#1e1e1e')
+            legend_frame.pack(anchor=tk.W, padx=15, pady=(10, 5))
+            for text, color in (('Utilization', '#00ff00'), ('Used memory', '#00bfff')):
+                legend_label = tk.Label(
+                    legend_frame,
+                    text=text,
+                    font=('Arial', 9, 'bold'),
+                    bg='#1e1e1e',
+                    fg=color
+                )
+                legend_label.pack(side=tk.LEFT, padx=(0, 10))
             
-            util_value = tk.Label(
+            chart = HistoryChart(
                 info_frame,
-                text=gpu_info['utilization'],
-                font=('Arial', 12),
-                bg='#1e1e1e',
-                fg='#00ff00'
+                {'utilization': '#00ff00', 'memory': '#00bfff'},
+                span=history_span
             )
-            util_value.pack(anchor=tk.W, padx=25, pady=(0, 15))
-            
-            status_label = tk.Label(
-                info_display_frame,
-                text='GPU is fine',
-                font=('Arial', 10),
-                bg='#2b2b2b',
-                fg='#00ff00'
-            )
-            status_label.pack(pady=10)
-        else:
-            error_frame = tk.Frame(info_display_frame, bg='#1e1e1e', relief=tk.RAISED, bd=2)
-            error_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-            
-            error_label = tk.Label(
-                error_frame,
-                text='GPU not found!',
-                font=('Arial', 12, 'bold'),
-                bg='#1e1e1e',
-                fg='#ff0000'
-            )
-            error_label.pack(pady=20)
-            
-            error_text = tk.Label(
-                error_frame,
-                text='Make sure that your GPU drivers are installed.',
-                font=('Arial', 10),
-                bg='#1e1e1e',
-                fg='#ffffff',
-                justify=tk.LEFT
-            )
-            error_text.pack(pady=10)
+            chart.canvas.pack(padx=15, pady=(0, 15))
+            gpu_layout['charts'].append(chart)
+    
+    def show_error(title, text):
+        gpu_layout['keys'] = None
+        error_label.config(text=title)
+        error_text.config(text=text)
+        gpus_frame.pack_forget()
+        error_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+        status_label.config(text='')
+
+    def show_gpus(gpus, earlier=()):
+        """Show gpus, and draw them and the earlier samples of the same
+        GPUs received since the last poll on the charts."""
+        if isinstance(gpus, Exception):
+            show_error('Cannot replay the recording!', getattr(gpus, 'strerror', None) or str(gpus))
+            return
+        if not gpus:
+            show_error('GPU not found!', 'Make sure that your GPU drivers are installed.')
+            return
+        
+        keys = [(gpu.index, gpu.bus_id) for gpu in gpus]
+        if keys != gpu_layout['keys']:
+            gpu_layout['keys'] = keys
+            build_gpu_frames(gpus)
+            error_frame.pack_forget()
+            gpus_frame.pack(fill=tk.BOTH, expand=True)
+        
+        for sample in [*earlier, gpus]:
+            if isinstance(sample, list) and [(gpu.index, gpu.bus_id) for gpu in sample] == keys:
+                for chart, gpu in zip(gpu_layout['charts'], sample):
+                    memory = None
+                    if gpu.memory_used is not None and gpu.memory_total:
+                        memory = gpu.memory_used / gpu.memory_total * 100
+                    chart.add(gpu.timestamp, {'utilization': gpu.utilization, 'memory': memory})
+        
+        for values, gpu in zip(gpu_layout['values'], gpus):
+            texts = [
+                gpu.name,
+                format_memory(gpu.memory_total),
+                format_memory(gpu.memory_used),
+                format_percent(gpu.utilization),
+                format_temperature(gpu.temperature)
+            ]
+            for value, text in zip(values, texts):
+                if value.cget('text') != text:
+                    value.config(text=text)
+        status_label.config(text='GPU is fine' if len(gpus) == 1 else 'GPUs are fine')
+    
+    results = queue.Queue(QUEUE_SIZE)
+    reload_requested = threading.Event()
+    stopping = threading.Event()
+    
+    def poll_results():
+        received = []
+        while len(received) < QUEUE_SIZE:
+            try:
+                received.append(results.get_nowait())
+            except queue.Empty:
+                break
+        if received:
+            show_gpus(received[-1], received[:-1])
+        root.after(POLL_MS, poll_results)
+    
+    def reload():
+        status_label.config(text='Probing GPUs...')
+        reload_requested.set()
+    
+    def close():
+        stopping.set()
+        reload_requested.set()
+        root.quit()
     
     button_frame = tk.Frame(main_frame, bg='#2b2b2b')
     button_frame.pack(pady=10)
@@ -375,7 +330,7 @@ def create_gpu_window():
     refresh_button = tk.Button(
         button_frame,
         text='RELOAD',
-        command=update_display,
+        command=reload,
         font=('Arial', 10),
         bg='#404040',
         fg='#00ff00',
@@ -384,12 +339,13 @@ def create_gpu_window():
         relief=tk.RAISED,
         bd=1
     )
-    refresh_button.pack(side=tk.LEFT, padx=5)
+    if not refresh_interval and samples is None:
+        refresh_button.pack(side=tk.LEFT, padx=5)
     
     exit_button = tk.Button(
         button_frame,
         text='CLOSE',
-        command=root.quit,
+        command=close,
         font=('Arial', 10),
         bg='#404040',
         fg='#ffffff',
@@ -400,9 +356,48 @@ def create_gpu_window():
     )
     exit_button.pack(side=tk.LEFT, padx=5)
     
-    update_display()
+    root.protocol('WM_DELETE_WINDOW', close)
+    
+    worker = threading.Thread(
+        target=sample_worker,
+        args=(results, reload_requested, stopping, refresh_interval, use_cache, use_daemon, samples),
+        daemon=True
+    )
+    worker.start()
+    poll_results()
     
     root.mainloop()
+    root.destroy()
+    worker.join(timeout=(refresh_interval or 0) + 1)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Show GPU model, memory and utilization in a window.')
+    parser.add_argument('--refresh', type=positive_float, metavar='SECONDS',
+                        help='refresh automatically every SECONDS instead of on RELOAD')
+    parser.add_argument('--history', type=positive_float, default=HISTORY_SPAN, metavar='SECONDS',
+                        help=f'time span covered by the history charts (default: {HISTORY_SPAN})')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='ignore the backend detection cache and probe every backend')
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='probe the GPUs directly even if a daemon is running')
+    parser.add_argument('--replay', metavar='FILE',
+                        help='play back a recording made with ohmygpu_cmd --record instead of probing')
+    parser.add_argument('--since', type=parse_time, metavar='TIME',
+                        help='replay from TIME: epoch seconds, an ISO 8601 time or an offset from the end '
+                             'of the recording such as --since=-10m')
+    parser.add_argument('--until', type=parse_time, metavar='TIME',
+                        help='replay up to TIME, in the same forms as --since')
+    parser.add_argument('--speed', type=non_negative_float, default=1.0, metavar='FACTOR',
+                        help='replay FACTOR times faster than recorded, 0 for no pauses (default: 1)')
+    args = parser.parse_args()
+    if (args.since is not None or args.until is not None) and not args.replay:
+        parser.error('--since and --until need --replay')
+    return args
 
 if __name__ == "__main__":
-    create_gpu_window()
\ No newline at end of file
+    args = parse_args()
+    samples = None
+    if args.replay:
+        samples = replay(args.replay, args.since, args.until, args.speed)
+    create_gpu_window(refresh_interval=args.refresh, use_cache=not args.no_cache,
+                      history_span=args.history, use_daemon=not args.no_daemon, samples=samples)
@@ -0,0 +1,259 @@
+import random
+import sys
+import threading
+import time
+
+import ohmygpu_cache
+import ohmygpu_core
+import ohmygpu_daemon
+import ohmygpu_profile
+from ohmygpu_sample import GpuSample
+
+
+# Fields a sampler refreshes every tick unless its cadence says otherwise.
+DYNAMIC_FIELDS = ('memory_used', 'utilization', 'temperature', 'power', 'clock_graphics', 'clock_memory')
+# Seconds between reads of slow-moving fields; the rest follow the interval.
+DEFAULT_CADENCES = {'temperature': 5, 'clock_graphics': 5, 'clock_memory': 5}
+# How often watch() checks for a hotplug or driver change.
+TOPOLOGY_CHECK = 10
+
+# Adaptive pacing: a change of at least FAST_CHANGE percentage points in
+# utilization or memory drops straight to the shortest interval, anything
+# under STABLE_CHANGE backs off by BACKOFF. Memory counts in percent of
+# the card's total.
+FAST_CHANGE = 10.0
+STABLE_CHANGE = 2.0
+BACKOFF = 1.5
+DEFAULT_JITTER = 0.1
+# Fraction of one core that sampling is meant to stay under.
+OVERHEAD_BUDGET = 0.01
+
+
+_stats_lock = threading.Lock()
+_sampling_stats = {
+    'samples': 0,
+    'cpu_seconds_total': 0.0,
+    'last_cpu_seconds': 0.0,
+    'wall_seconds_total': 0.0,
+    'last_interval': 0.0,
+}
+
+def get_sampling_stats():
+    """Cost of the sampling loop since start-up: CPU time this process spent
+    reading and assembling samples, the interval in effect and the share of
+    one core that works out to. Time spent by vendor tools running as child
+    processes is not included."""
+    with _stats_lock:
+        stats = dict(_sampling_stats)
+    wall = stats['wall_seconds_total']
+    stats['core_fraction'] = stats['cpu_seconds_total'] / wall if wall else 0.0
+    return stats
+
+def _record_sample(cpu_seconds, wall_seconds, interval):
+    with _stats_lock:
+        _sampling_stats['samples'] += 1
+        _sampling_stats['cpu_seconds_total'] += cpu_seconds
+        _sampling_stats['last_cpu_seconds'] = cpu_seconds
+        _sampling_stats['wall_seconds_total'] += wall_seconds
+        _sampling_stats['last_interval'] = interval
+
+
+class AdaptiveInterval:
+    """Picks the delay before the next sample between minimum and maximum:
+    it backs off while utilization and memory hold still, drops to the
+    minimum as soon as either moves fast, and is jittered so a fleet of
+    hosts does not sample in lockstep. With maximum equal to minimum it
+    only jitters."""
+
+    def __init__(self, minimum, maximum, jitter=DEFAULT_JITTER):
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.jitter = jitter
+        self.base = minimum
+        self.previous = {}
+
+    def _change(self, gpus):
+        biggest = None
+        current = {}
+        for gpu in gpus:
+            key = gpu.bus_id or gpu.index
+            current[key] = gpu
+            previous = self.previous.get(key)
+            if previous is None:
+                continue
+            changes = []
+            if gpu.utilization is not None and previous.utilization is not None:
+                changes.append(abs(gpu.utilization - previous.utilization))
+            if gpu.memory_used is not None and previous.memory_used is not None and gpu.memory_total:
+                changes.append(abs(gpu.memory_used - previous.memory_used) / gpu.memory_total * 100)
+            if changes:
+                biggest = max(changes + [biggest or 0.0])
+        self.previous = current
+        return biggest
+
+    def next(self, gpus):
+        change = self._change(gpus)
+        if change is None:
+            pass
+        elif change >= FAST_CHANGE:
+            self.base = self.minimum
+        elif change < STABLE_CHANGE:
+            self.base = min(self.base * BACKOFF, self.maximum)
+        else:
+            self.base = max(self.base / BACKOFF, self.minimum)
+        return self.base * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class StaticSampler:
+    """For backends that only report static fields: discovery already told
+    us everything, so ticks never call the backend again."""
+
+    fields = ()
+
+    def __init__(self, gpus, interval):
+        pass
+
+    def read(self, fields):
+        return {}
+
+    def close(self):
+        pass
+
+
+def schedule(sampler, gpus, interval, cadences=None, max_interval=None):
+    """Yield gpus every interval seconds with their dynamic fields
+    refreshed by sampler, each on its own cadence. Fields due on the same
+    tick are read in one sampler call. The interval is jittered, and with
+    max_interval it adapts between the two, see AdaptiveInterval.
+
+    Returns when the sampler fails or the PCI topology (cards, drivers)
+    changes, so the caller can discover the GPUs again."""
+    cadences = {**DEFAULT_CADENCES, **(cadences or {})}
+    pacing = AdaptiveInterval(interval, max_interval or interval)
+    delay = interval
+    previous_start = None
+    due_at = dict.fromkeys(sampler.fields, 0.0)
+    latest = {gpu.index: {} for gpu in gpus}
+    topology = ohmygpu_cache.topology_key()
+    check_at = time.monotonic() + TOPOLOGY_CHECK
+    try:
+        while True:
+            started = time.monotonic()
+            cpu_started = time.thread_time()
+            profiler = ohmygpu_profile.active
+            tick_started = time.perf_counter() if profiler is not None else None
+            due = [field for field, at in due_at.items() if at <= started]
+            if due:
+                readings = sampler.read(due)
+                if readings is None:
+                    return
+                for index, values in readings.items():
+                    latest.setdefault(index, {}).update(values)
+                for field in due:
+                    # Half a tick of slack so timer jitter cannot skip a read.
+                    due_at[field] = started + max(cadences.get(field, delay), delay) - delay / 2
+
+            timestamp = time.time_ns()
+            samples = [
+                GpuSample(gpu.index, gpu.name, gpu.bus_id, gpu.memory_total,
+                          timestamp=timestamp, **latest.get(gpu.index, {}))
+                for gpu in gpus
+            ]
+            delay = pacing.next(samples)
+            if profiler is not None:
+                profiler.add('sample', 'sample', tick_started, time.perf_counter(), fields=due)
+            _record_sample(time.thread_time() - cpu_started,
+                           started - previous_start if previous_start is not None else 0.0, delay)
+            previous_start = started
+            yield samples
+
+            if started >= check_at:
+                if ohmygpu_cache.topology_key() != topology:
+                    return
+                check_at = started + TOPOLOGY_CHECK
+            time.sleep(max(delay - (time.monotonic() - started), 0))
+    finally:
+        sampler.close()
+
+def watch(interval, use_cache=True, use_daemon=True, cadences=None, max_interval=None):
+    """Yield a list of GpuSample every interval seconds from whichever
+    backend answers on this machine, using the cheapest repeatable way to
+    sample it.
+
+    A running sampling daemon is read first, so viewers share its samples.
+    Otherwise static fields come from discovery, and a backend module can
+    refresh the dynamic ones through a sampler in its SAMPLERS table, on
+    the per-field cadences given in seconds. With max_interval, interval
+    becomes the shortest of an adaptive range. Discovery runs again after a
+    hotplug, a driver change or a sampler failure."""
+    if use_daemon and ohmygpu_daemon.available():
+        yield from ohmygpu_daemon.poll_daemon(interval)
+
+    while True:
+        probe, gpus = ohmygpu_core.detect(ohmygpu_core.platform_backends(), use_cache)
+        if probe is None:
+            return
+        yield gpus
+
+        time.sleep(interval)
+        factory = ohmygpu_core.sampler_factory(probe) or StaticSampler
+        try:
+            sampler = factory(gpus, interval)
+        except Exception:
+            continue
+        yield from schedule(sampler, gpus, interval, cadences, max_interval)
+
+def watch_processes(interval):
+    """Yield a list of ProcessSample every interval seconds, merged from
+    every process backend, so GPUs only one of them sees are covered."""
+    probes = ohmygpu_core.process_probes()
+    while True:
+        started = time.monotonic()
+        processes = ohmygpu_core.run_process_probes(probes)
+        yield processes or []
+        time.sleep(max(interval - (time.monotonic() - started), 0))
+
+
+class BackgroundSampler:
+    """Runs watch() on its own thread and hands every sample to _publish(),
+    or None after the backend was lost. Subclasses keep whatever they serve
+    prebuilt, so readers never wait on a backend."""
+
+    def __init__(self, interval, use_cache=True, use_daemon=True, cadences=None, max_interval=None):
+        self.interval = interval
+        self.use_cache = use_cache
+        self.use_daemon = use_daemon
+        self.cadences = cadences
+        self.max_interval = max_interval
+        self.stats = {'samples': 0, 'errors': 0, 'last_sample': 0.0}
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopping.set()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            samples = watch(self.interval, self.use_cache, self.use_daemon, self.cadences, self.max_interval)
+            try:
+                for gpus in samples:
+                    self.stats['samples'] += 1
+                    self.stats['last_sample'] = time.time()
+                    self._publish(gpus)
+                    if self._stopping.is_set():
+                        return
+            except Exception:
+                import traceback
+                print(f"[ERROR] Sampling failed, restarting in {self.interval} s:", file=sys.stderr)
+                traceback.print_exc()
+            finally:
+                samples.close()
+            self.stats['errors'] += 1
+            self._publish(None)
+            self._stopping.wait(self.interval)
+
+    def _publish(self, gpus):
+        raise NotImplementedError
@@ -0,0 +1,31 @@
+from ohmygpu_sample import GpuSample
+
+
+def probe_wmic(run):
+    result = run(['wmic', 'path', 'win32_videocontroller', 'get', 'name,adapterram'])
+    if result.returncode != 0:
+        return None
+
+    lines = [line.strip() for line in result.stdout.strip().split('\n') if line.strip()]
+    if not lines:
+        return None
+    # wmic prints the requested columns alphabetically: AdapterRAM, then Name.
+    ram_first = lines[0].lower().startswith('adapterram')
+    gpus = []
+    for line in lines[1:]:
+        if ram_first:
+            parts = line.split(None, 1)
+            if len(parts) == 1:
+                parts = ['', parts[0]]
+            mem, name = parts
+        else:
+            parts = line.rsplit(None, 1)
+            if len(parts) != 2:
+                continue
+            name, mem = parts
+        gpus.append(GpuSample(
+            index=len(gpus),
+            name=name.strip(),
+            memory_total=int(mem) if mem.isdigit() else None
+        ))
+    return gpus or None